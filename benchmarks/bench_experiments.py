@@ -0,0 +1,71 @@
+"""Benchmark: per-experiment loop vs grouped multi-experiment runner."""
+
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.experiments import run_experiments
+from src.online import summarize_sessions, summary_results
+
+def synthetic_portfolio(n_experiments, n_sessions, seed=0):
+    """Long session table: 2–4 arms per experiment, a few with a real CVR lift."""
+    rng = np.random.default_rng(seed)
+    n_arms = rng.integers(2, 5, n_experiments)
+    experiment = rng.integers(0, n_experiments, n_sessions)
+    arm = (rng.random(n_sessions) * n_arms[experiment]).astype(np.int64)
+    base = rng.uniform(0.02, 0.06, n_experiments)[experiment]
+    lift = np.where(arm > 0, rng.choice([0.0, 0.0, 0.0, 0.1], n_experiments)[experiment], 0.0)
+    converted = rng.random(n_sessions) < base * (1 + lift)
+    revenue = np.where(converted, rng.gamma(4.0, 17.0, n_sessions), 0.0).round(2)
+    labels = np.array(['control'] + [f'variant_{i}' for i in range(1, 4)])
+    return pd.DataFrame({
+        'experiment_id': pd.Categorical.from_codes(experiment, [f'exp_{i:03d}' for i in range(n_experiments)]),
+        'group': pd.Categorical(labels[arm]),
+        'converted': converted.astype(np.int8),
+        'revenue': revenue,
+    })
+
+
+def per_experiment_loop(df):
+    """Status quo: filter each experiment and variant, then run the single-experiment path."""
+    rows = []
+    for exp, sessions in df.groupby('experiment_id', observed=True):
+        for variant in sessions['group'].unique():
+            if variant == 'control':
+                continue
+            pair = sessions[sessions['group'].isin(['control', variant])]
+            rows.append(summary_results(summarize_sessions(pair, by=('group',)), treatment=variant))
+    return rows
+
+
+def main():
+    """Time both runners on one synthetic portfolio."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--experiments', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=2_000_000, help='total sessions across experiments')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    df = synthetic_portfolio(args.experiments, args.sessions)
+    print(f"{args.experiments} experiments, {len(df):,} sessions\n")
+    print(f"{'Variant':<32} {'Time (s)':>9} {'comparisons':>12}")
+    print("-" * 55)
+
+    t0 = time.perf_counter()
+    loop = per_experiment_loop(df)
+    print(f"{'per-experiment loop':<32} {time.perf_counter() - t0:>9.3f} {len(loop):>12,}")
+
+    t0 = time.perf_counter()
+    results = run_experiments(df, workers=args.workers)
+    label = f'grouped runner (workers={args.workers})'
+    print(f"{label:<32} {time.perf_counter() - t0:>9.3f} {len(results) // 3:>12,}")
+
+    cvr = results[results['metric'] == 'cvr']
+    print(f"\nCVR wins after Holm within experiment: {int(cvr['significant'].sum())} / {len(cvr)}; "
+          f"portfolio BH q<0.05: {int((cvr['q_value'] < 0.05).sum())}")
+
+
+if __name__ == '__main__':
+    main()
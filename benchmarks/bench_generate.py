@@ -0,0 +1,30 @@
+"""Benchmark: per-row loop vs batched session generation."""
+
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import time
+from src.simulation import generate_dataset
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--sessions', type=int, nargs='+', default=[10_000, 76_000],
+                    help='target total sessions per run')
+parser.add_argument('--skip-legacy-above', type=int, default=200_000,
+                    help='only time the per-row loop up to this many sessions')
+args = parser.parse_args()
+
+print(f"{'Sessions':>12} {'Loop (s)':>10} {'Batched (s)':>12} {'Speedup':>9}")
+print("-" * 46)
+for total in args.sessions:
+    t0 = time.perf_counter()
+    df = generate_dataset(target_total_sessions=total)
+    t_fast = time.perf_counter() - t0
+
+    t_loop = float('nan')
+    if total <= args.skip_legacy_above:
+        t0 = time.perf_counter()
+        generate_dataset(target_total_sessions=total, legacy=True)
+        t_loop = time.perf_counter() - t0
+
+    speedup = f"{t_loop / t_fast:.0f}x" if t_loop == t_loop else '-'
+    print(f"{len(df):>12,} {t_loop:>10.2f} {t_fast:>12.3f} {speedup:>9}")
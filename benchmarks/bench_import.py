@@ -0,0 +1,50 @@
+"""Benchmark: cold-start time of one-off statistical calls in fresh interpreters."""
+
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import json
+import subprocess
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY = ['pandas', 'scipy.stats', 'statsmodels', 'matplotlib']
+
+# Snippets run in a new process each; the last one is the pre-change import set
+SNIPPETS = {
+    'python': "pass",
+    'numpy': "import numpy",
+    'import stats_utils': "import src.stats_utils",
+    'z-test': "from src.stats_utils import run_proportion_ztest\n"
+              "run_proportion_ztest([512, 610], [10000, 10100])",
+    'z-test + Wilson + lift CI': "from src.stats_utils import run_proportion_ztest, compute_confidence_interval, "
+                                 "compute_lift_ci\n"
+                                 "run_proportion_ztest([512, 610], [10000, 10100])\n"
+                                 "compute_confidence_interval(610, 10100)\n"
+                                 "compute_lift_ci(0.0512, 0.0604, 10000, 10100)",
+    'import data_utils': "import src.data_utils",
+    'eager scipy + statsmodels': "import pandas, scipy.stats, statsmodels.stats.power, statsmodels.stats.proportion",
+}
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per snippet')
+args = parser.parse_args()
+
+
+def cold_start(code):
+    """Wall time of a fresh interpreter running ``code``, and which heavy modules it loaded."""
+    probe = f"{code}\nimport sys, json\nprint(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    return time.perf_counter() - t0, json.loads(out.stdout.strip().splitlines()[-1])
+
+
+print(f"{'Snippet':<28} {'Best (s)':>9} {'Median (s)':>11}  Heavy modules loaded")
+print("-" * 80)
+for label, code in SNIPPETS.items():
+    times = []
+    for _ in range(args.repeat):
+        elapsed, loaded = cold_start(code)
+        times.append(elapsed)
+    times.sort()
+    print(f"{label:<28} {times[0]:>9.3f} {times[len(times) // 2]:>11.3f}  {', '.join(loaded) or '-'}")
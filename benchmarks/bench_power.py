@@ -0,0 +1,35 @@
+"""Benchmark: statsmodels solve vs cached / table / batched sample-size planning."""
+
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import tempfile
+import time
+import numpy as np
+from src.stats_utils import required_sample_size, required_sample_size_batch
+from src.planning import build_power_table, planned_sample_size, table_sample_size
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--queries', type=int, default=2_000)
+args = parser.parse_args()
+
+rng = np.random.default_rng(0)
+# Planning workloads repeat a small set of scenarios many times
+baselines = rng.choice(np.round(np.linspace(0.01, 0.2, 20), 3), args.queries)
+mdes = rng.choice(np.round(np.linspace(0.001, 0.02, 20), 4), args.queries)
+table = build_power_table(tempfile.mkdtemp())
+
+
+def timed(label, func):
+    t0 = time.perf_counter()
+    n = func()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<32} {elapsed:>9.4f} {elapsed / args.queries * 1e6:>12.1f} {int(np.sum(n)):>14,}")
+
+
+print(f"{'Variant':<32} {'Time (s)':>9} {'us/query':>12} {'sum(n)':>14}")
+print("-" * 70)
+timed('statsmodels solve_power', lambda: [required_sample_size(b, m) for b, m in zip(baselines, mdes)])
+timed('LRU-cached planner', lambda: [planned_sample_size(b, m) for b, m in zip(baselines, mdes)])
+timed('memory-mapped table (scalar)', lambda: [table_sample_size(table, b, m) for b, m in zip(baselines, mdes)])
+timed('batched closed form', lambda: required_sample_size_batch(baselines, mdes))
@@ -0,0 +1,195 @@
+"""Benchmark suite: generation, loading and statistical hot paths at several scales.
+
+Datasets come from the same generator as notebooks/01_generate_data.py
+and are cached under data/.bench/. Each case is timed (best and median of
+--repeat runs after a warm-up call) and then run once under tracemalloc
+for its peak memory.
+Results go to benchmarks/results/<commit>.json, together with per-case
+scaling exponents (log-log slope of time vs sessions), so a scaling or
+memory regression shows up as a number. --compare checks against an
+earlier results file and exits 1 on regressions beyond --threshold.
+
+    python benchmarks/bench_suite.py                          # 10K, 100K, 1M
+    python benchmarks/bench_suite.py --scales 10000 10000000  # up to 10M
+    python benchmarks/bench_suite.py --compare benchmarks/results/<old>.json
+"""
+
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.data_utils import add_derived_features, load_ab_data, parquet_cache_path, validate_data
+from src.export import write_star_schema
+from src.simulation import generate_dataset
+from src.stats_utils import bootstrap_mean_diff, permutation_test, run_mannwhitney
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DATA = ROOT / 'data' / '.bench'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+NOISE_FLOOR_S = 0.01
+CASES = ['generate', 'load_csv_cold', 'load_warm', 'add_derived_features', 'validate_data',
+         'bootstrap_mean_diff', 'run_mannwhitney', 'permutation_test', 'device_groupby', 'export_star_schema']
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--scales', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                    help='target total sessions per dataset')
+parser.add_argument('--cases', nargs='+', choices=CASES, default=CASES)
+parser.add_argument('--repeat', type=int, default=3)
+parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+parser.add_argument('--out', help='results file (default benchmarks/results/<commit>.json)')
+parser.add_argument('--compare', help='earlier results file to compare against')
+parser.add_argument('--threshold', type=float, default=1.25,
+                    help='flag time or memory ratios above this as regressions')
+args = parser.parse_args()
+
+
+def git_revision():
+    """Short commit hash, with '-dirty' when the tree has uncommitted changes."""
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def dataset(sessions):
+    """CSV for ``sessions`` target sessions, generated once and cached."""
+    path = BENCH_DATA / f'sessions_{sessions}.csv'
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        generate_dataset(target_total_sessions=sessions).to_csv(path, index=False)
+    return path
+
+
+def cold_load(path):
+    """First load of a CSV: includes the one-off conversion to its cached Parquet copy."""
+    path.with_suffix('.parquet').unlink(missing_ok=True)
+    parquet_cache_path(path).unlink(missing_ok=True)
+    return load_ab_data(path)
+
+
+def export(df):
+    out = tempfile.mkdtemp()
+    try:
+        return write_star_schema(df, out)
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+def case_functions(sessions, path, df, features):
+    """Zero-argument callables per case; the data they need is prepared outside the timing."""
+    ctrl = df.loc[df['group'] == 'control', 'revenue'].to_numpy(float)
+    treat = df.loc[df['group'] == 'treatment', 'revenue'].to_numpy(float)
+    return {
+        'generate': lambda: generate_dataset(target_total_sessions=sessions),
+        'load_csv_cold': lambda: cold_load(path),
+        'load_warm': lambda: load_ab_data(path),
+        'add_derived_features': lambda: add_derived_features(df),
+        'validate_data': lambda: validate_data(df),
+        'bootstrap_mean_diff': lambda: bootstrap_mean_diff(ctrl, treat),
+        'run_mannwhitney': lambda: run_mannwhitney(ctrl, treat),
+        'permutation_test': lambda: permutation_test(ctrl, treat),
+        'device_groupby': lambda: features.groupby(['device', 'group'], observed=True)
+                                          .agg(sessions=('converted', 'size'), cvr=('converted', 'mean'),
+                                               revenue=('revenue', 'mean')),
+        'export_star_schema': lambda: export(features),
+    }
+
+
+def measure(func, repeat, memory):
+    func()  # warm-up: lazy imports and first-call setup stay out of the timings
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return min(times), float(np.median(times)), peak_mb
+
+
+def scaling_exponents(frame):
+    """Log-log slope of best time vs sessions per case (1.0 = linear)."""
+    out = {}
+    for case, rows in frame.groupby('case'):
+        rows = rows[rows['best_s'] > 0]
+        if rows['sessions'].nunique() >= 2:
+            out[case] = float(np.polyfit(np.log(rows['sessions']), np.log(rows['best_s']), 1)[0])
+    return out
+
+
+def compare(current, baseline_path, threshold):
+    """Print time / memory ratios against a baseline; returns the regressed (case, sessions) pairs."""
+    baseline = pd.DataFrame(json.loads(Path(baseline_path).read_text())['results'])
+    merged = current.merge(baseline, on=['case', 'sessions'], suffixes=('', '_base'))
+    merged['time_ratio'] = merged['best_s'] / merged['best_s_base']
+    merged['memory_ratio'] = merged['peak_mb'] / merged['peak_mb_base']
+    # Millisecond timings are mostly noise; only judge time above a small floor
+    slow = (merged['time_ratio'] > threshold) & (merged['best_s'] >= NOISE_FLOOR_S)
+    merged['regression'] = slow | (merged['memory_ratio'] > threshold)
+    print(f"\nvs {baseline_path} (threshold {threshold:.2f}x)")
+    print(merged[['case', 'sessions', 'best_s_base', 'best_s', 'time_ratio', 'memory_ratio', 'regression']]
+          .to_string(index=False, float_format='{:.3f}'.format))
+    return merged.loc[merged['regression'], ['case', 'sessions']].values.tolist()
+
+
+rows = []
+print(f"{'Case':<22} {'Sessions':>11} {'Best (s)':>10} {'Median (s)':>11} {'us/session':>11} {'Peak MB':>9}")
+print("-" * 79)
+for scale in args.scales:
+    path = dataset(scale)
+    df = load_ab_data(path)
+    features = add_derived_features(df)
+    funcs = case_functions(scale, path, df, features)
+    for case in args.cases:
+        best, median, peak = measure(funcs[case], args.repeat, not args.no_memory)
+        rows.append({'case': case, 'sessions': len(df), 'target_sessions': scale, 'best_s': best,
+                     'median_s': median, 'us_per_session': best / len(df) * 1e6, 'peak_mb': peak})
+        peak_txt = f"{peak:>9.1f}" if peak is not None else f"{'-':>9}"
+        print(f"{case:<22} {len(df):>11,} {best:>10.4f} {median:>11.4f} {best / len(df) * 1e6:>11.3f} {peak_txt}")
+
+results = pd.DataFrame(rows)
+exponents = scaling_exponents(results)
+if exponents:
+    print("\nScaling exponent (time ∝ sessions^k):")
+    for case, k in exponents.items():
+        print(f"  {case:<22} k = {k:.2f}")
+
+revision = git_revision()
+out = Path(args.out) if args.out else RESULTS_DIR / f'{revision}.json'
+out.parent.mkdir(parents=True, exist_ok=True)
+out.write_text(json.dumps({
+    'revision': revision,
+    'timestamp': pd.Timestamp.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'pandas': pd.__version__,
+    'platform': platform.platform(),
+    'cpus': os.cpu_count(),
+    'repeat': args.repeat,
+    'results': json.loads(results.to_json(orient='records')),
+    'scaling_exponents': exponents,
+}, indent=2))
+print(f"\nSaved → {out}")
+
+if args.compare:
+    regressions = compare(results, args.compare, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {regressions}")
+        sys.exit(1)
@@ -1,144 +1,86 @@
 """
 Generate Synthetic A/B Test Data
 Simulates a 21-day checkout-page redesign experiment with returning users:
-- User level split randomization 
-- Multi session journeys 
+- User level split randomization
+- Multi session journeys
+
+The generative model and all parameters live in src/simulation.py.
 """
-import numpy as np
-import pandas as pd
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
 from pathlib import Path
-
-SEED = 42
-RNG = np.random.default_rng(SEED)
-
-
-# Params
-N_DAYS = 21
-TARGET_TOTAL_SESSIONS = 76000
-AVG_SESSIONS_PER_USER = 1.4
-N_UNIQUE_USERS = int(TARGET_TOTAL_SESSIONS / AVG_SESSIONS_PER_USER) 
-
-START_DATE = pd.Timestamp('2024-09-02')
-
-BASELINE_CVR = 0.032
-TRUE_TREATMENT_LIFT = 0.004
-BASELINE_AOV_MEAN = 68.0
-BASELINE_AOV_STD = 32.0
-
-DEVICE_PROBS = {'desktop': 0.42, 'mobile': 0.45, 'tablet': 0.13}
-DEVICE_CVR_MULT = {'desktop': 1.15, 'mobile': 0.82, 'tablet': 1.05}
-SOURCE_PROBS = {'organic': 0.35, 'paid_search': 0.28, 'social': 0.18, 'email': 0.12, 'direct': 0.07}
-
-DOW_TRAFFIC_MULT = [1.0, 0.97, 0.95, 1.02, 1.08, 1.15, 1.05]
-
-NOVELTY_PEAK = 0.003
-NOVELTY_HALFLIFE = 4
-
-def _novelty_effect(day_index):
-    return NOVELTY_PEAK * np.exp(-np.log(2) * day_index / NOVELTY_HALFLIFE)
-
-def generate_user_pool(n_users):
-    """
-    Pool of unique users with persistent attributes.
-    """
-    print(f"Initializing pool of {n_users:,} unique users")
-    
-    user_ids = [f'U{i:07d}' for i in range(1, n_users + 1)]
-    
-    # User Split
-    groups = RNG.choice(['control', 'treatment'], size=n_users, p=[0.5, 0.5])
-    
-    # Device Logic
-    pref_devices = RNG.choice(list(DEVICE_PROBS.keys()), size=n_users, p=list(DEVICE_PROBS.values()))
-  
-    activity_scores = RNG.beta(a=0.5, b=3.0, size=n_users)
-    activity_scores = activity_scores / activity_scores.mean() 
-    
-    return pd.DataFrame({
-        'user_id': user_ids,
-        'group': groups,
-        'preferred_device': pref_devices,
-        'activity_score': activity_scores
-    })
-
-def generate_dataset():
-    users_df = generate_user_pool(N_UNIQUE_USERS)
-    records = []
-    
-    #  Simulation Loop
-    for day_idx in range(N_DAYS):
-        date = START_DATE + pd.Timedelta(days=day_idx)
-        dow = date.dayofweek
-        base_sessions = (TARGET_TOTAL_SESSIONS / N_DAYS)
-        daily_target = int(RNG.poisson(base_sessions * DOW_TRAFFIC_MULT[dow]))
-        
-        # Select Users for this Day
-        # Sample users based on their 'activity_score'
-        # This creates a "returning user" patterns
-        probs = users_df['activity_score'].values
-        probs /= probs.sum()
-        
-        daily_user_indices = RNG.choice(
-            users_df.index, 
-            size=daily_target, 
-            p=probs, 
-            replace=True
-        )
-        
-        daily_users = users_df.loc[daily_user_indices].copy()
-        
-        # Session Details
-        for _, user in daily_users.iterrows():
-            if RNG.random() < 0.85:
-                device = user['preferred_device']
-            else:
-                device = RNG.choice(list(DEVICE_PROBS.keys()))
-            
-            source = RNG.choice(list(SOURCE_PROBS.keys()), p=list(SOURCE_PROBS.values()))
-
-            cvr = BASELINE_CVR * DEVICE_CVR_MULT[device]
-            
-            #  Treatment Effect
-            if user['group'] == 'treatment':
-                cvr += TRUE_TREATMENT_LIFT
-                cvr += _novelty_effect(day_idx)
-            
-            converted = int(RNG.random() < cvr)
-
-            revenue = 0.0
-            if converted:
-                aov = RNG.normal(BASELINE_AOV_MEAN, BASELINE_AOV_STD)
-                revenue = round(max(aov, 5.0), 2)
-            
-            # Timestamps
-            hour = RNG.choice(24, p=[0.01]*6 + [0.05]*6 + [0.08]*6 + [0.02]*6)
-            ts = date + pd.Timedelta(hours=int(hour), minutes=RNG.integers(0, 60))
-            
-            records.append({
-                'user_id': user['user_id'],
-                'timestamp': ts,
-                'group': user['group'],
-                'device': device,
-                'traffic_source': source,
-                'converted': converted,
-                'revenue': revenue
-            })
-
-    df = pd.DataFrame(records)
-    df = df.sort_values('timestamp').reset_index(drop=True)
-    
-    return df
+from src.profiling import lap
+from src.simulation import (
+    SEED, N_DAYS, TARGET_TOTAL_SESSIONS, AVG_SESSIONS_PER_USER, generate_dataset, generate_pre_period,
+    write_pre_period, write_sessions,
+)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=N_DAYS)
+    parser.add_argument('--sessions', type=int, default=TARGET_TOTAL_SESSIONS,
+                        help='target total sessions over the whole experiment')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--legacy', action='store_true',
+                        help='use the slow per-row reference loop (same model, different draws)')
+    parser.add_argument('--partitioned', action='store_true',
+                        help='stream timestamp-sorted chunks to data/ab_test_data/ (and the pre-period '
+                             'to data/ab_test_pre_period/) with bounded memory')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='file format for --partitioned output')
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000,
+                        help='approximate sessions per partition file')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='generate days in parallel processes (output is identical for any count)')
+    parser.add_argument('--pre-days', type=int, default=14,
+                        help='also write this many pre-experiment days (CUPED covariates); 0 to skip')
+    parser.add_argument('--propensity-shape', type=float, default=None,
+                        help='opt into a per-user Gamma conversion propensity shared with the '
+                             'pre-period (CUPED demos); off by default')
+    args = parser.parse_args()
+
     out_dir = Path('data')
     out_dir.mkdir(exist_ok=True)
-    
-    df = generate_dataset()
+
+    print(f"Initializing pool of {int(args.sessions / AVG_SESSIONS_PER_USER):,} unique users")
+    if args.partitioned:
+        lap('01 partitioned')
+        n = write_sessions(out_dir / 'ab_test_data', fmt=args.format, n_days=args.days,
+                           target_total_sessions=args.sessions, seed=args.seed,
+                           chunk_rows=args.chunk_rows, workers=args.workers,
+                           propensity_shape=args.propensity_shape)
+        print(f"Generated {n:,} sessions → {out_dir / 'ab_test_data'}/")
+        if args.pre_days:
+            lap('01 pre-period')
+            n = write_pre_period(out_dir / 'ab_test_pre_period', fmt=args.format, pre_days=args.pre_days,
+                                 n_days=args.days, target_total_sessions=args.sessions, seed=args.seed,
+                                 chunk_rows=args.chunk_rows, workers=args.workers,
+                                 propensity_shape=args.propensity_shape)
+            print(f"Generated {n:,} pre-period sessions over {args.pre_days} days → "
+                  f"{out_dir / 'ab_test_pre_period'}/")
+        sys.exit(0)
+
+    lap('01 generate')
+    df = generate_dataset(n_days=args.days, target_total_sessions=args.sessions,
+                          seed=args.seed, legacy=args.legacy, workers=args.workers,
+                          propensity_shape=args.propensity_shape)
+    lap('01 write csv')
     df.to_csv(out_dir / 'ab_test_data.csv', index=False)
-    
+    if args.pre_days and args.legacy:
+        print("Skipping the pre-period: --legacy only generates the experiment itself.")
+    elif args.pre_days:
+        lap('01 pre-period')
+        pre = generate_pre_period(pre_days=args.pre_days, n_days=args.days, target_total_sessions=args.sessions,
+                                  seed=args.seed, workers=args.workers,
+                                  propensity_shape=args.propensity_shape)
+        pre.to_csv(out_dir / 'ab_test_pre_period.csv', index=False)
+        print(f"Generated {len(pre):,} pre-period sessions over {args.pre_days} days.")
+
+    lap('01 summary')
     print(f"Generated {len(df):,} sessions.")
     print(f"Unique Users: {df['user_id'].nunique():,}")
     print(f"Avg Sessions/User: {len(df)/df['user_id'].nunique():.2f}")
-    
+
     multi_session_users = df['user_id'].value_counts()
     print(f"Users with >1 session: {(multi_session_users > 1).sum():,} ({(multi_session_users > 1).mean():.1%})")
@@ -3,142 +3,200 @@ import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from scipy import stats
-from src.data_utils import load_ab_data, add_derived_features
 from src.stats_utils import (
-    required_sample_size, run_proportion_ztest, compute_confidence_interval,
-    compute_lift_ci, cohens_h, run_mannwhitney, bootstrap_mean_diff,
+    run_proportion_ztest, compute_confidence_interval,
+    compute_lift_ci, cohens_h, run_mannwhitney, bootstrap_ci, sufficient_stats,
+    sufficient_bootstrap_mean_diff, permutation_test,
 )
+from src.online import rollup_summary
+from src.pipeline import run_stage
+from src.profiling import lap
+from src.reporting import cumulative_rates, plot_cumulative_cvr, plot_lift_ci, render_figures
+from src.planning import (
+    build_power_table, load_power_table, daily_traffic, plan_experiment, planned_sample_size,
+)
+from src.segments import segment_analysis
+from src.sequential import msprt_test, group_sequential_test
+from src.cuped import cuped_analysis, load_covariates
+from src.user_level import user_aggregates, user_level_analysis, cluster_bootstrap_ci
 
 # laod and setup
-sns.set_theme(style='whitegrid', palette='muted', font_scale=1.1)
 FIGDIR = os.path.join(os.path.dirname(__file__), '..', 'assets')
 
-df = load_ab_data(os.path.join(os.path.dirname(__file__), '..', 'data', 'ab_test_data.csv'))
-df = add_derived_features(df)
-
-ctrl = df[df.group == 'control']
-treat = df[df.group == 'treatment']
-
-# Power analysis
-baseline_cvr = ctrl.converted.mean()
-print("Pre Experiment Power Analysis")
-for mde in [0.003, 0.004, 0.005]:
-    n = required_sample_size(0.032, mde, alpha=0.05, power=0.80)
-    print(f"To detect +{mde:.1%} lift:\n Need {n:,} per group (~{n/1750:.0f} days at 1,750/group/day)\n")
-
-print(f"\n Actual per-group sample: {min(len(ctrl), len(treat)):,}\nWith 80% power we can detect ≥ 0.4 pp lift")
-
-
-#Conversion Rate Analysis
-stats_df = df.groupby('group')['converted'].agg(['count', 'sum', 'mean'])
-n_ctrl, n_treat = stats_df.loc['control', 'count'], stats_df.loc['treatment', 'count']
-conv_ctrl, conv_treat = stats_df.loc['control', 'sum'], stats_df.loc['treatment', 'sum']
-cvr_ctrl, cvr_treat = stats_df.loc['control', 'mean'], stats_df.loc['treatment', 'mean']
-
-print(f"  Control:   {cvr_ctrl:.4f}  ({conv_ctrl}/{n_ctrl})")
-print(f"  Treatment: {cvr_treat:.4f}  ({conv_treat}/{n_treat})")
-print(f"  Absolute lift: {(cvr_treat - cvr_ctrl)*100:.2f} pp")
-print(f"  Relative lift: {(cvr_treat - cvr_ctrl) / cvr_ctrl * 100:.1f}%")
-
-# z-test and p val
-z_stat, p_value = run_proportion_ztest([conv_treat, conv_ctrl], [n_treat, n_ctrl])
-print(f"\n  z-statistic: {z_stat:.3f}\n  p-value:{p_value:.5f}")
-
-# confidence int per gorup
-ci_ctrl = compute_confidence_interval(conv_ctrl, n_ctrl)
-ci_treat = compute_confidence_interval(conv_treat, n_treat)
-print(f"  Control 95% CI:   [{ci_ctrl[0]:.4f}, {ci_ctrl[1]:.4f}]")
-print(f"  Treatment 95% CI: [{ci_treat[0]:.4f}, {ci_treat[1]:.4f}]")
-
-diff, diff_lo, diff_hi = compute_lift_ci(cvr_ctrl, cvr_treat, n_ctrl, n_treat)
-print(f"  Lift 95% CI: [{diff_lo*100:.2f} pp, {diff_hi*100:.2f} pp]")
-
-h = cohens_h(cvr_treat, cvr_ctrl)
-print(f"  Cohen's h: {h:.4f} (small = 0.2, medium = 0.5)")
-
-print(f"\n  → {'REJECT' if p_value < 0.05 else 'FAIL TO REJECT'} H₀ at α=0.05")
-
-
-# Revenue per Session analysis
-print("\n=== Secondary Metric: Revenue per Session ===")
-print(f"  Control mean:    ${ctrl.revenue.mean():.4f}")
-print(f"  Treatment mean: ${treat.revenue.mean():.4f}")
-
-# Mann-Whitney + bootstrap
-mw_stat, mw_p = run_mannwhitney(ctrl.revenue, treat.revenue)
-print(f"  Mann-Whitney p-value: {mw_p:.5f}")
-
-boot_diff, boot_lo, boot_hi = bootstrap_mean_diff(ctrl.revenue.values, treat.revenue.values, n_boot=10000)
-print(f"  Bootstrap mean diff: ${boot_diff:.4f}\n  Bootstrap 95% CI:    [${boot_lo:.4f}, ${boot_hi:.4f}]")
-
-
-#AOV analysis
-aov_ctrl = ctrl.loc[ctrl.converted == 1, 'revenue']
-aov_treat = treat.loc[treat.converted == 1, 'revenue']
-
-print(f"  Control AOV:   ${aov_ctrl.mean():.2f} (n={len(aov_ctrl)})")
-print(f"  Treatment AOV: ${aov_treat.mean():.2f} (n={len(aov_treat)})")
-
-t_stat, t_p = stats.ttest_ind(aov_ctrl, aov_treat, equal_var=False)
-print(f" Welch's t-test p-value: {t_p:.4f}")
-print(f" AOV difference is {'significant' if t_p < 0.05 else 'NOT significant'} at α=0.05")
-
-
-
-#Robustness
-
-#Bonferroni correction 
-bonferroni_alpha = 0.05 / 3
-print(f"\n  Bonferroni adjusted α: {bonferroni_alpha:.4f}")
-print(f"  Primary CVR p={p_value:.5f} → {'significant' if p_value < bonferroni_alpha else 'NOT significant'} after correction")
-
-# consistancy by device
-dev_stats = df.groupby(['device', 'group'])['converted'].mean().unstack()
-for dev, row in dev_stats.iterrows():
-    lift = row['treatment'] - row['control']
-    print(f" {dev:>8}: control={row['control']:.4f}  treat={row['treatment']:.4f}  lift={lift*100:+.2f} pp")
-
-# time check
-midpoint = df.date.unique()[len(df.date.unique()) // 2]
-for label, sub in [('First half', df[df.date <= midpoint]), ('Second half', df[df.date > midpoint])]:
-    c, t = sub.groupby('group')['converted'].mean()[['control', 'treatment']]
-    print(f"  {label}: control={c:.4f}  treat={t:.4f}  lift={((t-c)*100):+.2f} pp")
-
-# sanity check
-observed_diff = cvr_treat - cvr_ctrl
-pool = df.converted.values
-perm_diffs = [np.random.permutation(pool)[:n_treat].mean() - np.random.permutation(pool)[n_treat:].mean() for _ in range(10000)]
-perm_p = np.mean(np.abs(perm_diffs) >= np.abs(observed_diff))
-print(f"  Permutation p-value: {perm_p:.4f}")
-
-
-#Vizualisations
-fig, ax = plt.subplots(figsize=(8, 4))
-ax.errorbar([diff * 100], ['CVR (pp)'], xerr=[[diff * 100 - diff_lo * 100], [diff_hi * 100 - diff * 100]], 
-            fmt='o', color='#E07B54', capsize=6, ms=8, lw=2)
-ax.axvline(0, color='gray', ls='--', lw=1)
-ax.set(xlabel='Treatment Effect (percentage points)', title='Primary Metric — Treatment Lift with 95% CI')
-plt.tight_layout()
-plt.savefig(os.path.join(FIGDIR, 'lift_ci_plot.png'), dpi=150, bbox_inches='tight')
-plt.close()
-print("\n Saved lift_ci_plot.png")
-
+if __name__ == '__main__':
+    lap('03 load')
+    DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'ab_test_data.csv')
+    df = run_stage('features', DATA_PATH)
+    cells = run_stage('aggregates', DATA_PATH)
 
-# Cumulative CR 
-daily = df.groupby(['date', 'group']).agg(n=('user_id', 'count'), conv=('converted', 'sum')).reset_index().sort_values('date')
-daily[['cum_n', 'cum_conv']] = daily.groupby('group')[['n', 'conv']].cumsum()
-daily['cum_cvr'] = daily['cum_conv'] / daily['cum_n']
+    ctrl = df[df.group == 'control']
+    treat = df[df.group == 'treatment']
 
-fig, ax = plt.subplots(figsize=(10, 5))
-sns.lineplot(data=daily, x='date', y=daily['cum_cvr'] * 100, hue='group', palette={'control': '#5B8DB8', 'treatment': '#E07B54'}, marker='o', ax=ax)
-ax.set(ylabel='Cumulative CVR (%)', title='Cumulative Conversion Rate Over Experiment Duration')
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.savefig(os.path.join(FIGDIR, 'cumulative_cvr.png'), dpi=150, bbox_inches='tight')
-plt.close()
-print("Saved cumulative_cvr.png")
+    lap('03 power analysis')
+    # Power analysis (durations from the observed traffic, not an assumed rate)
+    baseline_cvr = ctrl.converted.mean()
+    per_day = daily_traffic(df).mean()
+    table_dir = os.path.join(os.path.dirname(__file__), '..', 'data', '.cache', 'power_table')
+    table = (load_power_table(table_dir) if os.path.exists(os.path.join(table_dir, 'meta.json'))
+             else build_power_table(table_dir))
+    print("Pre Experiment Power Analysis")
+    for _, row in plan_experiment(0.032, [0.003, 0.004, 0.005], per_day, table=table).iterrows():
+        print(f"To detect +{row.mde:.1%} lift:\n Need {row.n_per_group:,.0f} per group "
+              f"(~{row.days:.0f} days at {per_day:,.0f}/group/day)\n")
 
-print("\n  Analysis Complete ")
+    print(f"\n Actual per-group sample: {min(len(ctrl), len(treat)):,}\nWith 80% power we can detect ≥ 0.4 pp lift")
+
+
+    lap('03 cvr tests')
+    #Conversion Rate Analysis
+    stats_df = rollup_summary(cells, ['group'])
+    n_ctrl, n_treat = stats_df.loc['control', 'sessions'], stats_df.loc['treatment', 'sessions']
+    conv_ctrl, conv_treat = stats_df.loc['control', 'conversions'], stats_df.loc['treatment', 'conversions']
+    cvr_ctrl, cvr_treat = conv_ctrl / n_ctrl, conv_treat / n_treat
+
+    print(f"  Control:   {cvr_ctrl:.4f}  ({conv_ctrl}/{n_ctrl})")
+    print(f"  Treatment: {cvr_treat:.4f}  ({conv_treat}/{n_treat})")
+    print(f"  Absolute lift: {(cvr_treat - cvr_ctrl)*100:.2f} pp")
+    print(f"  Relative lift: {(cvr_treat - cvr_ctrl) / cvr_ctrl * 100:.1f}%")
+
+    # z-test and p val
+    z_stat, p_value = run_proportion_ztest([conv_treat, conv_ctrl], [n_treat, n_ctrl])
+    print(f"\n  z-statistic: {z_stat:.3f}\n  p-value:{p_value:.5f}")
+
+    # confidence int per gorup
+    ci_ctrl = compute_confidence_interval(conv_ctrl, n_ctrl)
+    ci_treat = compute_confidence_interval(conv_treat, n_treat)
+    print(f"  Control 95% CI:   [{ci_ctrl[0]:.4f}, {ci_ctrl[1]:.4f}]")
+    print(f"  Treatment 95% CI: [{ci_treat[0]:.4f}, {ci_treat[1]:.4f}]")
+
+    diff, diff_lo, diff_hi = compute_lift_ci(cvr_ctrl, cvr_treat, n_ctrl, n_treat)
+    print(f"  Lift 95% CI: [{diff_lo*100:.2f} pp, {diff_hi*100:.2f} pp]")
+
+    h = cohens_h(cvr_treat, cvr_ctrl)
+    print(f"  Cohen's h: {h:.4f} (small = 0.2, medium = 0.5)")
+
+    print(f"\n  → {'REJECT' if p_value < 0.05 else 'FAIL TO REJECT'} H₀ at α=0.05")
+
+
+    lap('03 revenue tests')
+    # Revenue per Session analysis
+    print("\n=== Secondary Metric: Revenue per Session ===")
+    print(f"  Control mean:    ${ctrl.revenue.mean():.4f}")
+    print(f"  Treatment mean: ${treat.revenue.mean():.4f}")
+
+    lap('03 revenue resampling')
+    # Mann-Whitney + bootstrap
+    mw_stat, mw_p = run_mannwhitney(ctrl.revenue, treat.revenue)
+    print(f"  Mann-Whitney p-value: {mw_p:.5f}")
+
+    # Resampling on sufficient statistics: session count + nonzero revenues per arm
+    rev_ctrl, rev_treat = sufficient_stats(ctrl.revenue.values), sufficient_stats(treat.revenue.values)
+    boot_diff, boot_lo, boot_hi = sufficient_bootstrap_mean_diff(rev_ctrl, rev_treat, n_boot=10000)
+    print(f"  Bootstrap mean diff: ${boot_diff:.4f}\n  Bootstrap 95% CI:    [${boot_lo:.4f}, ${boot_hi:.4f}]")
+
+
+    lap('03 aov tests')
+    #AOV analysis
+    aov_ctrl = ctrl.loc[ctrl.converted == 1, 'revenue']
+    aov_treat = treat.loc[treat.converted == 1, 'revenue']
+
+    print(f"  Control AOV:   ${aov_ctrl.mean():.2f} (n={len(aov_ctrl)})")
+    print(f"  Treatment AOV: ${aov_treat.mean():.2f} (n={len(aov_treat)})")
+
+    t_stat, t_p = stats.ttest_ind(aov_ctrl, aov_treat, equal_var=False)
+    print(f" Welch's t-test p-value: {t_p:.4f}")
+    print(f" AOV difference is {'significant' if t_p < 0.05 else 'NOT significant'} at α=0.05")
+
+    # AOV as a ratio metric (revenue / orders) over all sessions, BCa interval
+    aov_diff, aov_lo, aov_hi = bootstrap_ci((ctrl.revenue.values, ctrl.converted.values),
+                                            (treat.revenue.values, treat.converted.values),
+                                            statistic='ratio', method='bca')
+    print(f" AOV diff: ${aov_diff:.2f}  bootstrap BCa 95% CI: [${aov_lo:.2f}, ${aov_hi:.2f}]")
+
+
+
+    lap('03 robustness')
+    #Robustness
+
+    #Bonferroni correction 
+    bonferroni_alpha = 0.05 / 3
+    print(f"\n  Bonferroni adjusted α: {bonferroni_alpha:.4f}")
+    print(f"  Primary CVR p={p_value:.5f} → {'significant' if p_value < bonferroni_alpha else 'NOT significant'} after correction")
+
+    # consistancy by device (Holm-adjusted across segments)
+    def print_segments(seg):
+        for key, row in seg.iterrows():
+            print(f" {str(key):>11}: control={row.cvr_control:.4f}  treat={row.cvr_treatment:.4f}  "
+                  f"lift={row.lift*100:+.2f} pp [{row.lift_lo*100:+.2f}, {row.lift_hi*100:+.2f}]  "
+                  f"p_adj={row.p_adjusted:.4f}")
+
+    print_segments(segment_analysis(df, ['device']))
+
+    # time check
+    midpoint = df.date.unique()[len(df.date.unique()) // 2]
+    df['period'] = np.where(df.date <= midpoint, 'First half', 'Second half')
+    print_segments(segment_analysis(df, ['period']))
+
+    lap('03 segment grid')
+    # Device × traffic source grid, BH-corrected (finer cuts such as day_of_week × hour
+    # are too thin at this sample size to clear min_sessions)
+    grid = segment_analysis(df, ['device', 'traffic_source'], correction='fdr_bh')
+    print(f"  {len(grid):,} device × source cells, {grid.p_adjusted.notna().sum():,} testable, "
+          f"{int(grid.significant.sum())} significant after BH")
+
+    lap('03 user-level')
+    # Randomisation is per user: re-test with users as the independent unit
+    users = user_aggregates(df)
+    user_tests = user_level_analysis(df)
+    for metric, row in user_tests.iterrows():
+        print(f"  User-level {metric}: diff={row['diff']:.4f} [{row.ci_lo:.4f}, {row.ci_hi:.4f}]  p={row.p_value:.5f}")
+    print(f"  CVR design effect: {user_tests.loc['cvr', 'design_effect']:.3f} "
+          f"({len(users):,} users, {len(df) / len(users):.2f} sessions/user)")
+    _, cb_lo, cb_hi = cluster_bootstrap_ci(users, 'cvr')
+    print(f"  Cluster bootstrap CVR lift 95% CI: [{cb_lo*100:.2f} pp, {cb_hi*100:.2f} pp]")
+
+    lap('03 cuped')
+    # CUPED: same tests adjusted for each user's pre-experiment behaviour
+    pre_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'ab_test_pre_period.csv')
+    if os.path.exists(pre_path):
+        cuped = cuped_analysis(df, load_covariates(pre_path))
+        for metric, row in cuped.iterrows():
+            print(f"  CUPED {metric}: diff={row['diff']:.4f} [{row.ci_lo:.4f}, {row.ci_hi:.4f}]  p={row.p_value:.5f}  "
+                  f"variance reduction={row.variance_reduction:.1%}")
+    else:
+        print("  CUPED skipped: run 01_generate_data.py with --pre-days to create the pre-period slice")
+
+    lap('03 permutation')
+    # sanity check
+    _, perm_p = permutation_test(ctrl.converted.values, treat.converted.values)
+    print(f"  Permutation p-value (exact): {perm_p:.5f}")
+    _, rev_perm_p = permutation_test(ctrl.revenue.values, treat.revenue.values, n_perm=10000)
+    print(f"  Revenue/session permutation p-value: {rev_perm_p:.4f}")
+
+
+    lap('03 sequential')
+    # Interim looks: what a daily sequential monitor would have decided
+    daily_agg = rollup_summary(cells, ['date', 'group'])
+    msprt = msprt_test(daily_agg, mde=0.004)
+    gst = group_sequential_test(daily_agg, planned_sessions=2 * planned_sample_size(0.032, 0.004))
+    for name, looks in [('mSPRT (always valid)', msprt), ("O'Brien-Fleming", gst)]:
+        stops = looks.index[looks['decision'] == 'stop: reject H0']
+        first = f"{stops[0].date()} (day {looks.index.get_loc(stops[0]) + 1})" if len(stops) else 'never'
+        print(f"  {name}: first stop for efficacy {first}")
+    print(f"  mSPRT final always-valid p={msprt['always_valid_p'].iloc[-1]:.5f}, "
+          f"95% CS [{msprt['cs_lo'].iloc[-1]*100:.2f} pp, {msprt['cs_hi'].iloc[-1]*100:.2f} pp]")
+
+
+    lap('03 figures')
+    #Vizualisations (cumulative CVR from the date × group roll-up; figures render in parallel)
+    cumulative = cumulative_rates(daily_agg)
+    figures = [
+        (plot_lift_ci, {'diff': diff, 'diff_lo': diff_lo, 'diff_hi': diff_hi,
+                        'path': os.path.join(FIGDIR, 'lift_ci_plot.png')}),
+        (plot_cumulative_cvr, {'cumulative': cumulative, 'path': os.path.join(FIGDIR, 'cumulative_cvr.png')}),
+    ]
+    for path in render_figures(figures, workers=os.cpu_count()):
+        print(f"Saved {os.path.basename(path)}")
+
+    print("\n  Analysis Complete ")
@@ -1,35 +1,33 @@
 """Business Recommendations & Impact Sizing"""
 
 import sys, os
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.data_utils import load_ab_data
+import pandas as pd
+from src.online import segment_results
+from src.pipeline import run_stage
+from src.profiling import lap
 
 # config
 DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'ab_test_data.csv')
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), '..', 'assets')
 
-LIFT_SCENARIOS = {
-    'Conservative (Lower Bound)': 0.0027, 
-    'Expected (Point Estimate)':  None,  
-    'Optimistic (Upper Bound)':   0.0079  
-}
-
-# Load data
-df = load_ab_data(DATA_PATH)
-control_group = df[df.group == 'control']
-treatment_group = df[df.group == 'treatment']
+lap('04 load')
+# Test results and projections come from the cached pipeline (same numbers as 03)
+results = run_stage('tests', DATA_PATH)
+projection = run_stage('projections', DATA_PATH)
+aggregates = run_stage('aggregates', DATA_PATH)
+devices = segment_results(aggregates, 'device')
+dates = aggregates.index.get_level_values('date')
+weeks = segment_results(aggregates.set_index(pd.Index((dates - dates.min()).days // 7 + 1, name='week'),
+                                             append=True), 'week')
 
 # Metrics
-baseline_cvr = control_group.converted.mean()
-new_cvr = treatment_group.converted.mean()
-actual_lift = new_cvr - baseline_cvr
-LIFT_SCENARIOS['Expected (Point Estimate)'] = actual_lift
-average_order_value = df.loc[df.converted == 1, 'revenue'].mean()
-daily_sessions = len(df) / df.timestamp.dt.date.nunique()
-annual_sessions = daily_sessions * 365
+baseline_cvr = results['cvr_control']
+actual_lift = results['cvr_diff']
+average_order_value = projection['average_order_value']
+annual_sessions = projection['annual_sessions']
 
+lap('04 projections')
 # Financial Modeling
 print("BUSINESS IMPACT PROJECTION — Annual Basis")
 print(f"\nKey Assumptions:")
@@ -39,13 +37,11 @@ print(f"  • Current Conversion Rate: {baseline_cvr:.2%}")
 print(f"\n{'Scenario':<30} {'Extra Orders':>15} {'Revenue Uplift':>18}")
 print("-" * 65)
 
-# Revenue Impact: formula (Sessions * Increase in CVR * Value per Order)
+# Revenue Impact: formula (Sessions * Increase in CVR * Value per Order); lift CI bounds from the z-test
 projections = {}
-for label, lift_pp in LIFT_SCENARIOS.items():
-    extra_orders = annual_sessions * lift_pp
-    revenue_impact = extra_orders * average_order_value
-    projections[label] = revenue_impact  
-    print(f"{label:<30} {extra_orders:>15,.0f} {revenue_impact:>17,.0f}$")
+for label, row in projection['scenarios'].iterrows():
+    projections[label] = row.revenue_impact
+    print(f"{label:<30} {row.extra_orders:>15,.0f} {row.revenue_impact:>17,.0f}$")
   
 print("-" * 65)
 print(f"EXPECTED ANNUAL UPLIFT: ${projections['Expected (Point Estimate)']:,.0f}")
@@ -55,14 +51,35 @@ print(f"EXPECTED ANNUAL UPLIFT: ${projections['Expected (Point Estimate)']:,.0f}
 print("\Risk Assessment")
 risks = [
     ("Statistical Significance", "p < 0.001 (High confidence)"),
-    ("Temporal Stability", "Lift was consistent across all 3 weeks"),
     ("Average Order Value", "No negative impact on basket size"),
-    ("Tablet Segment", "Showed negative lift (small sample size)"),
-    ("Novelty Effect", "Initial spike faded, but lift remained positive")
 ]
-
-for icon, area, note in risks:
-    print(f"  {icon} {area:<25} : {note}")
+# Weekly lines follow the data too: first vs last week shows any novelty fade
+weekly_lifts = ', '.join(f"{row.cvr_diff:+.2%}" for row in weeks.itertuples())
+unstable = weeks.index[weeks.cvr_diff_lo <= 0]
+risks.append(("Temporal Stability",
+              f"Lift positive in all {len(weeks)} weeks ({weekly_lifts})" if not len(unstable) else
+              f"Weekly lifts {weekly_lifts}; CI includes zero in week {', '.join(map(str, unstable))}"))
+first, last = weeks.iloc[0], weeks.iloc[-1]
+if last.cvr_diff < first.cvr_diff:
+    novelty = (f"Lift faded from {first.cvr_diff:+.2%} in week 1 to {last.cvr_diff:+.2%} in week {len(weeks)}"
+               f"{', but remained positive' if last.cvr_diff > 0 else ', and is no longer positive'}")
+else:
+    novelty = f"No fade: {first.cvr_diff:+.2%} in week 1, {last.cvr_diff:+.2%} in week {len(weeks)}"
+
+# Segment lines follow the data: a CI that reaches zero is flagged as inconclusive
+device_share = (devices.sessions_control + devices.sessions_treatment) / (
+    devices.sessions_control + devices.sessions_treatment).sum()
+confirmed = devices.index[devices.cvr_diff_lo > 0]
+unconfirmed = devices.index[devices.cvr_diff_lo <= 0]
+for device, row in devices.iterrows():
+    verdict = "positive" if row.cvr_diff_lo > 0 else "inconclusive, CI includes zero"
+    risks.append((f"{device.title()} Segment",
+                  f"{row.cvr_diff:+.2%} lift [{row.cvr_diff_lo:+.2%}, {row.cvr_diff_hi:+.2%}] "
+                  f"({verdict}, {device_share[device]:.0%} of traffic)"))
+risks.append(("Novelty Effect", novelty))
+
+for area, note in risks:
+    print(f"  {area:<25} : {note}")
 
 
 #  Recommendations
@@ -70,9 +87,11 @@ print("\n Recommendation")
 print("DECISION: Implement the new single page checkout\n")
 
 rationale = [
-    "Primary Goal Met: +0.53% lift in conversion rate (16.7% relative improvement).",
-    "Financial Impact: Direct revenue gain of $0.32 per session.",
-    "User Consistency: Positive effect on Desktop and Mobile (>87% of traffic).",
+    f"Primary Goal Met: +{actual_lift:.2%} lift in conversion rate "
+    f"({actual_lift / baseline_cvr:.1%} relative improvement).",
+    f"Financial Impact: Direct revenue gain of ${results['rps_treatment'] - results['rps_control']:.2f} per session.",
+    f"User Consistency: Positive effect on {' and '.join(d.title() for d in confirmed)} "
+    f"({device_share[confirmed].sum():.0%} of traffic).",
     "Safe Change: Increased orders without lowering average order value."
 ]
 
@@ -83,10 +102,14 @@ for i, point in enumerate(rationale, 1):
 print("\nNext Steps:")
 print("  1. Roll out to 100% traffic immediately.")
 print("  2. Keep a 5% holdback group for 2 weeks to validate long term lift.")
-print("  3. Investigate Tablet specific UX issues.")
+if len(unconfirmed):
+    print(f"  3. Investigate {' and '.join(d.title() for d in unconfirmed)} specific UX issues.")
 
 
-# Vizualisation
+lap('04 figures')
+# Vizualisation (matplotlib is only imported once the numbers are done)
+import matplotlib.pyplot as plt
+
 fig, ax = plt.subplots(figsize=(8, 4.5))
 labels = list(projections.keys())
 values = list(projections.values())
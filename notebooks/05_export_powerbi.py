@@ -1,17 +1,52 @@
 """
-Export data in Power BI-ready format (xlsx with dimension tables).
+Export data in Power BI-ready format.
+
+Default: star schema (fact_sessions part files + fact_daily + dim_date /
+dim_device / dim_source / dim_group) as Parquet or CSV with integer
+surrogate keys. --format xlsx keeps the original single-workbook export,
+which is limited to 1,048,576 rows.
 """
 
 import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import argparse
 import pandas as pd
-from src.data_utils import load_ab_data, add_derived_features
+from src.data_utils import load_ab_data
+from src.export import EXCEL_MAX_ROWS, write_star_schema
+from src.pipeline import run_stage
+from src.profiling import lap
+
+POWERBI_DIR = os.path.join(os.path.dirname(__file__), '..', 'powerbi')
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--format', choices=['parquet', 'csv', 'xlsx'], default='parquet')
+parser.add_argument('--rows-per-file', type=int, default=1_000_000,
+                    help='sessions per fact_sessions part file')
+parser.add_argument('--no-daily', action='store_true', help='skip the pre-aggregated fact_daily table')
+args = parser.parse_args()
+
+lap('05 load')
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'ab_test_data.csv')
+df = run_stage('features', DATA_PATH)
+
+lap('05 export')
+if args.format != 'xlsx':
+    out_dir = os.path.join(POWERBI_DIR, 'export')
+    counts = write_star_schema(df, out_dir, fmt=args.format, rows_per_file=args.rows_per_file,
+                               daily=not args.no_daily, cube=run_stage('cube', DATA_PATH))
+    for table, n in counts.items():
+        print(f"  {table:<14} {n:>12,} rows")
+    print(f"✓ Exported Power BI star schema → {out_dir}")
+    sys.exit(0)
 
-df = load_ab_data(os.path.join(os.path.dirname(__file__), '..', 'data', 'ab_test_data.csv'))
-df = add_derived_features(df)
+if len(df) >= EXCEL_MAX_ROWS:
+    sys.exit(f"{len(df):,} sessions exceed the xlsx row limit; use --format parquet or csv")
 
-out_path = os.path.join(os.path.dirname(__file__), '..', 'powerbi', 'ab_test_powerbi.xlsx')
+lap('05 xlsx export')
+# The compact frame holds integer codes (hashes for ids not of the 'U0000123' form): export the original ids
+df['user_id'] = load_ab_data(DATA_PATH, columns=['user_id'])['user_id'].to_numpy()
+out_path = os.path.join(POWERBI_DIR, 'ab_test_powerbi.xlsx')
 
 with pd.ExcelWriter(out_path, engine='openpyxl') as writer:
     # Fact table
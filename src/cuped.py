@@ -0,0 +1,155 @@
+"""CUPED / regression adjustment with pre-experiment covariates.
+
+Per-user covariates (prior sessions, conversions, revenue) are computed in
+one ``bincount`` pass over a pre-period slice and cached to disk keyed by
+user id. Metrics are linearised per user (delta method for ratios), then
+adjusted by their pooled within-arm regression on the covariates; the
+treatment − control difference keeps its meaning while its variance drops
+by the share the covariates explain.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from src.profiling import profiled
+from src.user_level import RATIO_METRICS, user_aggregates
+
+COVARIATE_COLUMNS = ['prior_sessions', 'prior_conversions', 'prior_revenue']
+
+# Per-user totals (denominator None = one unit per user) in addition to RATIO_METRICS
+USER_METRICS = {
+    'conversions_per_user': ('conversions', None),
+    'revenue_per_user': ('revenue', None),
+}
+
+
+def pre_period_covariates(pre_df):
+    """Prior sessions, conversions and revenue per user from pre-period sessions."""
+    users = user_aggregates(pre_df)
+    return pd.DataFrame({
+        'prior_sessions': users['sessions'].astype(float),
+        'prior_conversions': users['conversions'],
+        'prior_revenue': users['revenue'],
+    })
+
+
+def _source_key(path):
+    """Newest mtime, total size and file count of a sessions file or a directory of partition files."""
+    path = Path(path)
+    files = ([f for f in sorted(path.iterdir()) if f.suffix in ('.csv', '.parquet')] if path.is_dir()
+             else [path])
+    st = [f.stat() for f in files]
+    return {'files': len(st), 'mtime_ns': max((s.st_mtime_ns for s in st), default=0),
+            'size': sum(s.st_size for s in st)}
+
+
+def load_covariates(pre_path, cache_path=None):
+    """
+    Pre-period covariates for ``pre_path`` (sessions file or partition directory), cached by user id.
+
+    The cache (Parquet, or CSV without PyArrow) is keyed on the newest
+    mtime, total size and number of the pre-period files, stored next to it
+    as ``<cache>.json``; it is rebuilt whenever any of them changes, e.g.
+    when a partition is rewritten in place.
+    """
+    from src.data_utils import _has_pyarrow, load_ab_data
+
+    pre_path = Path(pre_path)
+    suffix = '.parquet' if _has_pyarrow() else '.csv'
+    cache_path = Path(cache_path) if cache_path else pre_path.with_name(f'{pre_path.stem}_covariates{suffix}')
+    key_path = cache_path.with_name(cache_path.name + '.json')
+    key = _source_key(pre_path)
+    try:
+        fresh = cache_path.exists() and json.loads(key_path.read_text()) == key
+    except (OSError, ValueError):
+        fresh = False
+    if fresh:
+        if cache_path.suffix == '.parquet':
+            return pd.read_parquet(cache_path)
+        return pd.read_csv(cache_path, index_col='user')
+
+    covariates = pre_period_covariates(load_ab_data(pre_path, columns=['user_id', 'group', 'converted',
+                                                                        'revenue'], compact=True))
+    if cache_path.suffix == '.parquet':
+        covariates.to_parquet(cache_path)
+    else:
+        covariates.to_csv(cache_path)
+    key_path.write_text(json.dumps(key))
+    return covariates
+
+
+def attach_covariates(users, covariates):
+    """Join covariates onto ``user_aggregates`` output by user id; users without history get 0."""
+    joined = covariates.reindex(users.index, fill_value=0.0)
+    return users.assign(**{col: joined[col].to_numpy(float) for col in covariates.columns})
+
+
+def _linearize(x, y):
+    """Per-user influence values of Σx/Σy (y=None: mean of x), with the point estimate."""
+    if y is None:
+        return x - x.mean(), x.mean()
+    ratio = x.sum() / y.sum()
+    return (x - ratio * y) / y.mean(), ratio
+
+
+def cuped_test(users, metric='cvr', covariates=COVARIATE_COLUMNS, alpha=0.05,
+               control='control', treatment='treatment'):
+    """
+    CUPED-adjusted treatment − control difference for a metric.
+
+    ``metric`` is a key of ``RATIO_METRICS``/``USER_METRICS`` or a
+    (numerator, denominator) pair of ``user_aggregates`` columns. θ is fitted
+    by least squares on the pooled, within-arm centred data. Returns a dict
+    with the unadjusted and adjusted difference, SE, CI and p-value, and the
+    variance reduction achieved.
+    """
+    numerator, denominator = {**RATIO_METRICS, **USER_METRICS}.get(metric, metric)
+    covariates = list(covariates)
+    arms = []
+    for name in (control, treatment):
+        sub = users[users['group'] == name]
+        if denominator is not None:
+            sub = sub[sub[denominator] > 0]
+        y = None if denominator is None else sub[denominator].to_numpy(float)
+        influence, estimate = _linearize(sub[numerator].to_numpy(float), y)
+        arms.append((estimate, influence, sub[covariates].to_numpy(float)))
+
+    centred = np.vstack([x - x.mean(axis=0) for _, _, x in arms])
+    theta = np.linalg.lstsq(centred, np.concatenate([inf for _, inf, _ in arms]), rcond=None)[0]
+    grand_mean = np.vstack([x for _, _, x in arms]).mean(axis=0)
+
+    raw_var = adj_var = 0.0
+    adjusted = []
+    for estimate, influence, x in arms:
+        n = len(influence)
+        residual = influence - (x - x.mean(axis=0)) @ theta
+        raw_var += influence.var(ddof=1) / n
+        adj_var += residual.var(ddof=1) / n
+        adjusted.append(estimate - (x.mean(axis=0) - grand_mean) @ theta)
+
+    diff_raw = arms[1][0] - arms[0][0]
+    diff = adjusted[1] - adjusted[0]
+    se = np.sqrt(adj_var)
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    return {
+        'metric': metric if isinstance(metric, str) else f'{numerator}/{denominator}',
+        'diff_unadjusted': diff_raw, 'se_unadjusted': np.sqrt(raw_var),
+        'p_value_unadjusted': 2 * stats.norm.sf(abs(diff_raw) / np.sqrt(raw_var)),
+        'diff': diff, 'se': se, 'ci_lo': diff - z_crit * se, 'ci_hi': diff + z_crit * se,
+        'p_value': 2 * stats.norm.sf(abs(diff) / se),
+        'variance_reduction': 1 - adj_var / raw_var,
+        **{f'theta_{col}': t for col, t in zip(covariates, theta)},
+    }
+
+
+@profiled
+def cuped_analysis(df, covariates, metrics=('cvr', 'revenue_per_session'), alpha=0.05,
+                   control='control', treatment='treatment'):
+    """``cuped_test`` for each metric on ``df`` joined to cached pre-period covariates, as a DataFrame."""
+    users = attach_covariates(user_aggregates(df, control, treatment), covariates)
+    rows = [cuped_test(users, m, list(covariates.columns), alpha, control, treatment) for m in metrics]
+    return pd.DataFrame(rows).set_index('metric')
@@ -1,38 +1,304 @@
 """Data loading and validation utilities."""
 
+import hashlib
+import os
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 
+from src.profiling import profiled
+
+CATEGORICAL_COLUMNS = ['group', 'device', 'traffic_source']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Compact user ids: 'U' and up to 18 digits, so the number fits in an int64
+USER_ID_PATTERN = r'^U[0-9]{1,18}$'
+
+# Parquet conversions of CSV inputs live here rather than next to the CSVs, so
+# converting never adds files to a data directory (and its pipeline fingerprint)
+PARQUET_CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / '.cache' / 'parquet'
+
+
+@profiled
+def convert_to_parquet(csv_path, parquet_path=None):
+    """One-off CSV → Parquet conversion with categorical dimension columns."""
+    csv_path = Path(csv_path)
+    parquet_path = Path(parquet_path) if parquet_path else csv_path.with_suffix('.parquet')
+    df = pd.read_csv(csv_path, parse_dates=['timestamp'],
+                     dtype={col: 'category' for col in CATEGORICAL_COLUMNS})
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written under a per-process name and renamed, so an interrupted conversion never looks current
+    tmp = parquet_path.with_suffix(f'.{os.getpid()}.tmp')
+    # Data is time-ordered, so small row groups let date filters skip most of the file
+    df.to_parquet(tmp, index=False, row_group_size=100_000)
+    os.replace(tmp, parquet_path)
+    return parquet_path
+
+
+def parquet_cache_path(csv_path):
+    """Location of the cached Parquet conversion of ``csv_path`` under ``PARQUET_CACHE_DIR``."""
+    csv_path = Path(csv_path).resolve()
+    tag = hashlib.blake2b(str(csv_path).encode(), digest_size=8).hexdigest()
+    return Path(PARQUET_CACHE_DIR) / f'{csv_path.stem}-{tag}.parquet'
+
+
+def _is_fresh(parquet, csv):
+    return parquet.exists() and os.path.getmtime(parquet) >= os.path.getmtime(csv)
+
+
+def _part_source(csv, parquet=None):
+    """Parquet for one part: ``parquet`` unless ``csv`` is newer, else the cached conversion."""
+    if csv is None or (parquet is not None and _is_fresh(parquet, csv)):
+        return parquet
+    cached = parquet_cache_path(csv)
+    if not _is_fresh(cached, csv):
+        convert_to_parquet(csv, cached)
+    return cached
+
+
+def _parquet_source(path):
+    """
+    Parquet file(s) backing ``path``, converting CSVs once if needed.
+
+    In a directory of partition files (see ``src.simulation.write_sessions``)
+    each part is resolved on its own: a ``.parquet`` part is used unless a
+    ``.csv`` part with the same name is newer, and CSV-only parts are read
+    from their cached conversion.
+    """
+    path = Path(path)
+    if path.is_dir():
+        parts = {}
+        for f in sorted(path.iterdir()):
+            if f.suffix in ('.csv', '.parquet'):
+                parts.setdefault(f.stem, {})[f.suffix] = f
+        return [_part_source(p.get('.csv'), p.get('.parquet')) for _, p in sorted(parts.items())]
+    if path.suffix == '.csv':
+        sibling = path.with_suffix('.parquet')
+        return [_part_source(path, sibling if sibling.exists() else None)]
+    return [path]
+
+
+def _read_parquet(files, columns, start, end):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset([str(f) for f in files], format='parquet')
+    ts_type = dataset.schema.field('timestamp').type
+    predicate = None
+    if start is not None:
+        predicate = ds.field('timestamp') >= pa.scalar(pd.Timestamp(start), type=ts_type)
+    if end is not None:
+        upper = ds.field('timestamp') < pa.scalar(pd.Timestamp(end), type=ts_type)
+        predicate = upper if predicate is None else predicate & upper
+    return dataset.to_table(columns=columns, filter=predicate).to_pandas()
+
+
+def _read_csv(path, columns, start, end):
+    path = Path(path)
+    files = sorted(path.glob('*.csv')) if path.is_dir() else [path]
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys(columns + (['timestamp'] if start or end else [])))
+    parse_dates = ['timestamp'] if usecols is None or 'timestamp' in usecols else False
+    df = pd.concat([pd.read_csv(f, usecols=usecols, parse_dates=parse_dates) for f in files],
+                   ignore_index=True)
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= df['timestamp'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['timestamp'] < pd.Timestamp(end)
+    if not mask.all():
+        df = df[mask].reset_index(drop=True)
+    return df[columns] if columns is not None else df
 
-def load_ab_data(path='data/ab_test_data.csv'):
-    df = pd.read_csv(path, parse_dates=['timestamp'])
+
+@profiled
+def load_ab_data(path='data/ab_test_data.csv', columns=None, start=None, end=None, storage='auto',
+                 compact=False):
+    """
+    Load session data, by default from a columnar Parquet copy.
+
+    A CSV is converted once to a Parquet file under ``PARQUET_CACHE_DIR``
+    (refreshed when the CSV is newer); directories of partition files are
+    read as one dataset.
+    Only ``columns`` are read, and the ``start <= timestamp < end`` filter is
+    pushed down to the Parquet reader so non-matching row groups are skipped.
+    ``group``, ``device`` and ``traffic_source`` come back as categoricals.
+    ``storage='csv'`` (or a missing pyarrow) reads the CSV directly.
+    ``compact=True`` returns the typed representation of ``compact_sessions``.
+    """
+    columns = list(columns) if columns is not None else None
+    if storage == 'csv' or (storage == 'auto' and not _has_pyarrow()):
+        df = _read_csv(path, columns, start, end)
+    elif storage in ('auto', 'parquet'):
+        df = _read_parquet(_parquet_source(path), columns, start, end)
+    else:
+        raise ValueError(f"Unknown storage: {storage!r} (expected 'auto', 'parquet' or 'csv')")
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if compact:
+        compact_sessions(df, inplace=True)
+    return df
+
+
+def split_user_ids(user_ids):
+    """
+    'U0000123' → 123 element by element.
+
+    Returns int64 codes and a boolean mask of the ids of that form; every
+    other id (including nulls) gets code 0 and ``False``. Uses Arrow string
+    kernels when pyarrow is installed (~20x faster than the pandas ``.str``
+    methods on object arrays).
+    """
+    ids = pd.Series(user_ids)
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        ids = ids.astype(object)
+    if _has_pyarrow():
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        try:
+            arr = pa.array(ids.to_numpy(object), type=pa.string())
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arr = pa.array(ids.astype(str).to_numpy(object), type=pa.string(), mask=ids.isna().to_numpy())
+        parsed = pc.fill_null(pc.match_substring_regex(arr, USER_ID_PATTERN), False)
+        digits = pc.if_else(parsed, pc.utf8_slice_codeunits(arr, 1), '0')
+        return (pc.cast(digits, pa.int64()).to_numpy(zero_copy_only=False, writable=True),
+                parsed.to_numpy(zero_copy_only=False))
+    text = ids.astype(str).where(ids.notna())
+    parsed = text.str.fullmatch(USER_ID_PATTERN[1:-1], na=False).to_numpy(bool)
+    codes = np.zeros(len(ids), np.int64)
+    codes[parsed] = text[parsed].str.slice(1).astype(np.int64).to_numpy()
+    return codes, parsed
+
+
+def encode_user_ids(user_ids):
+    """
+    Integer-encode user ids: 'U0000123' → 123, anything else hashed.
+
+    Each id is encoded on its own: U-form ids become their (non-negative)
+    number and every other id a hash with the sign bit set, so the two never
+    collide. The codes depend only on the id itself, never on which other
+    ids share the frame, so encoded frames from different periods join on
+    them. Integer ids are returned as they are.
+    """
+    ids = pd.Series(user_ids)
+    if pd.api.types.is_integer_dtype(ids):
+        return ids.to_numpy()
+    codes, parsed = split_user_ids(ids)
+    if parsed.all():
+        if len(codes) == 0 or codes.max() < np.iinfo(np.int32).max:
+            return codes.astype(np.int32)
+        return codes
+    other = ~parsed
+    hashed = pd.util.hash_array(ids[other].astype(object).to_numpy())
+    codes[other] = (hashed | np.uint64(1 << 63)).view(np.int64)
+    return codes
+
+
+@profiled
+def compact_sessions(df, inplace=False):
+    """
+    Memory-compact typed session frame.
+
+    ``user_id`` becomes an integer code (see ``encode_user_ids``), dimensions
+    become categoricals and ``converted`` int8; ``revenue`` stays float64 so
+    prices keep their exact cents. Derived ``date``/``day_of_week``/``hour``
+    columns are compacted the same way.
+    """
+    if not inplace:
+        df = df.copy()
+    if 'user_id' in df.columns:
+        df['user_id'] = encode_user_ids(df['user_id'])
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    if 'converted' in df.columns:
+        df['converted'] = df['converted'].astype(np.int8)
+    if 'revenue' in df.columns:
+        df['revenue'] = df['revenue'].astype(np.float64)
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    if 'day_of_week' in df.columns and not isinstance(df['day_of_week'].dtype, pd.CategoricalDtype):
+        df['day_of_week'] = pd.Categorical(df['day_of_week'], categories=DAY_NAMES, ordered=True)
+    if 'hour' in df.columns:
+        df['hour'] = _hour_codes(df['hour'])
     return df
 
 
-def validate_data(df):
-    """Run basic data quality checks; returns a dict of results."""
-    checks = {}
-    checks['total_rows'] = len(df)
-    checks['null_counts'] = df.isnull().sum().to_dict()
-    checks['duplicate_user_ids'] = df['user_id'].duplicated().sum()
-    checks['group_counts'] = df['group'].value_counts().to_dict()
-
-    # Sample ratio mismatch (SRM) test — chi-squared
-    observed = df['group'].value_counts().values
-    expected = np.full_like(observed, observed.sum() / len(observed), dtype=float)
-    from scipy.stats import chisquare
-    chi2, srm_p = chisquare(observed, f_exp=expected)
-    checks['srm_chi2'] = round(chi2, 4)
-    checks['srm_p_value'] = round(srm_p, 4)
-    checks['srm_flag'] = srm_p < 0.01
-
-    return checks
-
-
-def add_derived_features(df):
-    """Add columns useful for analysis."""
-    df = df.copy()
-    df['date'] = df['timestamp'].dt.date
-    df['day_of_week'] = df['timestamp'].dt.day_name()
-    df['hour'] = df['timestamp'].dt.hour
+def iter_ab_data(path='data/ab_test_data.csv', chunk_rows=1_000_000, columns=None):
+    """
+    Stream session data as DataFrame chunks of at most ``chunk_rows`` rows.
+
+    Reads a CSV or Parquet file, or a directory of partition files in
+    lexical (= timestamp) order, without loading the whole dataset; Parquet
+    is read batch by batch and CSVs are not converted.
+    """
+    path = Path(path)
+    files = (sorted(f for f in path.iterdir() if f.suffix in ('.csv', '.parquet')) if path.is_dir()
+             else [path])
+    for f in files:
+        if f.suffix == '.parquet':
+            import pyarrow.parquet as pq
+            # Dimension columns come back as categoricals straight from the dictionary pages
+            parquet = pq.ParquetFile(f, read_dictionary=CATEGORICAL_COLUMNS)
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+        else:
+            parse_dates = ['timestamp'] if columns is None or 'timestamp' in columns else False
+            for chunk in pd.read_csv(f, usecols=columns, parse_dates=parse_dates, chunksize=chunk_rows):
+                for col in CATEGORICAL_COLUMNS:
+                    if col in chunk.columns:
+                        chunk[col] = chunk[col].astype('category')
+                yield chunk
+
+
+@profiled
+def validate_data(df, allocation=None, segments=('device', 'traffic_source')):
+    """
+    Run data quality checks in one pass; returns a dict of results.
+
+    Thin wrapper over ``validation.validate_stream`` for an in-memory frame:
+    null counts, duplicate user ids, group counts and SRM (against
+    ``allocation``, default equal split) plus per-day / per-segment SRM,
+    switched users and timestamp checks. Use ``validate_stream`` with
+    ``iter_ab_data`` for data that does not fit in memory.
+    """
+    from src.validation import validate_stream
+    return validate_stream([df], allocation=allocation, segments=segments)
+
+
+@profiled
+def add_derived_features(df, inplace=False):
+    """
+    Add columns useful for analysis.
+
+    ``date`` is the datetime64 day (midnight), ``day_of_week`` an ordered
+    categorical and ``hour`` int8. Missing timestamps give NaT, NaN and
+    <NA> (``hour`` is then nullable Int8). ``inplace=True`` skips the
+    defensive copy.
+    """
+    if not inplace:
+        df = df.copy()
+    ts = df['timestamp'].dt
+    df['date'] = ts.normalize()
+    codes = ts.dayofweek.fillna(-1).to_numpy(np.int8)
+    df['day_of_week'] = pd.Categorical.from_codes(codes, DAY_NAMES, ordered=True)
+    df['hour'] = _hour_codes(ts.hour)
     return df
+
+
+def _hour_codes(hour):
+    """Hours as int8, or nullable Int8 when some are missing."""
+    return hour.astype('Int8' if hour.isna().any() else np.int8)
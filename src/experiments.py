@@ -0,0 +1,207 @@
+"""Batch analysis of many concurrent experiments.
+
+Input is a long session table keyed by ``experiment_id`` with an arm
+column (control plus one or more variants). One grouped pass builds
+mergeable sufficient statistics per experiment × arm
+(``online.summarize_sessions``); SRM checks, CVR z-tests, Welch tests for
+revenue per session and AOV, and multiple-comparison adjustments are then
+array operations over all experiments at once. Summaries can be built in
+a process pool, one partition of experiments per worker.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from statsmodels.stats.multitest import multipletests
+
+from src.online import summarize_sessions
+from src.stats_utils import compute_lift_ci_batch, run_proportion_ztest_batch
+
+METRICS = ['cvr', 'revenue_per_session', 'aov']
+
+
+def experiment_summary(df, experiment_col='experiment_id', arm_col='group'):
+    """Sufficient statistics per experiment × arm (``online.SUMMARY_COLUMNS``)."""
+    return summarize_sessions(df, by=(experiment_col, arm_col))
+
+
+def _summary_task(task):
+    df, experiment_col, arm_col = task
+    return experiment_summary(df, experiment_col, arm_col)
+
+
+def parallel_summary(df, experiment_col='experiment_id', arm_col='group', workers=1):
+    """``experiment_summary`` with experiments split into ``workers`` partitions."""
+    if workers == 1:
+        return experiment_summary(df, experiment_col, arm_col)
+    codes = df[experiment_col].astype('category').cat.codes.to_numpy()
+    parts = [df[codes % workers == w] for w in range(workers)]
+    tasks = [(part, experiment_col, arm_col) for part in parts if len(part)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return pd.concat(pool.map(_summary_task, tasks)).sort_index()
+
+
+def srm_check(summary, allocation=None, threshold=0.01):
+    """
+    Chi-square sample-ratio test per experiment.
+
+    ``allocation`` gives the planned traffic weights: a dict {arm: weight}
+    shared by all experiments, or a Series indexed like ``summary``
+    (experiment × arm); without one, arms get equal shares. Every observed
+    arm needs a weight, since mixing planned weights with a default would
+    mix units. Returns one row per experiment with arms, sessions, chi2,
+    srm_p_value, srm_flag.
+    """
+    sessions = summary['sessions'].astype(float)
+    experiment = sessions.index.get_level_values(0)
+    if allocation is None:
+        weights = pd.Series(1.0, index=sessions.index)
+    elif isinstance(allocation, dict):
+        weights = pd.Series(sessions.index.get_level_values(1).map(allocation), index=sessions.index)
+    else:
+        weights = allocation.reindex(sessions.index)
+    weights = weights.astype(float)
+    if weights.isna().any():
+        missing = sorted(map(str, set(weights.index[weights.isna()].get_level_values(1))))
+        raise ValueError(f"No allocation weight for arms: {', '.join(missing)}")
+
+    total = sessions.groupby(experiment, observed=True).transform('sum')
+    share = weights / weights.groupby(experiment, observed=True).transform('sum')
+    expected = total * share
+    chi2 = ((sessions - expected) ** 2 / expected).groupby(experiment, observed=True).sum()
+    arms = sessions.groupby(experiment, observed=True).size()
+    out = pd.DataFrame({
+        'arms': arms,
+        'sessions': sessions.groupby(experiment, observed=True).sum().astype(np.int64),
+        'chi2': chi2,
+        'srm_p_value': stats.chi2.sf(chi2, np.maximum(arms - 1, 1)),
+    })
+    out['srm_flag'] = out['srm_p_value'] < threshold
+    return out
+
+
+def _welch(n_a, mean_a, m2_a, n_b, mean_b, m2_b, alpha):
+    """Welch t-test of b − a from (count, mean, M2) arrays; returns (diff, lo, hi, t, p)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        va, vb = m2_a / (n_a - 1) / n_a, m2_b / (n_b - 1) / n_b
+        se = np.sqrt(va + vb)
+        dof = (va + vb) ** 2 / (va ** 2 / (n_a - 1) + vb ** 2 / (n_b - 1))
+        diff = mean_b - mean_a
+        t = diff / se
+        half = stats.t.isf(alpha / 2, dof) * se
+    return diff, diff - half, diff + half, t, 2 * stats.t.sf(np.abs(t), dof)
+
+
+def grouped_multipletests(p_values, groups, method='holm'):
+    """
+    Adjust p-values separately within each group (e.g. per experiment).
+
+    'bonferroni', 'holm' and 'fdr_bh' are vectorized over all groups at
+    once; other ``multipletests`` methods fall back to one call per group.
+    NaN p-values are left out of their family and stay NaN.
+    """
+    p = np.asarray(p_values, dtype=float)
+    codes = pd.factorize(np.asarray(groups))[0]
+    out = np.full(len(p), np.nan)
+    valid = np.flatnonzero(np.isfinite(p))
+    if not len(valid):
+        return out
+    if method not in ('bonferroni', 'holm', 'fdr_bh'):
+        for g in np.unique(codes[valid]):
+            idx = valid[codes[valid] == g]
+            out[idx] = multipletests(p[idx], method=method)[1]
+        return out
+
+    # Sort by (group, p); rank within group and family size via run boundaries
+    order = valid[np.lexsort((p[valid], codes[valid]))]
+    g, ps = codes[order], p[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(g)) + 1]
+    sizes = np.diff(np.r_[starts, len(g)])
+    m = np.repeat(sizes, sizes)
+    rank = np.arange(len(g)) - np.repeat(starts, sizes)
+
+    # Running max/min restart at every group boundary (segmented scan)
+    if method == 'bonferroni':
+        adj = np.minimum(ps * m, 1.0)
+    elif method == 'holm':
+        adj = np.minimum(ps * (m - rank), 1.0)
+        adj = pd.Series(adj).groupby(g).cummax().to_numpy()
+    else:
+        adj = np.minimum(ps * m / (rank + 1), 1.0)
+        adj = pd.Series(adj[::-1]).groupby(g[::-1]).cummin().to_numpy()[::-1]
+    out[order] = adj
+    return out
+
+
+def compare_arms(summary, control='control', alpha=0.05):
+    """
+    Every variant against its experiment's control, for all experiments at once.
+
+    Returns a tidy frame with one row per experiment × arm × metric (cvr,
+    revenue_per_session, aov): sessions per arm, control and arm values,
+    absolute difference with CI, relative lift, test statistic and p-value.
+    """
+    experiment_col, arm_col = summary.index.names
+    rows = summary.reset_index()
+    is_control = rows[arm_col].astype(object) == control
+    ctrl = rows[is_control].set_index(experiment_col)
+    arms = rows[~is_control].copy()
+    c = ctrl.reindex(arms[experiment_col]).reset_index(drop=True)
+    arms = arms.reset_index(drop=True)
+
+    n_c, n_t = c['sessions'].to_numpy(float), arms['sessions'].to_numpy(float)
+    x_c, x_t = c['conversions'].to_numpy(float), arms['conversions'].to_numpy(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cvr = (x_c / n_c, x_t / n_t, *compute_lift_ci_batch(x_c, n_c, x_t, n_t, alpha),
+               *run_proportion_ztest_batch(x_t, n_t, x_c, n_c))
+    rps = _welch(n_c, c['revenue_mean'].to_numpy(), c['revenue_m2'].to_numpy(),
+                 n_t, arms['revenue_mean'].to_numpy(), arms['revenue_m2'].to_numpy(), alpha)
+    aov = _welch(x_c, c['aov_mean'].to_numpy(), c['aov_m2'].to_numpy(),
+                 x_t, arms['aov_mean'].to_numpy(), arms['aov_m2'].to_numpy(), alpha)
+
+    frames = []
+    for metric, (value_c, value_t, (diff, lo, hi, stat, p)) in {
+        'cvr': (cvr[0], cvr[1], cvr[2:]),
+        'revenue_per_session': (c['revenue_mean'].to_numpy(), arms['revenue_mean'].to_numpy(), rps),
+        'aov': (c['aov_mean'].to_numpy(), arms['aov_mean'].to_numpy(), aov),
+    }.items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = diff / value_c
+        frames.append(pd.DataFrame({
+            experiment_col: arms[experiment_col].to_numpy(),
+            arm_col: arms[arm_col].astype(object).to_numpy(),
+            'metric': metric,
+            'sessions_control': n_c, 'sessions_arm': n_t,
+            'value_control': value_c, 'value_arm': value_t,
+            'diff': diff, 'diff_lo': lo, 'diff_hi': hi, 'relative_lift': relative,
+            'statistic': stat, 'p_value': p,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_experiments(df, control='control', alpha=0.05, correction='holm', allocation=None,
+                    experiment_col='experiment_id', arm_col='group', workers=1):
+    """
+    SRM checks and per-variant tests for every experiment in a long session table.
+
+    ``correction`` (any ``multipletests`` method) adjusts p-values within
+    each experiment × metric family, i.e. across that experiment's
+    variants; ``q_value`` is the Benjamini-Hochberg adjustment across all
+    experiments for the metric, for portfolio-level false discovery
+    control. Returns one tidy row per experiment × arm × metric with the
+    experiment's SRM result attached.
+    """
+    summary = parallel_summary(df, experiment_col, arm_col, workers)
+    results = compare_arms(summary, control=control, alpha=alpha)
+    results['p_adjusted'] = grouped_multipletests(
+        results['p_value'], results[experiment_col].astype(str) + '|' + results['metric'], correction)
+    results['q_value'] = grouped_multipletests(results['p_value'], results['metric'], 'fdr_bh')
+    results['significant'] = results['p_adjusted'] < alpha
+
+    srm = srm_check(summary, allocation)[['srm_p_value', 'srm_flag']]
+    results = results.join(srm, on=experiment_col)
+    metric_order = pd.Categorical(results['metric'], METRICS, ordered=True)
+    return (results.assign(metric=metric_order)
+                   .sort_values([experiment_col, arm_col, 'metric'], ignore_index=True))
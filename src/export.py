@@ -0,0 +1,124 @@
+"""Star-schema export for the Power BI model (see powerbi/dashboard_design.md).
+
+Facts reference dimensions through integer surrogate keys taken straight
+from the categorical codes (no joins), and the session fact is written as
+row-chunked Parquet or CSV part files, so exports scale well past the
+1,048,576-row xlsx limit. ``fact_daily`` is rolled up from the session
+cube (``cube.build_cube``) to date × group × device × source, so the
+dashboard visuals read a few hundred rows instead of the session fact.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.cube import MEASURES, build_cube, rollup
+from src.data_utils import DAY_NAMES
+from src.profiling import profiled
+
+EXCEL_MAX_ROWS = 1_048_576
+
+# dimension table → (fact column, key column)
+DIMENSIONS = {
+    'dim_group': ('group', 'group_key'),
+    'dim_device': ('device', 'device_key'),
+    'dim_source': ('traffic_source', 'source_key'),
+}
+
+
+def date_keys(dates):
+    """``yyyymmdd`` int32 surrogate keys for datetime64 values."""
+    dates = pd.DatetimeIndex(dates)
+    return (dates.year * 10000 + dates.month * 100 + dates.day).to_numpy(np.int32)
+
+
+def build_dimensions(df):
+    """Dimension tables with 1-based surrogate keys matching the fact's categorical codes."""
+    dims = {}
+    for name, (col, key) in DIMENSIONS.items():
+        values = df[col].astype('category').cat.categories
+        dims[name] = pd.DataFrame({key: np.arange(1, len(values) + 1, dtype=np.int16), col: values})
+
+    dates = pd.date_range(df['timestamp'].min().normalize(), df['timestamp'].max().normalize())
+    dims['dim_date'] = pd.DataFrame({
+        'date_key': date_keys(dates),
+        'date': dates,
+        'day_of_week': pd.Categorical(np.array(DAY_NAMES)[dates.dayofweek], DAY_NAMES, ordered=True),
+        'week_number': dates.isocalendar().week.to_numpy(np.int16),
+        'is_weekend': dates.dayofweek >= 5,
+    })
+    return dims
+
+
+def build_session_fact(df):
+    """Session fact with surrogate keys in place of the dimension columns."""
+    fact = pd.DataFrame({
+        'user_id': df['user_id'].to_numpy(),
+        'timestamp': df['timestamp'].to_numpy(),
+        'date_key': date_keys(df['timestamp'].dt.normalize()),
+        'hour': df['timestamp'].dt.hour.to_numpy(np.int8),
+    })
+    for col, key in DIMENSIONS.values():
+        fact[key] = (df[col].astype('category').cat.codes + 1).to_numpy(np.int16)
+    fact['converted'] = df['converted'].to_numpy(np.int8)
+    fact['revenue'] = df['revenue'].to_numpy()
+    return fact
+
+
+def build_daily_fact(cube, dims):
+    """Cube measures per date × group × device × source key (keys as in ``dims``)."""
+    cols = [col for col, _ in DIMENSIONS.values()]
+    table = rollup(cube, ['date'] + cols, rates=False).reset_index()
+    daily = pd.DataFrame({'date_key': date_keys(table['date'])})
+    for name, (col, key) in DIMENSIONS.items():
+        lookup = pd.Series(dims[name][key].to_numpy(), index=dims[name][col])
+        daily[key] = lookup.reindex(table[col].astype(object)).to_numpy(np.int16)
+    for measure in MEASURES:
+        daily[measure] = table[measure].to_numpy()
+    daily[['revenue', 'revenue_sq']] = daily[['revenue', 'revenue_sq']].round(2)
+    return daily.sort_values(['date_key', 'group_key', 'device_key', 'source_key'], ignore_index=True)
+
+
+def _write_table(df, path, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(path.with_suffix('.parquet'), index=False)
+    elif fmt == 'csv':
+        df.to_csv(path.with_suffix('.csv'), index=False)
+    else:
+        raise ValueError(f"Unknown format: {fmt!r} (expected 'parquet' or 'csv')")
+
+
+@profiled
+def write_star_schema(df, out_dir, fmt='parquet', rows_per_file=1_000_000, daily=True, cube=None):
+    """
+    Write dimensions, the session fact (as part files) and optionally ``fact_daily``.
+
+    ``df`` is a session table; user ids are exported as they come (integer
+    codes for the compact frame). The fact lands in
+    ``<out_dir>/fact_sessions/part-NNNN.<fmt>`` (earlier parts are removed);
+    point Power BI's folder connector at it. ``cube`` (from ``build_cube``)
+    is built from ``df`` when not given. Returns {table: row count}.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    dims = build_dimensions(df)
+    for name, table in dims.items():
+        _write_table(table, out_dir / name, fmt)
+        counts[name] = len(table)
+
+    fact = build_session_fact(df)
+    fact_dir = out_dir / 'fact_sessions'
+    fact_dir.mkdir(exist_ok=True)
+    for stale in fact_dir.glob('part-*'):
+        stale.unlink()
+    for part, start in enumerate(range(0, max(len(fact), 1), rows_per_file)):
+        _write_table(fact.iloc[start:start + rows_per_file], fact_dir / f'part-{part:04d}', fmt)
+    counts['fact_sessions'] = len(fact)
+
+    if daily:
+        daily_fact = build_daily_fact(build_cube(df) if cube is None else cube, dims)
+        _write_table(daily_fact, out_dir / 'fact_daily', fmt)
+        counts['fact_daily'] = len(daily_fact)
+    return counts
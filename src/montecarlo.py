@@ -0,0 +1,116 @@
+"""Monte Carlo check of the test procedures under the simulation model.
+
+Simulates many independent experiments with ``simulation.simulate_daily_stats``
+(per-day, per-group sufficient statistics; no session tables), runs each
+test on them and reports empirical rejection rates: power when the
+treatment effect is on, type-I error when it is off. Batches run across
+processes and return only rejection counts.
+
+Tests:
+- ``ztest``: pooled two-proportion z-test on CVR at the end of the run.
+- ``welch_revenue``: Welch t-test on revenue per session.
+- ``peeking``: naive z-test after every day, rejecting at the first p < α.
+- ``msprt``: always-valid mSPRT p-value (``sequential.msprt_p_values``).
+- ``group_sequential``: O'Brien-Fleming spending boundaries at daily looks.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from src.profiling import profiled
+from src.sequential import msprt_p_values, spending_boundaries
+from src.simulation import (
+    SEED, N_DAYS, TARGET_TOTAL_SESSIONS, TRUE_TREATMENT_LIFT, NOVELTY_PEAK, simulate_daily_stats,
+)
+from src.stats_utils import run_proportion_ztest_batch
+
+TESTS = ['ztest', 'welch_revenue', 'peeking', 'msprt', 'group_sequential']
+
+
+def _welch_p(n_a, sum_a, sumsq_a, n_b, sum_b, sumsq_b):
+    """Two-sided Welch t-test p-values from per-arm count, sum and sum of squares."""
+    mean_a, mean_b = sum_a / n_a, sum_b / n_b
+    var_a = (sumsq_a - n_a * mean_a ** 2) / (n_a - 1)
+    var_b = (sumsq_b - n_b * mean_b ** 2) / (n_b - 1)
+    se2_a, se2_b = var_a / n_a, var_b / n_b
+    t = (mean_b - mean_a) / np.sqrt(se2_a + se2_b)
+    df = (se2_a + se2_b) ** 2 / (se2_a ** 2 / (n_a - 1) + se2_b ** 2 / (n_b - 1))
+    return 2 * stats.t.sf(np.abs(t), df)
+
+
+def evaluate_tests(daily, alpha=0.05, mde=0.004, spending='obrien_fleming'):
+    """
+    Rejection decision of every test in ``TESTS`` for a batch of experiments.
+
+    ``daily`` holds (experiments, days, group) arrays as returned by
+    ``simulate_daily_stats``; returns a dict of boolean arrays (one entry
+    per experiment).
+    """
+    cum = {k: np.cumsum(v, axis=1) for k, v in daily.items()}
+    n, conv = cum['sessions'], cum['conversions']
+    z, p = run_proportion_ztest_batch(conv[..., 1], n[..., 1], conv[..., 0], n[..., 0])
+
+    rate = conv / n
+    var = (rate * (1 - rate) / n).sum(axis=-1)
+    always_valid = msprt_p_values(rate[..., 1] - rate[..., 0], var, mde)
+
+    # Boundaries for the planned schedule: information fraction = expected share of sessions by day
+    planned = n.sum(axis=-1).mean(axis=0)
+    boundaries = spending_boundaries(planned / planned[-1], alpha, spending)
+
+    final = n[:, -1]
+    return {
+        'ztest': p[:, -1] < alpha,
+        'welch_revenue': _welch_p(final[:, 0], cum['revenue_sum'][:, -1, 0], cum['revenue_sumsq'][:, -1, 0],
+                                  final[:, 1], cum['revenue_sum'][:, -1, 1],
+                                  cum['revenue_sumsq'][:, -1, 1]) < alpha,
+        'peeking': (p < alpha).any(axis=1),
+        'msprt': always_valid[:, -1] <= alpha,
+        'group_sequential': (np.abs(z) >= boundaries).any(axis=1),
+    }
+
+
+def _simulate_batch(task):
+    seed, size, kwargs, alpha, mde = task
+    daily = simulate_daily_stats(size, np.random.default_rng(seed), **kwargs)
+    return {name: int(rejected.sum()) for name, rejected in evaluate_tests(daily, alpha, mde).items()}
+
+
+@profiled
+def run_power_simulation(n_experiments=2000, treatment_lift=TRUE_TREATMENT_LIFT, novelty_peak=NOVELTY_PEAK,
+                         alpha=0.05, mde=0.004, n_days=N_DAYS,
+                         target_total_sessions=TARGET_TOTAL_SESSIONS, batch_size=50, workers=1, seed=SEED):
+    """
+    Empirical rejection rate of each test over ``n_experiments`` simulated runs.
+
+    Batches draw from ``SeedSequence.spawn`` streams, so results depend only
+    on the seed and batch size, never on ``workers``. Returns one row per
+    test with rejections, experiments, rate and its Monte Carlo standard error.
+    """
+    sizes = [batch_size] * (n_experiments // batch_size)
+    if n_experiments % batch_size:
+        sizes.append(n_experiments % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    kwargs = {'n_days': n_days, 'target_total_sessions': target_total_sessions,
+              'treatment_lift': treatment_lift, 'novelty_peak': novelty_peak}
+    tasks = [(s, size, kwargs, alpha, mde) for s, size in zip(seeds, sizes)]
+
+    if workers == 1:
+        counts = [_simulate_batch(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(_simulate_batch, tasks))
+
+    out = pd.DataFrame(counts).sum().rename('rejections').to_frame().rename_axis('test')
+    out['experiments'] = n_experiments
+    out['rate'] = out['rejections'] / n_experiments
+    out['mc_se'] = np.sqrt(out['rate'] * (1 - out['rate']) / n_experiments)
+    return out.loc[TESTS]
+
+
+def type_i_error(n_experiments=2000, **kwargs):
+    """``run_power_simulation`` under the null: no treatment lift and no novelty bump."""
+    return run_power_simulation(n_experiments, treatment_lift=0.0, novelty_peak=0.0, **kwargs)
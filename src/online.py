@@ -0,0 +1,126 @@
+"""Incremental experiment aggregates for live monitoring.
+
+A summary is a DataFrame indexed by the cell keys (e.g. date × device ×
+group) holding mergeable sufficient statistics: session and conversion
+counts plus (mean, M2) pairs for revenue per session and for AOV. New
+batches are folded in with Chan's parallel update, so current results come
+from the summary alone without rereading history.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.stats_utils import run_proportion_ztest, compute_lift_ci
+
+SUMMARY_COLUMNS = ['sessions', 'conversions', 'revenue_mean', 'revenue_m2', 'aov_mean', 'aov_m2']
+
+# (count column, mean column, M2 column) for each running moment
+_MOMENTS = [('sessions', 'revenue_mean', 'revenue_m2'), ('conversions', 'aov_mean', 'aov_m2')]
+
+
+def summarize_sessions(df, by=('date', 'group')):
+    """Sufficient statistics per cell for one batch of sessions."""
+    keys = list(by)
+    if 'date' in keys and 'date' not in df.columns:
+        df = df.assign(date=df['timestamp'].dt.normalize())
+
+    cells = [df[k] for k in keys]
+    revenue = df['revenue'].astype(float)
+    grouped = revenue.groupby(cells, observed=True)
+    out = pd.DataFrame({
+        'sessions': grouped.size(),
+        'conversions': df['converted'].astype(np.int64).groupby(cells, observed=True).sum(),
+        'revenue_mean': grouped.mean(),
+        'revenue_m2': grouped.var(ddof=0) * grouped.size(),
+    })
+
+    converted = df['converted'].to_numpy() == 1
+    orders = revenue[converted].groupby([df.loc[converted, k] for k in keys], observed=True)
+    out['aov_mean'] = orders.mean()
+    out['aov_m2'] = orders.var(ddof=0) * orders.size()
+    return out[SUMMARY_COLUMNS].fillna(0.0)
+
+
+def _combine(frame, keys):
+    """Combine (count, mean, M2) rows sharing ``keys`` (Chan et al. parallel update)."""
+    grouper = {'level': keys} if keys else {'by': np.zeros(len(frame), dtype=int)}
+
+    def group_sum(col):
+        return col.groupby(observed=True, **grouper).sum()
+
+    def group_total(col):
+        return col.groupby(observed=True, **grouper).transform('sum')
+
+    out = pd.DataFrame({'sessions': group_sum(frame['sessions']),
+                        'conversions': group_sum(frame['conversions'])})
+    for count, mean, m2 in _MOMENTS:
+        n = frame[count].astype(float)
+        total = group_total(n).where(lambda x: x > 0, 1.0)
+        grand = group_total(n * frame[mean]) / total
+        out[mean] = group_sum(n * frame[mean] / total)
+        out[m2] = group_sum(frame[m2] + n * (frame[mean] - grand) ** 2)
+    if not keys:
+        out.index = pd.Index(['all'], name='cell')
+    return out[SUMMARY_COLUMNS]
+
+
+def merge_summaries(*summaries):
+    """Merge summaries over the same cell keys; cost is O(cells), not O(sessions)."""
+    frame = pd.concat([s for s in summaries if s is not None and len(s)])
+    return _combine(frame, list(frame.index.names))
+
+
+def update_summary(summary, batch, by=('date', 'group')):
+    """Fold a new batch of sessions into a running summary (``summary`` may be None)."""
+    return merge_summaries(summary, summarize_sessions(batch, by))
+
+
+def rollup_summary(summary, keys=('group',)):
+    """Aggregate a fine-grained summary to coarser keys (e.g. date × device × group → group)."""
+    return _combine(summary, list(keys))
+
+
+def _welch_from_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    from scipy import stats
+    sd_a = np.sqrt(m2_a / (n_a - 1))
+    sd_b = np.sqrt(m2_b / (n_b - 1))
+    return stats.ttest_ind_from_stats(mean_b, sd_b, n_b, mean_a, sd_a, n_a, equal_var=False)
+
+
+def summary_results(summary, control='control', treatment='treatment', alpha=0.05):
+    """
+    Current experiment results from a summary alone.
+
+    Rolls the summary up to group level and returns the CVR z-test and lift
+    CI (``run_proportion_ztest``/``compute_lift_ci``) plus Welch tests for
+    revenue per session and AOV, as a dict.
+    """
+    groups = rollup_summary(summary, ['group'])
+    c, t = groups.loc[control], groups.loc[treatment]
+    cvr_c, cvr_t = c['conversions'] / c['sessions'], t['conversions'] / t['sessions']
+
+    z_stat, p_value = run_proportion_ztest([t['conversions'], c['conversions']],
+                                           [t['sessions'], c['sessions']])
+    diff, diff_lo, diff_hi = compute_lift_ci(cvr_c, cvr_t, c['sessions'], t['sessions'], alpha=alpha)
+    rps = _welch_from_moments(c['sessions'], c['revenue_mean'], c['revenue_m2'],
+                              t['sessions'], t['revenue_mean'], t['revenue_m2'])
+    aov = _welch_from_moments(c['conversions'], c['aov_mean'], c['aov_m2'],
+                              t['conversions'], t['aov_mean'], t['aov_m2'])
+    return {
+        'sessions_control': int(c['sessions']), 'sessions_treatment': int(t['sessions']),
+        'cvr_control': cvr_c, 'cvr_treatment': cvr_t,
+        'cvr_diff': diff, 'cvr_diff_lo': diff_lo, 'cvr_diff_hi': diff_hi,
+        'cvr_z': z_stat, 'cvr_p_value': p_value,
+        'rps_control': c['revenue_mean'], 'rps_treatment': t['revenue_mean'],
+        'rps_p_value': rps.pvalue,
+        'aov_control': c['aov_mean'], 'aov_treatment': t['aov_mean'],
+        'aov_p_value': aov.pvalue,
+    }
+
+
+def segment_results(summary, segment, control='control', treatment='treatment', alpha=0.05):
+    """``summary_results`` for every value of a segment key (e.g. 'device'), as a DataFrame."""
+    rolled = rollup_summary(summary, [segment, 'group'])
+    rows = {value: summary_results(cells, control, treatment, alpha)
+            for value, cells in rolled.groupby(level=segment, observed=True)}
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis(segment)
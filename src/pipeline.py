@@ -0,0 +1,172 @@
+"""Cached analysis pipeline shared by notebooks 02–05.
+
+Named stages form a chain (load → features → aggregates → tests →
+projections, with ``cube`` also hanging off features). Each stage's output
+is pickled under ``CACHE_DIR`` with a key hashing the stage name, its
+parameters and its upstream keys, rooted at a content hash of the input
+file. A rerun loads the requested stage straight from disk and never
+touches stages above it; editing the data or a parameter invalidates
+exactly the stages downstream of the change. Bump ``CACHE_VERSION`` when
+a stage's code changes its output.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from src.cube import build_cube
+from src.data_utils import load_ab_data, add_derived_features
+from src.online import rollup_summary, summarize_sessions, summary_results
+from src.profiling import section
+
+CACHE_VERSION = 2
+CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / '.cache'
+
+# name → (function, upstream stage names); functions take upstream outputs then parameters
+STAGES = {}
+
+
+def stage(name, upstream=()):
+    """Register ``func`` as pipeline stage ``name``; its keyword defaults are the stage parameters."""
+    def register(func):
+        STAGES[name] = (func, tuple(upstream))
+        return func
+    return register
+
+
+def file_fingerprint(path, cache_dir=CACHE_DIR):
+    """
+    Content hash of a file or a directory of partition files.
+
+    Digests are remembered per (size, mtime) in ``fingerprints.json`` so an
+    unchanged multi-GB input is not re-read on every run. The memo is only
+    rewritten when it changed, atomically, and an unreadable memo (e.g. one
+    half-written by an older version) is treated as empty.
+    """
+    path = Path(path).resolve()
+    files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+    memo_path = Path(cache_dir) / 'fingerprints.json'
+    try:
+        memo = json.loads(memo_path.read_text())
+    except (OSError, ValueError):
+        memo = {}
+    changed = False
+
+    digest = hashlib.blake2b(digest_size=16)
+    for f in files:
+        st = f.stat()
+        entry = memo.get(str(f))
+        if not entry or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns:
+            h = hashlib.blake2b(digest_size=16)
+            with open(f, 'rb') as fh:
+                for block in iter(lambda: fh.read(1 << 20), b''):
+                    h.update(block)
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'digest': h.hexdigest()}
+            memo[str(f)] = entry
+            changed = True
+        digest.update(f.name.encode() + entry['digest'].encode())
+
+    if changed:
+        memo_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = memo_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(memo))
+        os.replace(tmp, memo_path)
+    return digest.hexdigest()
+
+
+def _stage_params(name, params):
+    func, _ = STAGES[name]
+    defaults = {k: p.default for k, p in inspect.signature(func).parameters.items()
+                if p.default is not inspect.Parameter.empty}
+    return {k: params.get(k, v) for k, v in defaults.items()}
+
+
+def stage_key(name, data_path, cache_dir=CACHE_DIR, **params):
+    """Cache key of ``name``: hash of its parameters and its upstream keys (or the input file)."""
+    _, upstream = STAGES[name]
+    parents = ([stage_key(up, data_path, cache_dir, **params) for up in upstream] if upstream
+               else [file_fingerprint(data_path, cache_dir)])
+    payload = json.dumps([CACHE_VERSION, name, parents, _stage_params(name, params)],
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def run_stage(name, data_path, cache_dir=CACHE_DIR, refresh=False, **params):
+    """
+    Output of stage ``name`` for ``data_path``, computing only what is not cached.
+
+    ``params`` may hold parameters for any stage; each stage picks its own.
+    ``refresh=True`` recomputes this stage (upstream stages still come from cache).
+    """
+    func, upstream = STAGES[name]
+    path = Path(cache_dir) / f'{name}-{stage_key(name, data_path, cache_dir, **params)}.pkl'
+    if path.exists() and not refresh:
+        with section(f'stage:{name} (cached)'):
+            return pd.read_pickle(path)
+
+    inputs = ([run_stage(up, data_path, cache_dir, **params) for up in upstream] if upstream
+              else [data_path])
+    with section(f'stage:{name}'):
+        result = func(*inputs, **_stage_params(name, params))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Per-process temp name: concurrent runs never write into each other's file
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    pd.to_pickle(result, tmp)
+    os.replace(tmp, path)
+    return result
+
+
+@stage('load')
+def load_stage(data_path):
+    """Compact typed session table (see ``data_utils.compact_sessions``)."""
+    return load_ab_data(data_path, compact=True)
+
+
+@stage('features', upstream=['load'])
+def features_stage(df):
+    """Sessions with ``date``, ``day_of_week`` and ``hour``."""
+    return add_derived_features(df, inplace=True)
+
+
+@stage('aggregates', upstream=['features'])
+def aggregates_stage(df):
+    """Mergeable date × device × group summary (``online.summarize_sessions``)."""
+    return summarize_sessions(df, by=('date', 'device', 'group'))
+
+
+@stage('cube', upstream=['features'])
+def cube_stage(df):
+    """Date × hour × group × device × source measure cube (``cube.build_cube``)."""
+    return build_cube(df)
+
+
+@stage('tests', upstream=['aggregates'])
+def tests_stage(summary, alpha=0.05):
+    """Primary/secondary test results from the summary (``online.summary_results``)."""
+    return summary_results(summary, alpha=alpha)
+
+
+@stage('projections', upstream=['aggregates', 'tests'])
+def projections_stage(summary, results, days_per_year=365):
+    """Annualised traffic, AOV and revenue uplift at the lift CI bounds and point estimate."""
+    overall = rollup_summary(summary, []).iloc[0]
+    n_days = summary.index.get_level_values('date').nunique()
+    annual_sessions = overall['sessions'] / n_days * days_per_year
+    scenarios = {
+        'Conservative (Lower Bound)': results['cvr_diff_lo'],
+        'Expected (Point Estimate)': results['cvr_diff'],
+        'Optimistic (Upper Bound)': results['cvr_diff_hi'],
+    }
+    table = pd.DataFrame({'lift': scenarios}).rename_axis('scenario')
+    table['extra_orders'] = annual_sessions * table['lift']
+    table['revenue_impact'] = table['extra_orders'] * overall['aov_mean']
+    return {
+        'daily_sessions': overall['sessions'] / n_days,
+        'annual_sessions': annual_sessions,
+        'average_order_value': overall['aov_mean'],
+        'scenarios': table,
+    }
@@ -0,0 +1,135 @@
+"""Experiment planning: memoized sample sizes, a precomputed lookup table
+and duration estimates from observed traffic.
+
+- ``planned_sample_size``: LRU-cached closed-form solve, so repeated
+  (baseline, mde, alpha, power) queries are dictionary lookups.
+- ``build_power_table`` / ``load_power_table`` / ``table_sample_size``: a
+  dense baseline × MDE grid saved as ``.npy`` files and memory-mapped on
+  load; queries interpolate on log(MDE) without any solve.
+- ``daily_traffic`` / ``plan_experiment``: sessions per group per day from
+  the data replace the hard-coded 1,750/day in duration estimates.
+"""
+
+import json
+import math
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.stats_utils import required_sample_size_batch, required_sample_size_unrounded
+
+TABLE_FILES = ('baselines.npy', 'mdes.npy', 'n_per_group.npy', 'factor.npy')
+
+
+@lru_cache(maxsize=4096)
+def _cached_sample_size(baseline_rate, mde, alpha, power):
+    return int(required_sample_size_batch(baseline_rate, mde, alpha, power))
+
+
+def planned_sample_size(baseline_rate, mde, alpha=0.05, power=0.80):
+    """Per-group sample size, memoized on the (rounded) inputs; same value as ``required_sample_size``."""
+    return _cached_sample_size(round(float(baseline_rate), 10), round(float(mde), 10),
+                               round(float(alpha), 10), round(float(power), 10))
+
+
+def build_power_table(path, baselines=None, mdes=None, alpha=0.05, power=0.80):
+    """
+    Solve sample sizes over a baseline × MDE grid and save them under ``path``.
+
+    Defaults cover baselines 0.5%–50% and MDEs 0.05–10 pp on a log grid.
+    Returns the loaded (memory-mapped) table.
+    """
+    baselines = np.linspace(0.005, 0.5, 200) if baselines is None else np.sort(np.asarray(baselines, float))
+    mdes = np.geomspace(0.0005, 0.1, 200) if mdes is None else np.sort(np.asarray(mdes, float))
+    exact = required_sample_size_unrounded(baselines[:, None], mdes[None, :], alpha, power)
+    n = np.ceil(exact).astype(np.int64)
+    # Unrounded n·mde² / (p(1−p)) is nearly flat over the grid, so it interpolates far better than n
+    factor = exact * mdes[None, :] ** 2 / (baselines * (1 - baselines))[:, None]
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, arr in zip(TABLE_FILES, (baselines, mdes, n, factor)):
+        np.save(path / name, arr)
+    (path / 'meta.json').write_text(json.dumps({'alpha': alpha, 'power': power}))
+    return load_power_table(path)
+
+
+def load_power_table(path):
+    """Memory-map a table written by ``build_power_table``; returns a dict of arrays + design."""
+    path = Path(path)
+    table = {name[:-4]: np.load(path / name, mmap_mode='r') for name in TABLE_FILES}
+    table.update(json.loads((path / 'meta.json').read_text()))
+    # Axes are tiny: keep Python copies for the scalar lookup path
+    table['_baseline_axis'] = table['baselines'].tolist()
+    table['_log_mde_axis'] = np.log(table['mdes']).tolist()
+    return table
+
+
+def _scalar_lookup(table, b, m):
+    baselines, log_mdes = table['_baseline_axis'], table['_log_mde_axis']
+    log_m = math.log(m)
+    if not (baselines[0] <= b <= baselines[-1] and log_mdes[0] <= log_m <= log_mdes[-1]):
+        return planned_sample_size(b, m, table['alpha'], table['power'])
+    i = min(max(bisect_left(baselines, b) - 1, 0), len(baselines) - 2)
+    j = min(max(bisect_left(log_mdes, log_m) - 1, 0), len(log_mdes) - 2)
+    u = (b - baselines[i]) / (baselines[i + 1] - baselines[i])
+    v = (log_m - log_mdes[j]) / (log_mdes[j + 1] - log_mdes[j])
+    (f00, f01), (f10, f11) = table['factor'][i:i + 2, j:j + 2].tolist()
+    f = (1 - u) * (1 - v) * f00 + u * (1 - v) * f10 + (1 - u) * v * f01 + u * v * f11
+    return math.ceil(f * b * (1 - b) / m ** 2)
+
+
+def table_sample_size(table, baseline_rate, mde):
+    """
+    Per-group sample size by bilinear interpolation in the table (array-in/array-out).
+
+    Interpolates the stored factor n·mde² / (p(1−p)) over (baseline, log
+    MDE), touching only the four neighbouring cells of the memory-mapped
+    grid; queries outside the grid fall back to the closed-form solve.
+    """
+    if np.ndim(baseline_rate) == 0 and np.ndim(mde) == 0:
+        return _scalar_lookup(table, float(baseline_rate), abs(float(mde)))
+    baselines, mdes, factor = table['baselines'], table['mdes'], table['factor']
+    b, m = np.broadcast_arrays(np.atleast_1d(np.asarray(baseline_rate, float)),
+                               np.abs(np.atleast_1d(np.asarray(mde, float))))
+    log_m, log_mdes = np.log(m), np.log(mdes)
+
+    i = np.clip(np.searchsorted(baselines, b) - 1, 0, len(baselines) - 2)
+    j = np.clip(np.searchsorted(log_mdes, log_m) - 1, 0, len(mdes) - 2)
+    u = (b - baselines[i]) / (baselines[i + 1] - baselines[i])
+    v = (log_m - log_mdes[j]) / (log_mdes[j + 1] - log_mdes[j])
+    interp = ((1 - u) * (1 - v) * factor[i, j] + u * (1 - v) * factor[i + 1, j]
+              + (1 - u) * v * factor[i, j + 1] + u * v * factor[i + 1, j + 1])
+    n = np.ceil(interp * b * (1 - b) / m ** 2)
+
+    outside = (b < baselines[0]) | (b > baselines[-1]) | (m < mdes[0]) | (m > mdes[-1])
+    if outside.any():
+        n[outside] = required_sample_size_batch(b[outside], m[outside], table['alpha'], table['power'])
+    return n.astype(np.int64)
+
+
+def daily_traffic(df, group_col='group'):
+    """Mean sessions per group per day observed in ``df`` (a session table or a date × group summary)."""
+    if 'sessions' in df.columns:
+        per_day = df['sessions'].groupby(level=['date', group_col], observed=True).sum()
+    else:
+        dates = df['date'] if 'date' in df.columns else df['timestamp'].dt.normalize()
+        per_day = df.groupby([dates, df[group_col]], observed=True).size()
+    return per_day.groupby(level=group_col, observed=True).mean()
+
+
+def plan_experiment(baseline_rate, mdes, sessions_per_group_per_day, alpha=0.05, power=0.80, table=None):
+    """Per-group sample size and days needed for each MDE at the given daily traffic."""
+    mdes = np.atleast_1d(np.asarray(mdes, dtype=float))
+    if table is not None and table['alpha'] == alpha and table['power'] == power:
+        n = table_sample_size(table, baseline_rate, mdes)
+    else:
+        n = np.array([planned_sample_size(baseline_rate, m, alpha, power) for m in mdes])
+    return pd.DataFrame({
+        'mde': mdes,
+        'n_per_group': n,
+        'days': np.ceil(n / sessions_per_group_per_day).astype(int),
+    })
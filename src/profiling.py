@@ -0,0 +1,216 @@
+"""Opt-in timing and memory instrumentation.
+
+Off by default; the ``profiled`` wrapper then costs one flag check per
+call. Enable it for a run with the ``AB_PROFILE`` environment variable:
+
+    AB_PROFILE=1 python notebooks/03_statistical_analysis.py       # wall/CPU time, RSS
+    AB_PROFILE=memory python notebooks/03_statistical_analysis.py  # + tracemalloc peaks
+
+Each profiled call or section records wall time, CPU time, input rows,
+peak traced memory (``memory`` mode only, slows the run) and the process
+peak RSS, nested under its caller. At exit the records are written to
+``data/.profile/<script>.json`` and ``.csv`` (or ``AB_PROFILE_REPORT``).
+Work done in process-pool workers is timed as a whole by its caller.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+REPORT_DIR = Path(__file__).resolve().parent.parent / 'data' / '.profile'
+
+_STATE = {'enabled': False, 'memory': False, 'records': [], 'stack': [], 'lap': None,
+          'started': None}
+
+
+def enable(memory=False):
+    """Start recording (``memory=True`` also traces allocations)."""
+    _STATE.update(enabled=True, memory=memory, started=time.time())
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _STATE['enabled'] = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _STATE['enabled']
+
+
+def reset():
+    """Drop recorded timings."""
+    _STATE['records'].clear()
+    _STATE['lap'] = None
+
+
+def _rows(args, kwargs):
+    """Row count of the first argument that has one (DataFrame, Series, array, tuple of arrays)."""
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, tuple) and value and hasattr(value[0], 'shape'):
+            value = value[0]
+        if hasattr(value, 'shape'):
+            shape = getattr(value, 'shape', ())
+            if len(shape):
+                return int(shape[0])
+    return None
+
+
+def _peak_rss_mb():
+    """Process peak RSS in MB; None where ``resource`` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+@contextmanager
+def section(name, rows=None):
+    """Time a block as ``name``; yields its record (set ``['rows']`` late) or None when off."""
+    if not _STATE['enabled']:
+        yield None
+        return
+    stack = _STATE['stack']
+    tracing = _STATE['memory'] and tracemalloc.is_tracing()
+    if tracing:
+        # Fold the peak so far into the parent before resetting it for this block
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+    entry = {'name': name, 'depth': len(stack), 'parent': stack[-1]['name'] if stack else None,
+             'rows': rows, 'base': current if tracing else 0, 'peak': 0,
+             'start': time.time() - (_STATE['started'] or time.time())}
+    stack.append(entry)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield entry
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        stack.pop()
+        peak_mb = None
+        if tracing and tracemalloc.is_tracing():
+            peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+            peak_mb = (peak - entry['base']) / 2**20
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+        _STATE['records'].append({
+            'name': name, 'depth': entry['depth'], 'parent': entry['parent'],
+            'start_s': round(entry['start'], 6), 'wall_s': wall, 'cpu_s': cpu, 'rows': entry['rows'],
+            'peak_traced_mb': peak_mb, 'peak_rss_mb': _peak_rss_mb(),
+        })
+
+
+def profiled(func=None, name=None):
+    """
+    Decorator: record each call of ``func`` as a section named ``module.function``.
+
+    Rows are taken from the first array-like argument, else from the result.
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+    label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _STATE['enabled']:
+            return func(*args, **kwargs)
+        with section(label, rows=_rows(args, kwargs)) as entry:
+            result = func(*args, **kwargs)
+            if entry['rows'] is None:
+                entry['rows'] = _rows((result,), {})
+            return result
+    return wrapper
+
+
+def lap(name):
+    """
+    End the current notebook lap (if any) and start a new one called ``name``.
+
+    One line per notebook section instead of re-indenting it under ``section``;
+    ``lap(None)`` just closes the last one.
+    """
+    if not _STATE['enabled']:
+        return
+    if _STATE['lap'] is not None:
+        _STATE['lap'].__exit__(None, None, None)
+        _STATE['lap'] = None
+    if name is not None:
+        _STATE['lap'] = section(name)
+        _STATE['lap'].__enter__()
+
+
+def records():
+    """Recorded timings as a DataFrame, in completion order."""
+    import pandas as pd
+    return pd.DataFrame(_STATE['records'], columns=[
+        'name', 'depth', 'parent', 'start_s', 'wall_s', 'cpu_s', 'rows', 'peak_traced_mb', 'peak_rss_mb'])
+
+
+def summary(frame=None):
+    """Per-name totals: calls, wall/CPU time (total and max), max rows and peaks, slowest first."""
+    frame = records() if frame is None else frame
+    if frame.empty:
+        return frame
+    out = frame.groupby('name').agg(
+        calls=('wall_s', 'size'), wall_s=('wall_s', 'sum'), wall_max_s=('wall_s', 'max'),
+        cpu_s=('cpu_s', 'sum'), rows_max=('rows', 'max'), peak_traced_mb=('peak_traced_mb', 'max'),
+        peak_rss_mb=('peak_rss_mb', 'max'))
+    return out.sort_values('wall_s', ascending=False)
+
+
+def write_report(path):
+    """Write records to ``path`` (.csv) or records + summary + run info to ``path`` (.json)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame = records()
+    if path.suffix == '.csv':
+        frame.to_csv(path, index=False)
+    elif path.suffix == '.json':
+        import pandas as pd
+        report = {
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'argv': sys.argv[1:],
+            'started': pd.Timestamp(_STATE['started'], unit='s').isoformat() if _STATE['started'] else None,
+            'memory_traced': _STATE['memory'],
+            'records': json.loads(frame.to_json(orient='records')),
+            'summary': json.loads(summary(frame).reset_index().to_json(orient='records')),
+        }
+        path.write_text(json.dumps(report, indent=2))
+    else:
+        raise ValueError(f"Unknown report format: {path.suffix!r} (expected '.json' or '.csv')")
+    return path
+
+
+def _report_at_exit():
+    lap(None)
+    if not _STATE['records']:
+        return
+    target = os.environ.get('AB_PROFILE_REPORT')
+    if target:
+        base = Path(target).with_suffix('')
+    else:
+        script = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else 'session'
+        base = REPORT_DIR / (script or 'session')
+    for suffix in ('.json', '.csv'):
+        write_report(base.with_suffix(suffix))
+    print(f"\nProfile ({len(_STATE['records'])} records) → {base}.json / .csv", file=sys.stderr)
+    print(summary().head(10)[['calls', 'wall_s', 'cpu_s', 'rows_max', 'peak_rss_mb']]
+          .to_string(float_format='{:.3f}'.format), file=sys.stderr)
+
+
+if os.environ.get('AB_PROFILE', '').lower() not in ('', '0', 'false', 'off'):
+    enable(memory=os.environ['AB_PROFILE'].lower() == 'memory')
+    atexit.register(_report_at_exit)
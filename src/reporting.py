@@ -0,0 +1,179 @@
+"""Report figures drawn from pre-aggregated inputs.
+
+Plot inputs are computed with NumPy or taken from the session cube
+(``cube.rollup``), so seaborn/matplotlib only ever see a few hundred
+points per figure: histogram counts per group rather than every converter,
+and one row per day and group with no bootstrap CIs. ``render_figures``
+draws independent figures in a process pool on the Agg backend; the
+rendering cost no longer depends on the session count.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.profiling import profiled
+
+PALETTE = {'control': '#5B8DB8', 'treatment': '#E07B54'}
+THEME = {'style': 'whitegrid', 'palette': 'muted', 'font_scale': 1.1}
+
+
+def group_histogram(values, groups, bins=40, mask=None):
+    """
+    Histogram counts per group on shared bin edges.
+
+    ``groups`` is any array of labels (categorical codes are used directly);
+    ``mask`` selects rows (e.g. converters). Returns (edges, {group: counts}).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = pd.Categorical(groups)
+    codes = groups.codes
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        values, codes = values[mask], codes[mask]
+    edges = np.histogram_bin_edges(values, bins=bins)
+    idx = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+    counts = np.bincount(codes * (len(edges) - 1) + idx,
+                         minlength=len(groups.categories) * (len(edges) - 1))
+    counts = counts.reshape(len(groups.categories), len(edges) - 1)
+    return edges, {g: counts[i] for i, g in enumerate(groups.categories) if counts[i].any()}
+
+
+def cumulative_rates(daily):
+    """Running CVR per group from a date × group roll-up (``sessions``/``conversions`` columns)."""
+    table = daily.reset_index().sort_values('date')
+    cum = table.groupby('group', observed=True)[['sessions', 'conversions']].cumsum()
+    table['cum_cvr'] = cum['conversions'] / cum['sessions']
+    return table
+
+
+# Figure functions: small inputs in, one PNG out. Module level so they pickle to workers.
+# They draw on their own Agg canvas rather than through pyplot, so rendering never
+# touches the caller's backend or figure registry.
+
+def _figure(**kwargs):
+    """A Figure attached to its own Agg canvas."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def plot_daily_traffic(daily, path):
+    """Daily sessions and CVR by group (two stacked panels)."""
+    import seaborn as sns
+    fig = _figure(figsize=(12, 8))
+    axes = fig.subplots(2, 1, sharex=True)
+    sns.lineplot(data=daily, x='date', y='sessions', hue='group', palette=PALETTE,
+                 marker='o', errorbar=None, ax=axes[0])
+    axes[0].set_title('Daily Traffic by Group')
+    axes[0].set_ylabel('Daily Sessions')
+    axes[0].legend(loc='upper right')
+
+    sns.lineplot(data=daily, x='date', y=daily['cvr'] * 100, hue='group', palette=PALETTE,
+                 marker='o', errorbar=None, ax=axes[1])
+    axes[1].set_title('Daily Conversion Rate by Group')
+    axes[1].set_ylabel('Conversion Rate (%)')
+    axes[1].set_xlabel('Date')
+    axes[1].legend(loc='upper right')
+
+    axes[1].tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    return path
+
+
+def plot_device_cvr(device_metrics, path):
+    """CVR (%) per device and group."""
+    import seaborn as sns
+    fig = _figure(figsize=(8, 5))
+    ax = fig.subplots()
+    sns.barplot(data=device_metrics, x='device', y='cvr_percent', hue='group', errorbar=None, ax=ax)
+    ax.set(title='Conversion Rate by Device', ylabel='Conversion Rate (%)', xlabel='')
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def plot_revenue_histogram(edges, counts, path):
+    """Step histogram of converter revenue per group from ``group_histogram`` output."""
+    import seaborn as sns
+    from matplotlib.colors import to_rgba
+    from matplotlib.patches import Patch
+    fig = _figure(figsize=(8, 5))
+    ax = fig.subplots()
+    handles = []
+    for (group, c), color in zip(counts.items(), sns.color_palette()):
+        ax.stairs(c, edges, fill=True, alpha=0.3, color=color)
+        ax.stairs(c, edges, color=color)
+        handles.append(Patch(facecolor=to_rgba(color, 0.3), edgecolor=color, label=group))
+    ax.legend(handles=handles, title='group')
+    ax.set(ylabel='Count', title='Revenue Distribution (Converters Only)', xlabel='Revenue (USD)')
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def plot_lift_ci(diff, diff_lo, diff_hi, path):
+    """Point estimate and CI of the CVR difference, in percentage points."""
+    fig = _figure(figsize=(8, 4))
+    ax = fig.subplots()
+    ax.errorbar([diff * 100], ['CVR (pp)'], xerr=[[diff * 100 - diff_lo * 100], [diff_hi * 100 - diff * 100]],
+                fmt='o', color='#E07B54', capsize=6, ms=8, lw=2)
+    ax.axvline(0, color='gray', ls='--', lw=1)
+    ax.set(xlabel='Treatment Effect (percentage points)', title='Primary Metric — Treatment Lift with 95% CI')
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    return path
+
+
+def plot_cumulative_cvr(cumulative, path):
+    """Running CVR per group from ``cumulative_rates``."""
+    import seaborn as sns
+    fig = _figure(figsize=(10, 5))
+    ax = fig.subplots()
+    sns.lineplot(data=cumulative, x='date', y=cumulative['cum_cvr'] * 100, hue='group', palette=PALETTE,
+                 marker='o', errorbar=None, ax=ax)
+    ax.set(ylabel='Cumulative CVR (%)', title='Cumulative Conversion Rate Over Experiment Duration')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    return path
+
+
+def _init_renderer(theme):
+    """Worker initializer: Agg backend and the seaborn theme for the worker process."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import seaborn as sns
+    sns.set_theme(**theme)
+
+
+def _render(job):
+    func, kwargs = job
+    return func(**kwargs)
+
+
+@profiled
+def render_figures(jobs, workers=1, theme=THEME):
+    """
+    Draw ``jobs`` — (figure function, kwargs) pairs — and return their paths.
+
+    With ``workers > 1`` figures render in parallel processes; each worker
+    uses the Agg backend and ``theme``. In-process rendering applies
+    ``theme`` only for the duration of the call and leaves the caller's
+    backend alone. Output files do not depend on ``workers``.
+    """
+    workers = min(workers, len(jobs)) or 1
+    if workers == 1:
+        import matplotlib
+        import seaborn as sns
+        with matplotlib.rc_context():
+            sns.set_theme(**theme)
+            return [_render(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer,
+                             initargs=(theme,)) as pool:
+        return list(pool.map(_render, jobs))
+
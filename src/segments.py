@@ -0,0 +1,67 @@
+"""Segment-level analysis across any combination of dimensions.
+
+One groupby yields control/treatment counts for every cell (e.g. device ×
+traffic_source × day_of_week × hour); all tests and intervals are then
+evaluated as array operations over the cells instead of one statsmodels
+call per segment.
+"""
+
+import numpy as np
+import pandas as pd
+from statsmodels.stats.multitest import multipletests
+
+from src.profiling import profiled
+from src.stats_utils import (
+    cohens_h, compute_confidence_interval_batch, compute_lift_ci_batch, run_proportion_ztest_batch,
+)
+
+
+def segment_counts(df, dims, control='control', treatment='treatment'):
+    """Sessions and conversions per cell of ``dims`` for each arm, in one groupby."""
+    dims = list(dims)
+    counts = (df.groupby(dims + ['group'], observed=True)['converted']
+                .agg(n='size', conv='sum')
+                .unstack('group', fill_value=0))
+    return pd.DataFrame({
+        'n_control': counts[('n', control)],
+        'conv_control': counts[('conv', control)],
+        'n_treatment': counts[('n', treatment)],
+        'conv_treatment': counts[('conv', treatment)],
+    })
+
+
+@profiled
+def segment_analysis(df, dims, alpha=0.05, correction='holm', min_sessions=100,
+                     control='control', treatment='treatment'):
+    """
+    CVR tests for every cell of the ``dims`` combination.
+
+    Returns one row per cell with counts, CVR per arm, Wilson CIs, pooled
+    z-test, lift CI, Cohen's h and p-values adjusted across cells
+    (``correction`` is any statsmodels ``multipletests`` method, e.g.
+    'holm' or 'fdr_bh'). Cells with fewer than ``min_sessions`` per arm are
+    reported but excluded from the correction.
+    """
+    out = segment_counts(df, dims, control, treatment)
+    n_c, n_t = out['n_control'].to_numpy(float), out['n_treatment'].to_numpy(float)
+    x_c, x_t = out['conv_control'].to_numpy(float), out['conv_treatment'].to_numpy(float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['cvr_control'] = x_c / n_c
+        out['cvr_treatment'] = x_t / n_t
+        out['ci_control_lo'], out['ci_control_hi'] = compute_confidence_interval_batch(x_c, n_c, alpha)
+        out['ci_treatment_lo'], out['ci_treatment_hi'] = compute_confidence_interval_batch(x_t, n_t, alpha)
+        diff, lo, hi = compute_lift_ci_batch(x_c, n_c, x_t, n_t, alpha=alpha)
+        out['lift'], out['lift_lo'], out['lift_hi'] = diff, lo, hi
+        out['relative_lift'] = diff / (x_c / n_c)
+        out['z'], out['p_value'] = run_proportion_ztest_batch(x_t, n_t, x_c, n_c)
+        out['cohens_h'] = cohens_h(x_t / n_t, x_c / n_c)
+
+    testable = (np.minimum(n_c, n_t) >= min_sessions) & np.isfinite(out['p_value'])
+    out['p_adjusted'] = np.nan
+    out['significant'] = False
+    if testable.any():
+        reject, p_adj, _, _ = multipletests(out.loc[testable, 'p_value'], alpha=alpha, method=correction)
+        out.loc[testable, 'p_adjusted'] = p_adj
+        out.loc[testable, 'significant'] = reject
+    return out
@@ -0,0 +1,162 @@
+"""Sequential testing for interim looks at the conversion rate.
+
+Both procedures work from cumulative per-day aggregates (sessions and
+conversions per group, e.g. ``online.rollup_summary(summary, ['date', 'group'])``),
+never the raw session table, so each daily look costs O(days):
+
+- ``msprt_test``: mixture SPRT with always-valid p-values and confidence
+  sequences; safe to check after every day with no fixed horizon.
+- ``group_sequential_test``: Lan-DeMets alpha spending (O'Brien-Fleming or
+  Pocock) boundaries for a planned total sample size.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import optimize, stats
+
+
+def _cumulative(daily, control='control', treatment='treatment'):
+    """Cumulative sessions/conversions per look (one row per date) from daily aggregates."""
+    frame = daily.reset_index() if 'group' not in daily.columns else daily
+    wide = (frame.pivot_table(index='date', columns='group', values=['sessions', 'conversions'],
+                              aggfunc='sum', observed=True)
+                 .fillna(0).sort_index().cumsum())
+    out = pd.DataFrame({
+        'n_control': wide[('sessions', control)],
+        'n_treatment': wide[('sessions', treatment)],
+        'conv_control': wide[('conversions', control)],
+        'conv_treatment': wide[('conversions', treatment)],
+    })
+    out['cvr_control'] = out['conv_control'] / out['n_control']
+    out['cvr_treatment'] = out['conv_treatment'] / out['n_treatment']
+    out['diff'] = out['cvr_treatment'] - out['cvr_control']
+    return out
+
+
+def msprt_p_values(diff, var, mde=0.004):
+    """
+    Always-valid p-values along the last axis of arrays of cumulative looks.
+
+    ``diff`` and ``var`` are the estimated CVR difference and its variance at
+    each look; the mixture likelihood ratio uses a N(0, mde²) prior.
+    """
+    tau2 = mde ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_lambda = 0.5 * np.log(var / (var + tau2)) + diff ** 2 * tau2 / (2 * var * (var + tau2))
+    p = np.minimum(1.0, np.exp(-np.nan_to_num(log_lambda, nan=0.0)))
+    return np.minimum.accumulate(p, axis=-1)
+
+
+def msprt_test(daily, mde=0.004, alpha=0.05, control='control', treatment='treatment'):
+    """
+    Mixture SPRT on the CVR difference (normal mixing prior with scale ``mde``).
+
+    Returns one row per look with the always-valid p-value (running minimum
+    of 1/Λ), the running-intersection confidence sequence and a
+    reject/continue decision that may be acted on at any look.
+    """
+    looks = _cumulative(daily, control, treatment)
+    p_c, p_t = looks['cvr_control'], looks['cvr_treatment']
+    var = p_c * (1 - p_c) / looks['n_control'] + p_t * (1 - p_t) / looks['n_treatment']
+    tau2 = mde ** 2
+
+    looks['always_valid_p'] = msprt_p_values(looks['diff'].to_numpy(), var.to_numpy(), mde)
+
+    half_width = np.sqrt(var * (var + tau2) / tau2
+                         * (np.log((var + tau2) / var) - 2 * np.log(alpha)))
+    looks['cs_lo'] = np.maximum.accumulate((looks['diff'] - half_width).to_numpy())
+    looks['cs_hi'] = np.minimum.accumulate((looks['diff'] + half_width).to_numpy())
+    looks['decision'] = np.where(looks['always_valid_p'] <= alpha, 'stop: reject H0', 'continue')
+    return looks
+
+
+def spending_function(t, alpha=0.05, kind='obrien_fleming'):
+    """
+    Cumulative two-sided alpha spent at information fraction ``t`` (Lan-DeMets).
+
+    Symmetric design: each side spends alpha/2 with the one-sided spending
+    function, matching the gsDesign/rpact convention.
+    """
+    t = np.clip(np.asarray(t, dtype=float), 0.0, 1.0)
+    if kind == 'obrien_fleming':
+        with np.errstate(divide='ignore'):
+            return 2 * (2 - 2 * stats.norm.cdf(stats.norm.ppf(1 - alpha / 4) / np.sqrt(t)))
+    if kind == 'pocock':
+        return alpha * np.log(1 + (np.e - 1) * t)
+    raise ValueError(f"Unknown spending function: {kind!r} (expected 'obrien_fleming' or 'pocock')")
+
+
+def spending_boundaries(info_fractions, alpha=0.05, kind='obrien_fleming', grid_size=401):
+    """
+    Two-sided z boundaries for looks at increasing information fractions.
+
+    Solves P(first crossing at look k) = α(t_k) − α(t_{k−1}) by recursive
+    numerical integration of the score process over the continuation region
+    (Jennison & Turnbull, ch. 19). Boundary k depends only on looks 1..k, so
+    earlier boundaries never move when a look is added.
+    """
+    t = np.asarray(info_fractions, dtype=float)
+    spent = np.diff(np.concatenate([[0.0], spending_function(t, alpha, kind)]))
+    bounds = np.empty(len(t))
+    grid = weights = density = None
+
+    for k, (t_k, target) in enumerate(zip(t, spent)):
+        sd_k = np.sqrt(t_k)
+        if k == 0:
+            bounds[k] = stats.norm.isf(target / 2) if target > 0 else np.inf
+            delta = t_k
+        else:
+            delta = t_k - t[k - 1]
+            if delta <= 0:
+                # No new information (e.g. looks past the planned sample): nothing left to spend
+                bounds[k] = bounds[k - 1]
+                continue
+            mass = weights * density
+
+            def crossing(c):
+                upper = stats.norm.sf((c * sd_k - grid) / np.sqrt(delta))
+                lower = stats.norm.cdf((-c * sd_k - grid) / np.sqrt(delta))
+                return np.sum(mass * (upper + lower)) - target
+
+            bounds[k] = optimize.brentq(crossing, 0.0, 40.0) if target > 1e-15 else np.inf
+
+        # Density of the score S_k on the continuation region |S_k| < c_k sqrt(t_k)
+        half = min(bounds[k], 8.0) * sd_k
+        new_grid = np.linspace(-half, half, grid_size)
+        new_weights = np.full(grid_size, new_grid[1] - new_grid[0])
+        new_weights[[0, -1]] /= 2
+        if k == 0:
+            density = stats.norm.pdf(new_grid, scale=sd_k)
+        else:
+            step = np.sqrt(delta)
+            kernel = stats.norm.pdf((new_grid[:, None] - grid[None, :]) / step) / step
+            density = kernel @ (weights * density)
+        grid, weights = new_grid, new_weights
+    return bounds
+
+
+def group_sequential_test(daily, planned_sessions, alpha=0.05, spending='obrien_fleming',
+                          control='control', treatment='treatment'):
+    """
+    Group-sequential z-test on CVR with alpha-spending boundaries.
+
+    Information fraction at each look is cumulative sessions over
+    ``planned_sessions`` (both groups). Returns one row per look with the
+    pooled z-statistic, its boundary, the nominal p-value threshold and the
+    stop/continue decision.
+    """
+    looks = _cumulative(daily, control, treatment)
+    n = looks['n_control'] + looks['n_treatment']
+    pooled = (looks['conv_control'] + looks['conv_treatment']) / n
+    se = np.sqrt(pooled * (1 - pooled) * (1 / looks['n_control'] + 1 / looks['n_treatment']))
+    looks['z'] = looks['diff'] / se
+    looks['info_fraction'] = np.minimum(n / planned_sessions, 1.0)
+    looks['alpha_spent'] = spending_function(looks['info_fraction'], alpha, spending)
+    looks['boundary'] = spending_boundaries(looks['info_fraction'].to_numpy(), alpha, spending)
+    looks['nominal_alpha'] = 2 * stats.norm.sf(looks['boundary'])
+
+    crossed = np.abs(looks['z']) >= looks['boundary']
+    final = looks['info_fraction'] >= 1.0
+    looks['decision'] = np.select([crossed, final], ['stop: reject H0', 'stop: fail to reject H0'],
+                                  'continue')
+    return looks
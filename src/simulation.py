@@ -0,0 +1,490 @@
+"""Synthetic session generator for the checkout-redesign experiment.
+
+Holds the generative model behind ``notebooks/01_generate_data.py``:
+- User level split randomization
+- Multi session journeys (activity-weighted returning users)
+- Day of week seasonality, device mix and a fading novelty bump
+
+Sessions are drawn a whole day (or a fixed-size, time-ordered chunk of a
+day) at a time as integer-coded NumPy arrays; the original per-row loop is
+kept as a slow reference implementation of the same model.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.profiling import profiled
+
+SEED = 42
+
+# Params
+N_DAYS = 21
+TARGET_TOTAL_SESSIONS = 76000
+AVG_SESSIONS_PER_USER = 1.4
+N_UNIQUE_USERS = int(TARGET_TOTAL_SESSIONS / AVG_SESSIONS_PER_USER)
+
+START_DATE = pd.Timestamp('2024-09-02')
+
+BASELINE_CVR = 0.032
+TRUE_TREATMENT_LIFT = 0.004
+BASELINE_AOV_MEAN = 68.0
+BASELINE_AOV_STD = 32.0
+MIN_ORDER_VALUE = 5.0
+
+DEVICE_PROBS = {'desktop': 0.42, 'mobile': 0.45, 'tablet': 0.13}
+DEVICE_CVR_MULT = {'desktop': 1.15, 'mobile': 0.82, 'tablet': 1.05}
+PREFERRED_DEVICE_RATE = 0.85
+SOURCE_PROBS = {'organic': 0.35, 'paid_search': 0.28, 'social': 0.18, 'email': 0.12, 'direct': 0.07}
+
+DOW_TRAFFIC_MULT = [1.0, 0.97, 0.95, 1.02, 1.08, 1.15, 1.05]
+
+# Relative hourly traffic (night / morning / afternoon-evening / late), normalised to sum to 1
+HOUR_WEIGHTS = np.array([0.01] * 6 + [0.05] * 6 + [0.08] * 6 + [0.02] * 6)
+HOUR_PROBS = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+NOVELTY_PEAK = 0.003
+NOVELTY_HALFLIFE = 4
+
+# Integer codes used by the batched generator
+GROUPS = ['control', 'treatment']
+DEVICES = list(DEVICE_PROBS)
+SOURCES = list(SOURCE_PROBS)
+SESSION_COLUMNS = ['user_id', 'timestamp', 'group', 'device', 'traffic_source', 'converted', 'revenue']
+
+_DEVICE_CVR = np.array([BASELINE_CVR * DEVICE_CVR_MULT[d] for d in DEVICES])
+_MINUTE_PROBS = np.repeat(HOUR_PROBS / 60, 60)
+
+
+def novelty_effect(day_index):
+    return NOVELTY_PEAK * np.exp(-np.log(2) * day_index / NOVELTY_HALFLIFE)
+
+
+def generate_user_pool(n_users, rng, propensity_shape=None):
+    """
+    Pool of unique users with persistent attributes.
+
+    Attributes are integer coded: ``group`` and ``preferred_device`` index
+    GROUPS and DEVICES, and ``user_num`` i is exported as user id ``U{i:07d}``.
+    With ``propensity_shape`` each user also gets a Gamma conversion
+    ``propensity`` (mean 1) that scales their device conversion rate in
+    every period, so pre-period behaviour predicts experiment behaviour.
+    It is drawn last and is off by default: the experiment's own model has
+    no per-user conversion heterogeneity.
+    """
+    groups = rng.choice(len(GROUPS), size=n_users, p=[0.5, 0.5])
+    pref_devices = rng.choice(len(DEVICES), size=n_users, p=list(DEVICE_PROBS.values()))
+
+    activity_scores = rng.beta(a=0.5, b=3.0, size=n_users)
+    activity_scores = activity_scores / activity_scores.mean()
+
+    users = pd.DataFrame({
+        'user_num': np.arange(1, n_users + 1, dtype=np.int64),
+        'group': groups.astype(np.int8),
+        'preferred_device': pref_devices.astype(np.int8),
+        'activity_score': activity_scores,
+    })
+    if propensity_shape is not None:
+        users['propensity'] = rng.gamma(propensity_shape, 1 / propensity_shape, size=n_users)
+    return users
+
+
+def user_cdf(users):
+    """Cumulative activity-score distribution used to sample returning users."""
+    cdf = users['activity_score'].to_numpy().cumsum()
+    return cdf / cdf[-1]
+
+
+def _draw_sessions(users, cdf, minute, date, day_idx, rng):
+    """Draw session attributes for already time-ordered minute offsets."""
+    n = len(minute)
+    idx = np.searchsorted(cdf, rng.random(n), side='right')
+    group = users['group'].to_numpy()[idx]
+
+    device = users['preferred_device'].to_numpy()[idx]
+    switched = rng.random(n) >= PREFERRED_DEVICE_RATE
+    device[switched] = rng.integers(0, len(DEVICES), size=switched.sum())
+    source = rng.choice(len(SOURCES), size=n, p=list(SOURCE_PROBS.values())).astype(np.int8)
+
+    # Negative day_idx is the pre-experiment window: same users and behaviour, no treatment yet
+    exposed = (group == 1) & (day_idx >= 0)
+    cvr = _DEVICE_CVR[device]
+    if 'propensity' in users:
+        cvr = cvr * users['propensity'].to_numpy()[idx]
+    cvr = cvr + exposed * (TRUE_TREATMENT_LIFT + novelty_effect(max(day_idx, 0)))
+    converted = rng.random(n) < cvr
+
+    revenue = np.zeros(n)
+    aov = rng.normal(BASELINE_AOV_MEAN, BASELINE_AOV_STD, size=converted.sum())
+    revenue[converted] = np.round(np.maximum(aov, MIN_ORDER_VALUE), 2)
+
+    return {
+        'user_num': users['user_num'].to_numpy()[idx],
+        'timestamp': np.datetime64(date, 'ns') + minute.astype('timedelta64[m]'),
+        'group': group,
+        'device': device,
+        'traffic_source': source,
+        'converted': converted.astype(np.int8),
+        'revenue': revenue,
+    }
+
+
+def iter_day_chunks(users, day_idx, rng, sessions_per_day=TARGET_TOTAL_SESSIONS / N_DAYS,
+                    chunk_rows=None, start_date=START_DATE, cdf=None):
+    """
+    Yield one experiment day of sessions as dicts of integer-coded NumPy arrays.
+
+    The day's per-minute session counts are drawn up front (multinomial over
+    HOUR_PROBS), so sessions come out in timestamp order without a sort.
+    With ``chunk_rows`` the day is split into consecutive time blocks of
+    about that many sessions, bounding memory independently of daily volume.
+    """
+    date = start_date + pd.Timedelta(days=day_idx)
+    n = int(rng.poisson(sessions_per_day * DOW_TRAFFIC_MULT[date.dayofweek]))
+    minute_counts = rng.multinomial(n, _MINUTE_PROBS)
+    if cdf is None:
+        cdf = user_cdf(users)
+
+    if chunk_rows is None or n <= chunk_rows:
+        bounds = [0, len(minute_counts)]
+    else:
+        cum = minute_counts.cumsum()
+        cuts = np.searchsorted(cum, np.arange(chunk_rows, n, chunk_rows), side='left') + 1
+        bounds = [0, *np.unique(cuts).tolist(), len(minute_counts)]
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        minute = np.repeat(np.arange(lo, hi), minute_counts[lo:hi])
+        if len(minute) or len(bounds) == 2:
+            yield _draw_sessions(users, cdf, minute, date, day_idx, rng)
+
+
+def simulate_day(users, day_idx, rng, sessions_per_day=TARGET_TOTAL_SESSIONS / N_DAYS,
+                 start_date=START_DATE, cdf=None):
+    """
+    Draw every session of one experiment day in a single batch.
+
+    Returns a dict of equal-length NumPy arrays (integer codes, sorted by
+    timestamp) with the same distributions as the per-row loop.
+    """
+    return next(iter_day_chunks(users, day_idx, rng, sessions_per_day,
+                                start_date=start_date, cdf=cdf))
+
+
+def simulate_daily_stats(n_experiments, rng, n_days=N_DAYS, target_total_sessions=TARGET_TOTAL_SESSIONS,
+                         treatment_lift=TRUE_TREATMENT_LIFT, novelty_peak=NOVELTY_PEAK):
+    """
+    Per-day, per-group sufficient statistics for a batch of independent experiments.
+
+    Each experiment gets its own user pool. Given the pool, sessions are iid
+    draws of (user, device) and conversions are independent given group ×
+    device, so per-day session counts are multinomial over the six cells and
+    conversions binomial per cell: the same distribution as the row-level
+    generator for every session-level statistic, without materializing
+    sessions. Returns arrays of shape (n_experiments, n_days, 2) keyed
+    'sessions', 'conversions', 'revenue_sum', 'revenue_sumsq'.
+    """
+    n_users = int(target_total_sessions / AVG_SESSIONS_PER_USER)
+    n_groups, n_devices = len(GROUPS), len(DEVICES)
+
+    # Activity-weighted share of sessions from each (group, preferred device) pool cell
+    groups = rng.random((n_experiments, n_users)) < 0.5
+    pref = np.searchsorted(np.cumsum(list(DEVICE_PROBS.values())), rng.random((n_experiments, n_users)),
+                           side='right').clip(max=n_devices - 1)
+    activity = rng.beta(0.5, 3.0, size=(n_experiments, n_users))
+    cell = (np.arange(n_experiments)[:, None] * n_groups + groups) * n_devices + pref
+    weights = np.bincount(cell.ravel(), weights=activity.ravel(),
+                          minlength=n_experiments * n_groups * n_devices)
+    weights = weights.reshape(n_experiments, n_groups, n_devices)
+    weights /= weights.sum(axis=(1, 2), keepdims=True)
+
+    # Sessions leave their preferred device with probability 1 - PREFERRED_DEVICE_RATE
+    cell_probs = (PREFERRED_DEVICE_RATE * weights
+                  + (1 - PREFERRED_DEVICE_RATE) / n_devices * weights.sum(axis=2, keepdims=True))
+
+    day_idx = np.arange(n_days)
+    dow = (START_DATE + pd.to_timedelta(day_idx, unit='D')).dayofweek
+    per_day = target_total_sessions / n_days * np.asarray(DOW_TRAFFIC_MULT)[dow]
+    n = rng.poisson(np.broadcast_to(per_day, (n_experiments, n_days)))
+    sessions = rng.multinomial(n, cell_probs.reshape(n_experiments, 1, -1))
+    sessions = sessions.reshape(n_experiments, n_days, n_groups, n_devices)
+
+    lift = treatment_lift + novelty_peak * np.exp(-np.log(2) * day_idx / NOVELTY_HALFLIFE)
+    cvr = _DEVICE_CVR[None, None, :] + np.stack([np.zeros(n_days), lift], axis=1)[:, :, None]
+    conversions = rng.binomial(sessions, np.clip(cvr, 0.0, 1.0)).sum(axis=3)
+
+    # Order values for every conversion, summed back to (experiment, day, group)
+    orders = np.round(np.maximum(rng.normal(BASELINE_AOV_MEAN, BASELINE_AOV_STD,
+                                            size=conversions.sum()), MIN_ORDER_VALUE), 2)
+    owner = np.repeat(np.arange(conversions.size), conversions.ravel())
+    revenue_sum = np.bincount(owner, weights=orders, minlength=conversions.size)
+    revenue_sumsq = np.bincount(owner, weights=orders ** 2, minlength=conversions.size)
+
+    shape = conversions.shape
+    return {
+        'sessions': sessions.sum(axis=3),
+        'conversions': conversions,
+        'revenue_sum': revenue_sum.reshape(shape),
+        'revenue_sumsq': revenue_sumsq.reshape(shape),
+    }
+
+
+def format_user_ids(user_nums):
+    """Vectorized ``f'U{i:07d}'`` for an integer array."""
+    nums = np.asarray(user_nums, dtype=np.int64)
+    if len(nums) and nums.max() >= 10 ** 7:
+        return np.array([f'U{i:07d}' for i in nums], dtype=object)
+    chars = np.empty((len(nums), 8), dtype=np.uint8)
+    chars[:, 0] = ord('U')
+    chars[:, 1:] = nums[:, None] // 10 ** np.arange(6, -1, -1) % 10 + ord('0')
+    return chars.view('S8').ravel().astype(str).astype(object)
+
+
+def sessions_frame(arrays):
+    """Decode integer-coded session arrays into the exported CSV layout."""
+    return pd.DataFrame({
+        'user_id': format_user_ids(arrays['user_num']),
+        'timestamp': arrays['timestamp'],
+        'group': np.array(GROUPS, dtype=object)[arrays['group']],
+        'device': np.array(DEVICES, dtype=object)[arrays['device']],
+        'traffic_source': np.array(SOURCES, dtype=object)[arrays['traffic_source']],
+        'converted': arrays['converted'].astype(np.int64),
+        'revenue': arrays['revenue'],
+    }, columns=SESSION_COLUMNS)
+
+
+def _generate_rows(users, n_days, sessions_per_day, rng):
+    """Original per-row simulation loop, kept as a slow reference for the batched path."""
+    records = []
+    probs = users['activity_score'].to_numpy().copy()
+    user_nums = users['user_num'].to_numpy()
+    groups = users['group'].to_numpy()
+    pref_devices = users['preferred_device'].to_numpy()
+
+    for day_idx in range(n_days):
+        date = START_DATE + pd.Timedelta(days=day_idx)
+        dow = date.dayofweek
+        daily_target = int(rng.poisson(sessions_per_day * DOW_TRAFFIC_MULT[dow]))
+
+        probs /= probs.sum()
+        daily_user_indices = rng.choice(users.index, size=daily_target, p=probs, replace=True)
+
+        for i in daily_user_indices:
+            if rng.random() < PREFERRED_DEVICE_RATE:
+                device = DEVICES[pref_devices[i]]
+            else:
+                device = rng.choice(DEVICES)
+
+            source = rng.choice(SOURCES, p=list(SOURCE_PROBS.values()))
+
+            cvr = BASELINE_CVR * DEVICE_CVR_MULT[device]
+
+            #  Treatment Effect
+            if groups[i] == 1:
+                cvr += TRUE_TREATMENT_LIFT
+                cvr += novelty_effect(day_idx)
+
+            converted = int(rng.random() < cvr)
+
+            revenue = 0.0
+            if converted:
+                aov = rng.normal(BASELINE_AOV_MEAN, BASELINE_AOV_STD)
+                revenue = round(max(aov, MIN_ORDER_VALUE), 2)
+
+            hour = rng.choice(24, p=HOUR_PROBS)
+            ts = date + pd.Timedelta(hours=int(hour), minutes=rng.integers(0, 60))
+
+            records.append({
+                'user_id': f'U{user_nums[i]:07d}',
+                'timestamp': ts,
+                'group': GROUPS[groups[i]],
+                'device': device,
+                'traffic_source': source,
+                'converted': converted,
+                'revenue': revenue
+            })
+
+    df = pd.DataFrame(records, columns=SESSION_COLUMNS)
+    return df.sort_values('timestamp').reset_index(drop=True)
+
+
+def seed_streams(seed, n_days, pre_days=0):
+    """
+    Independent child seeds for the user pool and each experiment day.
+
+    Every day draws from its own ``SeedSequence.spawn`` stream, so days can
+    be generated in any order or process and still give identical output.
+    With ``pre_days`` the pre-period seeds (returned third, oldest day first)
+    are spawned after the experiment's, leaving those streams unchanged.
+    """
+    pool_seed, *day_seeds = np.random.SeedSequence(seed).spawn(n_days + 1 + pre_days)
+    if not pre_days:
+        return pool_seed, day_seeds
+    return pool_seed, day_seeds[:n_days], day_seeds[n_days:][::-1]
+
+
+# Per-process state for _map_days tasks (user pool is rebuilt from its seed, not pickled);
+# set up afresh by every _map_days call, so only read it inside a task
+_WORKER = {}
+
+
+def _init_worker(pool_seed, n_users, sessions_per_day, propensity_shape):
+    users = generate_user_pool(n_users, np.random.default_rng(pool_seed), propensity_shape)
+    _WORKER.update(users=users, cdf=user_cdf(users), sessions_per_day=sessions_per_day)
+
+
+def _day_chunks(day_idx, day_seed, chunk_rows):
+    rng = np.random.default_rng(day_seed)
+    return iter_day_chunks(_WORKER['users'], day_idx, rng, _WORKER['sessions_per_day'],
+                           chunk_rows, cdf=_WORKER['cdf'])
+
+
+def _simulate_day_task(task):
+    day_idx, day_seed = task
+    return next(_day_chunks(day_idx, day_seed, None))
+
+
+def _write_day_task(task):
+    day_idx, day_seed, chunk_rows, out_dir, fmt = task
+    date = (START_DATE + pd.Timedelta(days=day_idx)).date()
+    total = 0
+    for part, arrays in enumerate(_day_chunks(day_idx, day_seed, chunk_rows)):
+        df = sessions_frame(arrays)
+        write_partition(df, Path(out_dir) / f'sessions_{date}_{part:04d}.{fmt}', fmt)
+        total += len(df)
+    return total
+
+
+def _map_days(func, tasks, seed, n_days, target_total_sessions, workers, propensity_shape=None):
+    """Run day tasks in order, in-process or across a process pool."""
+    pool_seed, _ = seed_streams(seed, n_days)
+    init_args = (pool_seed, int(target_total_sessions / AVG_SESSIONS_PER_USER),
+                 target_total_sessions / n_days, propensity_shape)
+    if workers == 1:
+        _init_worker(*init_args)
+        return [func(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=init_args) as pool:
+        return list(pool.map(func, tasks))
+
+
+@profiled
+def generate_dataset(n_days=N_DAYS, target_total_sessions=TARGET_TOTAL_SESSIONS, seed=SEED,
+                     legacy=False, workers=1, propensity_shape=None):
+    """
+    Simulate the full experiment and return one session per row, sorted by timestamp.
+
+    ``legacy=True`` runs the original per-row loop, kept as a slow reference
+    for the batched path. It cannot reproduce the original script's output:
+    that script's hourly weights summed to 0.96 and ``rng.choice`` raised
+    before any rows were written, so both paths use the normalised
+    ``HOUR_PROBS``. The default batched path draws the same distributions
+    from per-day seed streams (see ``seed_streams``) and is orders of
+    magnitude faster. Its output depends only on the seed and ``n_days``,
+    never on ``workers``. ``propensity_shape`` opts into per-user conversion
+    heterogeneity (see ``generate_user_pool``; batched path only).
+    """
+    if legacy:
+        rng = np.random.default_rng(seed)
+        users = generate_user_pool(int(target_total_sessions / AVG_SESSIONS_PER_USER), rng)
+        return _generate_rows(users, n_days, target_total_sessions / n_days, rng)
+
+    _, day_seeds = seed_streams(seed, n_days)
+    days = _map_days(_simulate_day_task, list(enumerate(day_seeds)), seed, n_days,
+                     target_total_sessions, workers, propensity_shape)
+    arrays = {col: np.concatenate([day[col] for day in days]) for col in days[0]}
+    return sessions_frame(arrays)
+
+
+@profiled
+def generate_pre_period(pre_days=14, n_days=N_DAYS, target_total_sessions=TARGET_TOTAL_SESSIONS,
+                        seed=SEED, workers=1, propensity_shape=None):
+    """
+    Sessions from the ``pre_days`` days before the experiment starts.
+
+    Same user pool, traffic and behaviour as ``generate_dataset`` (with the
+    same seed and ``propensity_shape``) but no treatment exposure, for
+    pre-period covariates such as CUPED. Adding a pre-period never changes
+    the experiment's own output.
+    """
+    _, _, pre_seeds = seed_streams(seed, n_days, pre_days)
+    tasks = [(-pre_days + i, day_seed) for i, day_seed in enumerate(pre_seeds)]
+    days = _map_days(_simulate_day_task, tasks, seed, n_days, target_total_sessions, workers, propensity_shape)
+    arrays = {col: np.concatenate([day[col] for day in days]) for col in days[0]}
+    return sessions_frame(arrays)
+
+
+def iter_sessions(n_days=N_DAYS, target_total_sessions=TARGET_TOTAL_SESSIONS, seed=SEED,
+                  chunk_rows=None):
+    """
+    Stream the experiment as timestamp-sorted DataFrame chunks.
+
+    Yields ``(day_idx, part, df)``; chunks are in global timestamp order, so
+    concatenating them gives a sorted dataset. Only the integer-coded user
+    pool (~26 bytes/user) and one chunk are held in memory at a time.
+    """
+    # Pool state stays local: _WORKER may be reinitialised by other calls while this generator is suspended
+    pool_seed, day_seeds = seed_streams(seed, n_days)
+    users = generate_user_pool(int(target_total_sessions / AVG_SESSIONS_PER_USER),
+                               np.random.default_rng(pool_seed))
+    cdf = user_cdf(users)
+    for day_idx, day_seed in enumerate(day_seeds):
+        chunks = iter_day_chunks(users, day_idx, np.random.default_rng(day_seed),
+                                 target_total_sessions / n_days, chunk_rows, cdf=cdf)
+        for part, arrays in enumerate(chunks):
+            yield day_idx, part, sessions_frame(arrays)
+
+
+def write_partition(df, path, fmt='csv'):
+    """Write one session chunk as CSV or Parquet."""
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    elif fmt == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unknown format: {fmt!r} (expected 'csv' or 'parquet')")
+
+
+@profiled
+def write_sessions(out_dir, fmt='csv', n_days=N_DAYS, target_total_sessions=TARGET_TOTAL_SESSIONS,
+                   seed=SEED, chunk_rows=1_000_000, workers=1, propensity_shape=None):
+    """
+    Generate the experiment chunk by chunk into partitioned files.
+
+    Files are named ``sessions_<date>_<part>.<fmt>`` so lexical order equals
+    timestamp order. With ``workers > 1`` each process generates and writes
+    whole days; the files are byte-identical for any worker count.
+    ``propensity_shape`` is as in ``generate_dataset``. Returns the total
+    number of sessions written.
+
+    Memory is bounded by ``chunk_rows`` except for the user pool, which
+    every process builds in one piece from ``target_total_sessions /
+    AVG_SESSIONS_PER_USER`` users: ~26 bytes per user held (34 with a
+    propensity), about twice that while it is drawn. For 100M sessions that
+    is ~1.9 GB per process (~3.7 GB peak), so at that scale the pool, not the
+    chunk size, sets the footprint; lower ``workers`` to bound the total.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _, day_seeds = seed_streams(seed, n_days)
+    tasks = [(day_idx, day_seed, chunk_rows, str(out_dir), fmt)
+             for day_idx, day_seed in enumerate(day_seeds)]
+    return sum(_map_days(_write_day_task, tasks, seed, n_days, target_total_sessions, workers,
+                         propensity_shape))
+
+
+@profiled
+def write_pre_period(out_dir, fmt='csv', pre_days=14, n_days=N_DAYS, target_total_sessions=TARGET_TOTAL_SESSIONS,
+                     seed=SEED, chunk_rows=1_000_000, workers=1, propensity_shape=None):
+    """
+    ``generate_pre_period`` chunk by chunk into partitioned files (see ``write_sessions``).
+
+    Returns the total number of pre-period sessions written.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _, _, pre_seeds = seed_streams(seed, n_days, pre_days)
+    tasks = [(-pre_days + i, day_seed, chunk_rows, str(out_dir), fmt)
+             for i, day_seed in enumerate(pre_seeds)]
+    return sum(_map_days(_write_day_task, tasks, seed, n_days, target_total_sessions, workers,
+                         propensity_shape))
@@ -1,13 +1,81 @@
-"""Statistical utilities for A/B test analysis."""
+"""
+Statistical utilities for A/B test analysis.
+
+Only NumPy is imported up front: the normal-approximation tests (z-test,
+Wilson interval, lift CI, power and sample size batches) use the NumPy
+normal distribution helpers below, and SciPy / statsmodels are imported
+on first use by the functions that need them, so a one-off z-test starts
+in a fraction of the time.
+"""
+
+import math
 
 import numpy as np
-from scipy import stats
-from statsmodels.stats.power import NormalIndPower
-from statsmodels.stats.proportion import proportions_ztest, proportion_confint
+
+from src.profiling import profiled
+
+# Acklam's rational approximation to the normal quantile (relative error < 1.2e-9 before refinement)
+_PPF_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+          1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_PPF_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+          6.680131188771972e+01, -1.328068155288572e+01, 1.0)
+_PPF_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+          -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_PPF_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+          3.754408661907416e+00, 1.0)
+_ERFC = np.frompyfunc(math.erfc, 1, 1)
+# Above this many elements the one-off SciPy import is cheaper than math.erfc per element
+_SCIPY_MIN_SIZE = 10_000
+
+
+def _norm_sf(x):
+    """Standard normal upper tail P(Z > x), elementwise."""
+    x = np.asarray(x, dtype=float)
+    if x.size >= _SCIPY_MIN_SIZE:
+        from scipy import special
+        return special.ndtr(-x)
+    return (np.asarray(_ERFC(x / math.sqrt(2)), dtype=float) / 2)[()]
+
+
+def _norm_cdf(x):
+    return _norm_sf(-np.asarray(x, dtype=float))
+
+
+def _norm_pdf(x):
+    x = np.asarray(x, dtype=float)
+    return np.exp(-x ** 2 / 2) / math.sqrt(2 * math.pi)
+
+
+def _lower_quantile(q):
+    """Normal quantile for tail probabilities q <= 0.5, refined with one Halley step."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (q - 0.5) ** 2
+        central = (q - 0.5) * np.polyval(_PPF_A, r) / np.polyval(_PPF_B, r)
+        t = np.sqrt(-2 * np.log(q))
+        tail = np.polyval(_PPF_C, t) / np.polyval(_PPF_D, t)
+        x = np.where(q < 0.02425, tail, central)
+        u = (_norm_cdf(x) - q) * math.sqrt(2 * math.pi) * np.exp(x ** 2 / 2)
+        refined = x - u / (1 + x * u / 2)
+    x = np.where(np.isfinite(refined), refined, x)
+    return np.where(q == 0, -np.inf, x)
+
+
+def _norm_ppf(p):
+    """Standard normal quantile, elementwise (NaN outside [0, 1])."""
+    p = np.asarray(p, dtype=float)
+    x = np.where(p <= 0.5, _lower_quantile(np.minimum(p, 1 - p)),
+                 -_lower_quantile(np.minimum(p, 1 - p)))
+    return np.where((p >= 0) & (p <= 1), x, np.nan)[()]
 
 
+def _norm_isf(q):
+    return -_norm_ppf(q)
+
+
+@profiled
 def required_sample_size(baseline_rate, mde, alpha=0.05, power=0.80):
     """Calculate per-group sample size for a two-proportion z-test."""
+    from statsmodels.stats.power import NormalIndPower
     effect_size = mde / np.sqrt(baseline_rate * (1 - baseline_rate))
     analysis = NormalIndPower()
     n = analysis.solve_power(effect_size=effect_size, alpha=alpha, power=power,
@@ -15,48 +83,516 @@ def required_sample_size(baseline_rate, mde, alpha=0.05, power=0.80):
     return int(np.ceil(n))
 
 
+@profiled
 def run_proportion_ztest(successes, nobs):
     """Two-sided z-test for two proportions. Returns z-stat, p-value."""
-    z_stat, p_value = proportions_ztest(successes, nobs, alternative='two-sided')
-    return z_stat, p_value
+    count, nobs = np.asarray(successes, dtype=float), np.asarray(nobs, dtype=float)
+    if count.shape != (2,) or nobs.shape != (2,):
+        from statsmodels.stats.proportion import proportions_ztest
+        return proportions_ztest(successes, nobs, alternative='two-sided')
+    # Pooled statistic as in statsmodels' proportions_ztest
+    pooled = count.sum() / nobs.sum()
+    z_stat = (count[0] / nobs[0] - count[1] / nobs[1]) / np.sqrt(pooled * (1 - pooled) * np.sum(1 / nobs))
+    return z_stat, 2 * _norm_sf(np.abs(z_stat))
+
+
+def _wilson_interval(count, nobs, alpha):
+    """Wilson interval for scalar or array counts/nobs; returns (lo, hi) arrays."""
+    count, nobs = np.asarray(count, dtype=float), np.asarray(nobs, dtype=float)
+    z = _norm_isf(np.asarray(alpha, dtype=float) / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = count / nobs
+        denom = 1 + z ** 2 / nobs
+        center = (p + z ** 2 / (2 * nobs)) / denom
+        half = z * np.sqrt(p * (1 - p) / nobs + z ** 2 / (4 * nobs ** 2)) / denom
+    return center - half, center + half
+
+
+def _clopper_pearson(count, nobs, alpha):
+    """Clopper-Pearson interval from the beta quantiles, as statsmodels computes it."""
+    from scipy import special
+    lo = 0.0 if count == 0 else special.betaincinv(count, nobs - count + 1, alpha / 2)
+    hi = 1.0 if count == nobs else special.betainccinv(count + 1, nobs - count, alpha / 2)
+    return lo, hi
 
 
+# Profiled entry points delegate to the private helpers rather than to each other,
+# so one call is recorded once in the AB_PROFILE report.
+
+@profiled
 def compute_confidence_interval(count, nobs, alpha=0.05, method='wilson'):
     """Wilson confidence interval for a single proportion."""
+    if method == 'wilson':
+        lo, hi = _wilson_interval(count, nobs, alpha)
+        return lo[()], hi[()]
+    if method == 'beta' and np.ndim(count) == 0 and np.ndim(nobs) == 0:
+        return _clopper_pearson(count, nobs, alpha)
+    from statsmodels.stats.proportion import proportion_confint
     lo, hi = proportion_confint(count, nobs, alpha=alpha, method=method)
     return lo, hi
 
 
-def compute_lift_ci(rate_control, rate_treatment, n_control, n_treatment, alpha=0.05):
-    """Confidence interval for the absolute difference (treatment - control)."""
+def _lift_ci(rate_control, rate_treatment, n_control, n_treatment, alpha):
+    """Normal-approximation CI of rate_treatment − rate_control (scalars or arrays)."""
     diff = rate_treatment - rate_control
     se = np.sqrt(
         rate_control * (1 - rate_control) / n_control
         + rate_treatment * (1 - rate_treatment) / n_treatment
     )
-    z = stats.norm.ppf(1 - alpha / 2)
+    z = _norm_isf(alpha / 2)
     return diff, diff - z * se, diff + z * se
 
 
+@profiled
+def compute_lift_ci(rate_control, rate_treatment, n_control, n_treatment, alpha=0.05):
+    """Confidence interval for the absolute difference (treatment - control)."""
+    return _lift_ci(rate_control, rate_treatment, n_control, n_treatment, alpha)
+
+
+@profiled
 def cohens_h(p1, p2):
     """Cohen's h effect size for two proportions."""
     return 2 * (np.arcsin(np.sqrt(p1)) - np.arcsin(np.sqrt(p2)))
 
 
+@profiled
 def run_mannwhitney(group_a, group_b):
     """Non-parametric test for continuous metrics (e.g., revenue per user)."""
+    from scipy import stats
     stat, p_value = stats.mannwhitneyu(group_a, group_b, alternative='two-sided')
     return stat, p_value
 
 
+def _sample_size_exact(baseline_rate, mde, alpha, power):
+    """Unrounded per-group n: closed form plus one Newton step on the two-sided power curve."""
+    baseline_rate, mde, alpha, power = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (baseline_rate, mde, alpha, power)))
+    effect_size = np.abs(mde) / np.sqrt(baseline_rate * (1 - baseline_rate))
+    z_alpha = _norm_isf(alpha / 2)
+    n = 2 * ((z_alpha + _norm_ppf(power)) / effect_size) ** 2
+
+    # Include the opposite rejection tail, which the closed form drops
+    d = effect_size * np.sqrt(n / 2)
+    achieved = _norm_sf(z_alpha - d) + _norm_cdf(-z_alpha - d)
+    slope = (_norm_pdf(z_alpha - d) - _norm_pdf(z_alpha + d)) * d / (2 * n)
+    return n - (achieved - power) / slope
+
+
+@profiled
+def required_sample_size_batch(baseline_rate, mde, alpha=0.05, power=0.80):
+    """
+    Per-group sample size for arrays of baselines/MDEs/alphas/powers (broadcast).
+
+    Closed-form normal approximation, refined with one Newton step on the
+    two-sided power curve so results agree with ``required_sample_size``.
+    """
+    return np.ceil(_sample_size_exact(baseline_rate, mde, alpha, power)).astype(np.int64)
+
+
+@profiled
+def required_sample_size_unrounded(baseline_rate, mde, alpha=0.05, power=0.80):
+    """
+    ``required_sample_size_batch`` before rounding up, as floats.
+
+    For callers that interpolate or rescale sample sizes (e.g. the planning
+    power table), where the ceiling would add a step of up to one session.
+    """
+    return _sample_size_exact(baseline_rate, mde, alpha, power)
+
+
+@profiled
+def power_batch(baseline_rate, mde, n_per_group, alpha=0.05):
+    """Two-sided power of the two-proportion z-test for arrays of scenarios (broadcast)."""
+    baseline_rate, mde, n_per_group, alpha = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (baseline_rate, mde, n_per_group, alpha)))
+    d = np.abs(mde) / np.sqrt(baseline_rate * (1 - baseline_rate)) * np.sqrt(n_per_group / 2)
+    z_alpha = _norm_isf(alpha / 2)
+    return _norm_sf(z_alpha - d) + _norm_cdf(-z_alpha - d)
+
+
+@profiled
+def power_grid(baseline_rates, mdes, alphas=(0.05,), power=0.80):
+    """Required per-group sample size over every baseline × MDE × alpha, as a long DataFrame."""
+    import pandas as pd
+    b, m, a = np.meshgrid(np.asarray(baseline_rates, dtype=float), np.asarray(mdes, dtype=float),
+                          np.asarray(alphas, dtype=float), indexing='ij')
+    return pd.DataFrame({
+        'baseline_rate': b.ravel(), 'mde': m.ravel(), 'alpha': a.ravel(),
+        'n_per_group': np.ceil(_sample_size_exact(b, m, a, power)).astype(np.int64).ravel(),
+    })
+
+
+@profiled
+def run_proportion_ztest_batch(count_a, nobs_a, count_b, nobs_b):
+    """
+    Pooled two-sided z-test of a vs b for arrays of count/nobs pairs.
+
+    Same statistic as ``run_proportion_ztest([count_a, count_b], [nobs_a, nobs_b])``;
+    returns (z, p) arrays, NaN where a cell is empty or has no variance.
+    """
+    count_a, nobs_a, count_b, nobs_b = (np.asarray(a, dtype=float)
+                                        for a in (count_a, nobs_a, count_b, nobs_b))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = (count_a + count_b) / (nobs_a + nobs_b)
+        se = np.sqrt(pooled * (1 - pooled) * (1 / nobs_a + 1 / nobs_b))
+        z = (count_a / nobs_a - count_b / nobs_b) / se
+    z = np.where(np.isfinite(z), z, np.nan)
+    return z, 2 * _norm_sf(np.abs(z))
+
+
+@profiled
+def compute_confidence_interval_batch(count, nobs, alpha=0.05):
+    """Wilson intervals for arrays of counts/nobs; returns (lo, hi) arrays."""
+    return _wilson_interval(count, nobs, alpha)
+
+
+@profiled
+def compute_lift_ci_batch(count_control, n_control, count_treatment, n_treatment, alpha=0.05):
+    """``compute_lift_ci`` from arrays of conversion counts; returns (diff, lo, hi) arrays."""
+    count_control, n_control, count_treatment, n_treatment = (
+        np.asarray(a, dtype=float) for a in (count_control, n_control, count_treatment, n_treatment))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _lift_ci(count_control / n_control, count_treatment / n_treatment,
+                        n_control, n_treatment, np.asarray(alpha, dtype=float))
+
+
+def _as_samples(group):
+    """Normalise a group to a tuple of equal-length float arrays."""
+    arrays = group if isinstance(group, tuple) else (group,)
+    arrays = tuple(np.asarray(a, dtype=float) for a in arrays)
+    if len({len(a) for a in arrays}) != 1:
+        raise ValueError("Paired arrays within a group must have equal length")
+    return arrays
+
+
+def _sum_statistic(statistic, sums, weight_total):
+    """Evaluate 'mean' / 'ratio' from (weighted) column sums."""
+    if statistic == 'mean':
+        return sums[0] / weight_total
+    if statistic == 'ratio':
+        return sums[0] / sums[1]
+    raise ValueError(f"Unknown statistic: {statistic!r}")
+
+
+def _point_statistic(statistic, samples):
+    if callable(statistic):
+        return statistic(*samples, axis=-1)
+    return _sum_statistic(statistic, [a.sum() for a in samples], len(samples[0]))
+
+
+def _compress(samples):
+    """Distinct rows of the paired sample arrays and their multiplicities, most frequent first."""
+    rows, counts = np.unique(np.column_stack(samples), axis=0, return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    return tuple(rows[order].T), counts[order]
+
+
+def _resampler(statistic, samples, resampling):
+    """
+    Return (width, draw) where ``draw(size, rng)`` gives the statistic for
+    ``size`` bootstrap resamples and ``width`` is the per-resample memory cost.
+
+    'multinomial' and 'poisson' draw counts/weights over the distinct values
+    only, so resampled means cost O(#distinct) instead of O(n).
+    """
+    n = len(samples[0])
+    if callable(statistic):
+        if resampling not in ('auto', 'index'):
+            raise ValueError(f"{resampling!r} resampling needs statistic='mean' or 'ratio'")
+        resampling = 'index'
+    if resampling == 'index':
+        def draw(size, rng):
+            idx = rng.integers(0, n, size=(size, n))
+            if callable(statistic):
+                return statistic(*(a[idx] for a in samples), axis=-1)
+            return _sum_statistic(statistic, [a[idx].sum(axis=1) for a in samples], n)
+        return n, draw
+
+    values, mult = _compress(samples)
+    if resampling == 'auto':
+        resampling = 'multinomial' if len(mult) <= n // 4 else 'index'
+        if resampling == 'index':
+            return _resampler(statistic, samples, 'index')
+    if resampling == 'multinomial':
+        def draw(size, rng):
+            counts = rng.multinomial(n, mult / n, size=size).astype(float)
+            return _sum_statistic(statistic, [counts @ v for v in values], n)
+    elif resampling == 'poisson':
+        def draw(size, rng):
+            weights = rng.poisson(mult, size=(size, len(mult))).astype(float)
+            return _sum_statistic(statistic, [weights @ v for v in values], weights.sum(axis=1))
+    else:
+        raise ValueError(f"Unknown resampling: {resampling!r} "
+                         "(expected 'auto', 'index', 'multinomial' or 'poisson')")
+    return len(mult), draw
+
+
+def _jackknife(statistic, samples, max_elements):
+    """Leave-one-out statistics (closed form for 'mean'/'ratio', batched otherwise)."""
+    n = len(samples[0])
+    if not callable(statistic):
+        sums = [a.sum() - a for a in samples]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return _sum_statistic(statistic, sums, n - 1)
+    out = np.empty(n)
+    batch = max(1, max_elements // max(n - 1, 1))
+    cols = np.arange(n - 1)
+    for start in range(0, n, batch):
+        drop = np.arange(start, min(start + batch, n))
+        idx = cols[None, :] + (cols[None, :] >= drop[:, None])
+        out[drop] = statistic(*(a[idx] for a in samples), axis=-1)
+    return out
+
+
+def _bootstrap_diffs(samples_a, samples_b, statistic, n_boot, rng, resampling, max_elements):
+    """Bootstrap distribution of statistic(b) - statistic(a), drawn in memory-bounded batches."""
+    width_a, draw_a = _resampler(statistic, samples_a, resampling)
+    width_b, draw_b = _resampler(statistic, samples_b, resampling)
+    batch = max(1, max_elements // max(width_a, width_b))
+    diffs = np.empty(n_boot)
+    for start in range(0, n_boot, batch):
+        size = min(batch, n_boot - start)
+        diffs[start:start + size] = draw_b(size, rng) - draw_a(size, rng)
+    return diffs
+
+
+@profiled
+def bootstrap_ci(group_a, group_b, statistic='mean', n_boot=10000, ci=0.95, method='percentile',
+                 resampling='auto', seed=42, max_elements=2 ** 22):
+    """
+    Bootstrap confidence interval for statistic(group_b) - statistic(group_a).
+
+    ``statistic`` is 'mean', 'ratio' (each group is a ``(numerator,
+    denominator)`` tuple, e.g. ``(revenue, converted)`` for AOV) or a
+    callable ``f(*arrays, axis=-1)`` evaluated on vectorized index draws.
+    For 'mean'/'ratio', ``resampling='multinomial'`` draws resample counts
+    over the distinct values (exact bootstrap, fast for zero-inflated or
+    discrete metrics) and 'poisson' draws Poisson(1) weights; 'auto' picks
+    multinomial when values repeat heavily. Resamples are generated in
+    batches of at most ``max_elements`` draws. ``method`` is 'percentile'
+    or 'bca'. Returns (observed difference, ci_low, ci_high).
+    """
+    rng = np.random.default_rng(seed)
+    samples_a, samples_b = _as_samples(group_a), _as_samples(group_b)
+    observed = _point_statistic(statistic, samples_b) - _point_statistic(statistic, samples_a)
+    diffs = _bootstrap_diffs(samples_a, samples_b, statistic, n_boot, rng, resampling, max_elements)
+
+    tail = (1 - ci) / 2
+    if method == 'percentile':
+        quantiles = [tail, 1 - tail]
+    elif method == 'bca':
+        # Bias correction from the bootstrap distribution, acceleration from the jackknife
+        z0 = _norm_ppf((np.sum(diffs < observed) + 0.5 * np.sum(diffs == observed)) / n_boot)
+        # Leave-one-out values of the full difference: dropping from a enters with the opposite sign.
+        # Two-sample acceleration (Efron & Tibshirani eq. 15.36): each arm's influence sums are
+        # scaled by its own size, as in scipy.stats.bootstrap
+        stat_a, stat_b = _point_statistic(statistic, samples_a), _point_statistic(statistic, samples_b)
+        skew = spread = 0.0
+        for loo in (stat_b - _jackknife(statistic, samples_a, max_elements),
+                    _jackknife(statistic, samples_b, max_elements) - stat_a):
+            loo = loo[np.isfinite(loo)]
+            n = len(loo)
+            u = (n - 1) * (loo.mean() - loo)
+            skew += np.sum(u ** 3) / n ** 3
+            spread += np.sum(u ** 2) / n ** 2
+        accel = skew / (6 * spread ** 1.5)
+        z = _norm_ppf([tail, 1 - tail])
+        quantiles = _norm_cdf(z0 + (z0 + z) / (1 - accel * (z0 + z)))
+    else:
+        raise ValueError(f"Unknown method: {method!r} (expected 'percentile' or 'bca')")
+
+    lo, hi = np.quantile(diffs, quantiles)
+    return observed, lo, hi
+
+
+@profiled
 def bootstrap_mean_diff(group_a, group_b, n_boot=10000, ci=0.95, seed=42):
     """Bootstrap confidence interval for difference in means."""
     rng = np.random.default_rng(seed)
-    diffs = np.empty(n_boot)
-    for i in range(n_boot):
-        sample_a = rng.choice(group_a, size=len(group_a), replace=True)
-        sample_b = rng.choice(group_b, size=len(group_b), replace=True)
-        diffs[i] = sample_b.mean() - sample_a.mean()
+    diffs = _bootstrap_diffs(_as_samples(group_a), _as_samples(group_b), 'mean', n_boot, rng,
+                             'auto', 2 ** 22)
     lo = np.percentile(diffs, (1 - ci) / 2 * 100)
     hi = np.percentile(diffs, (1 + ci) / 2 * 100)
     return diffs.mean(), lo, hi
+
+
+@profiled
+def sufficient_stats(values):
+    """Reduce a zero-inflated per-session metric (0/1 or revenue) to (n sessions, nonzero values)."""
+    values = np.asarray(values, dtype=float)
+    return len(values), values[values != 0]
+
+
+def _sum_of_draws(nonzero, counts, rng, max_elements):
+    """Sum of ``counts[i]`` values drawn with replacement from ``nonzero``, for every i."""
+    if len(nonzero) == 0 or np.all(nonzero == nonzero[0]):
+        # Binary (or constant) metric: the sum is just count × value
+        return counts * (nonzero[0] if len(nonzero) else 0.0)
+    sums = np.empty(len(counts))
+    start = 0
+    while start < len(counts):
+        # Grow the batch until it holds ~max_elements draws
+        stop = start + 1 + np.searchsorted(np.cumsum(counts[start + 1:]), max_elements)
+        batch = counts[start:stop]
+        draws = nonzero[rng.integers(0, len(nonzero), size=batch.sum())]
+        labels = np.repeat(np.arange(len(batch)), batch)
+        sums[start:stop] = np.bincount(labels, weights=draws, minlength=len(batch))
+        start = stop
+    return sums
+
+
+@profiled
+def sufficient_bootstrap_mean_diff(stats_a, stats_b, n_boot=10000, ci=0.95, seed=42,
+                                   max_elements=2 ** 22):
+    """
+    Bootstrap CI for a difference in means from ``sufficient_stats`` summaries.
+
+    Each resample draws the number of nonzero sessions ~ Binomial(n, k/n) and
+    then resamples only the nonzero values, which is distributionally the
+    same as ``bootstrap_mean_diff`` but costs O(conversions), not O(sessions).
+    """
+    rng = np.random.default_rng(seed)
+    means = []
+    for n, nonzero in (stats_a, stats_b):
+        counts = rng.binomial(n, len(nonzero) / n, size=n_boot)
+        means.append(_sum_of_draws(nonzero, counts, rng, max_elements) / n)
+    diffs = means[1] - means[0]
+    lo = np.percentile(diffs, (1 - ci) / 2 * 100)
+    hi = np.percentile(diffs, (1 + ci) / 2 * 100)
+    return diffs.mean(), lo, hi
+
+
+def _sparse_permutation_draw(pooled_nonzero, n_a, n_b):
+    """Permuted mean differences from sufficient statistics; returns (width, draw)."""
+    k, total = len(pooled_nonzero), pooled_nonzero.sum()
+    constant = k == 0 or np.all(pooled_nonzero == pooled_nonzero[0])
+
+    def draw(size, rng):
+        k_b = rng.hypergeometric(k, n_a + n_b - k, n_b, size=size)
+        if constant:
+            sum_b = k_b * (pooled_nonzero[0] if k else 0.0)
+        else:
+            # Shuffle the nonzero values per permutation and take the first k_b as arm B
+            shuffled = rng.permuted(np.broadcast_to(pooled_nonzero, (size, k)), axis=1)
+            csum = np.concatenate([np.zeros((size, 1)), np.cumsum(shuffled, axis=1)], axis=1)
+            sum_b = csum[np.arange(size), k_b]
+        return sum_b / n_b - (total - sum_b) / n_a
+    return max(k, 1), draw
+
+
+def _dense_permutation_draw(pooled, n_b, statistic):
+    """Permuted statistics from full relabellings of the pooled sample; returns (width, draw)."""
+    def draw(size, rng):
+        perm = rng.permuted(np.broadcast_to(pooled, (size, len(pooled))), axis=1)
+        sample_b, sample_a = perm[:, :n_b], perm[:, n_b:]
+        if callable(statistic):
+            return statistic(sample_b, sample_a, axis=-1)
+        return sample_b.mean(axis=1) - sample_a.mean(axis=1)
+    return len(pooled), draw
+
+
+def _exceeds(null, observed, alternative):
+    tol = 1e-12 * max(1.0, abs(observed))
+    if alternative == 'two-sided':
+        return np.abs(null) >= abs(observed) - tol
+    if alternative == 'greater':
+        return null >= observed - tol
+    if alternative == 'less':
+        return null <= observed + tol
+    raise ValueError(f"Unknown alternative: {alternative!r}")
+
+
+def _monte_carlo_p(draw, width, observed, n_perm, alternative, alpha, early_stop, rng,
+                   max_elements):
+    """
+    Monte Carlo permutation p-value, (hits + 1) / (draws + 1).
+
+    With ``early_stop``, stops after any batch once a 99.9% Clopper-Pearson
+    interval for the p-value lies entirely above or below ``alpha``.
+    """
+    batch = max(1, min(1000, max_elements // width))
+    hits = done = 0
+    while done < n_perm:
+        size = min(batch, n_perm - done)
+        hits += int(_exceeds(draw(size, rng), observed, alternative).sum())
+        done += size
+        if early_stop and done < n_perm:
+            lo, hi = _clopper_pearson(hits, done, 0.001)
+            if hi < alpha or lo > alpha:
+                break
+    return (hits + 1) / (done + 1)
+
+
+def _log_comb(n, k):
+    from scipy import special
+    return special.gammaln(n + 1) - special.gammaln(k + 1) - special.gammaln(n - k + 1)
+
+
+def _exact_binary_p(successes_a, n_a, successes_b, n_b, alternative):
+    """Exact permutation p-value for a difference in proportions (hypergeometric null)."""
+    total_n, total_k = n_a + n_b, successes_a + successes_b
+    support = np.arange(max(0, n_b - (total_n - total_k)), min(total_k, n_b) + 1)
+    # log-space binomial coefficients: far cheaper than stats.hypergeom.pmf on large supports
+    log_pmf = (_log_comb(total_k, support) + _log_comb(total_n - total_k, n_b - support)
+               - _log_comb(total_n, n_b))
+    pmf = np.exp(log_pmf)
+    null = support / n_b - (total_k - support) / n_a
+    observed = successes_b / n_b - successes_a / n_a
+    return observed, min(1.0, pmf[_exceeds(null, observed, alternative)].sum())
+
+
+@profiled
+def permutation_test(group_a, group_b, statistic='mean_diff', n_perm=10000,
+                     alternative='two-sided', alpha=0.05, early_stop=True, seed=42,
+                     max_elements=2 ** 22):
+    """
+    Seeded permutation test of statistic(group_b, group_a). Returns (observed, p-value).
+
+    With the default 'mean_diff' statistic, 0/1 outcomes use the exact
+    hypergeometric null (no resampling) and zero-inflated metrics are
+    permuted on sufficient statistics (see ``sufficient_permutation_test``).
+    A callable ``f(b, a, axis=-1)`` receives batches of full relabellings.
+    Monte Carlo runs stop early once the p-value is clearly above or below
+    ``alpha``.
+    """
+    a = np.asarray(group_a, dtype=float)
+    b = np.asarray(group_b, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    if callable(statistic):
+        observed = statistic(b, a, axis=-1)
+        width, draw = _dense_permutation_draw(np.concatenate([b, a]), len(b), statistic)
+    elif statistic == 'mean_diff':
+        pooled = np.concatenate([a, b])
+        if np.isin(pooled, (0.0, 1.0)).all():
+            return _exact_binary_p(a.sum(), len(a), b.sum(), len(b), alternative)
+        observed = b.mean() - a.mean()
+        nonzero = pooled[pooled != 0]
+        if len(nonzero) <= len(pooled) // 4:
+            width, draw = _sparse_permutation_draw(nonzero, len(a), len(b))
+        else:
+            width, draw = _dense_permutation_draw(np.concatenate([b, a]), len(b), statistic)
+    else:
+        raise ValueError(f"Unknown statistic: {statistic!r}")
+
+    p_value = _monte_carlo_p(draw, width, observed, n_perm, alternative, alpha, early_stop, rng,
+                             max_elements)
+    return observed, p_value
+
+
+@profiled
+def sufficient_permutation_test(stats_a, stats_b, n_perm=10000, seed=42, max_elements=2 ** 22):
+    """
+    Two-sided permutation test for a difference in means from ``sufficient_stats`` summaries.
+
+    Under a random relabelling the number of nonzero sessions landing in B is
+    Hypergeometric(k, N - k, n_b); only which nonzero values go to B is then
+    shuffled. Returns (observed difference, p-value).
+    """
+    rng = np.random.default_rng(seed)
+    (n_a, nonzero_a), (n_b, nonzero_b) = stats_a, stats_b
+    observed = nonzero_b.sum() / n_b - nonzero_a.sum() / n_a
+    width, draw = _sparse_permutation_draw(np.concatenate([nonzero_a, nonzero_b]), n_a, n_b)
+    p_value = _monte_carlo_p(draw, width, observed, n_perm, 'two-sided', 0.05, False, rng,
+                             max_elements)
+    return observed, p_value
@@ -0,0 +1,143 @@
+"""User-level (cluster-robust) analysis.
+
+Randomization is per user, but users return for several sessions, so
+sessions within a user are not independent. Metrics are analysed as ratios
+of per-user sums (conversions / sessions, revenue / sessions, revenue /
+orders) with delta-method variances, or with a bootstrap that resamples
+whole users.
+
+Per-user sums come from one sort-free ``np.bincount`` pass over integer
+user codes (see ``data_utils.encode_user_ids``), never a groupby on strings.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from src.data_utils import encode_user_ids
+from src.profiling import profiled
+from src.stats_utils import bootstrap_ci
+
+# metric name → (numerator, denominator) per-user columns
+RATIO_METRICS = {
+    'cvr': ('conversions', 'sessions'),
+    'revenue_per_session': ('revenue', 'sessions'),
+    'aov': ('revenue', 'conversions'),
+}
+
+
+def _dense_codes(ids):
+    """
+    Bincount slots for integer user ids: the ids themselves unless they are
+    too sparse, else factorized codes. Returns (slots, id of each slot).
+    """
+    ids = np.asarray(ids)
+    if len(ids) and ids.min() >= 0 and ids.max() < 4 * len(ids):
+        return ids, np.arange(ids.max() + 1)
+    return pd.factorize(ids)
+
+
+@profiled
+def user_aggregates(df, control='control', treatment='treatment'):
+    """
+    Per-user session, conversion and revenue sums in one pass.
+
+    Returns a DataFrame indexed by encoded user id (``encode_user_ids`` codes
+    are per id, not per frame, so frames from different periods join on it)
+    with the user's ``group`` and a ``switched`` flag for users seen in both
+    arms (a randomization fault; they are reported but assigned to their
+    majority arm).
+    """
+    codes, slot_ids = _dense_codes(encode_user_ids(df['user_id']))
+    size = int(codes.max()) + 1 if len(codes) else 0
+    in_treatment = (df['group'] == treatment).to_numpy()
+
+    sessions = np.bincount(codes, minlength=size)
+    seen = np.flatnonzero(sessions)
+    sessions = sessions[seen]
+    treated = np.bincount(codes, weights=in_treatment, minlength=size)[seen]
+    return pd.DataFrame({
+        'sessions': sessions,
+        'conversions': np.bincount(codes, weights=df['converted'].to_numpy(), minlength=size)[seen],
+        'revenue': np.bincount(codes, weights=df['revenue'].to_numpy(), minlength=size)[seen],
+        'group': pd.Categorical.from_codes((treated * 2 > sessions).astype(np.int8), [control, treatment]),
+        'switched': (treated > 0) & (treated < sessions),
+    }, index=pd.Index(slot_ids[seen], name='user'))
+
+
+def delta_method_ratio(numerator, denominator):
+    """
+    Ratio of sums and its delta-method variance over independent clusters.
+
+    For per-cluster sums x and y, R = Σx / Σy and
+    Var(R) ≈ (σ²_x − 2R·σ_xy + R²·σ²_y) / (n·μ_y²).
+    """
+    x, y = np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float)
+    n = len(x)
+    mean_x, mean_y = x.mean(), y.mean()
+    ratio = mean_x / mean_y
+    cov = np.cov(x, y, ddof=1)
+    var = (cov[0, 0] - 2 * ratio * cov[0, 1] + ratio ** 2 * cov[1, 1]) / (n * mean_y ** 2)
+    return ratio, var
+
+
+def _naive_var(users, numerator, denominator):
+    """Variance of the ratio if every denominator unit (session/order) were independent."""
+    if numerator == 'conversions':
+        p = users[numerator].sum() / users[denominator].sum()
+        return p * (1 - p) / users[denominator].sum()
+    return np.nan
+
+
+def ratio_metric_test(users, metric='cvr', alpha=0.05, control='control', treatment='treatment'):
+    """
+    Treatment − control difference of a ratio metric with a delta-method z-test.
+
+    ``metric`` is a key of ``RATIO_METRICS`` or a (numerator, denominator)
+    pair of ``user_aggregates`` columns. Returns a dict with both arms'
+    ratios, the difference, its CI and p-value, and for CVR the design
+    effect (delta-method variance over the naive per-session variance).
+    """
+    numerator, denominator = RATIO_METRICS.get(metric, metric)
+    arms = {}
+    for name in (control, treatment):
+        sub = users[(users['group'] == name) & (users[denominator] > 0)]
+        ratio, var = delta_method_ratio(sub[numerator], sub[denominator])
+        arms[name] = (ratio, var, _naive_var(sub, numerator, denominator), len(sub))
+
+    (r_c, v_c, naive_c, n_c), (r_t, v_t, naive_t, n_t) = arms[control], arms[treatment]
+    diff, se = r_t - r_c, np.sqrt(v_c + v_t)
+    z = diff / se
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    return {
+        'metric': metric if isinstance(metric, str) else f'{numerator}/{denominator}',
+        'users_control': n_c, 'users_treatment': n_t,
+        'control': r_c, 'treatment': r_t, 'diff': diff, 'se': se,
+        'ci_lo': diff - z_crit * se, 'ci_hi': diff + z_crit * se,
+        'z': z, 'p_value': 2 * stats.norm.sf(abs(z)),
+        'design_effect': (v_c + v_t) / (naive_c + naive_t),
+    }
+
+
+@profiled
+def cluster_bootstrap_ci(users, metric='cvr', n_boot=10000, ci=0.95, method='percentile', seed=42,
+                         control='control', treatment='treatment'):
+    """
+    Bootstrap CI for a ratio metric difference, resampling whole users.
+
+    Each user contributes its (numerator, denominator) pair, so within-user
+    correlation is preserved; uses the ``bootstrap_ci`` ratio engine.
+    Returns (observed diff, lo, hi).
+    """
+    numerator, denominator = RATIO_METRICS.get(metric, metric)
+    arms = [users[(users['group'] == name) & (users[denominator] > 0)] for name in (control, treatment)]
+    c, t = ((sub[numerator].to_numpy(float), sub[denominator].to_numpy(float)) for sub in arms)
+    return bootstrap_ci(c, t, statistic='ratio', n_boot=n_boot, ci=ci, method=method, seed=seed)
+
+
+def user_level_analysis(df, metrics=('cvr', 'revenue_per_session', 'aov'), alpha=0.05,
+                        control='control', treatment='treatment'):
+    """``ratio_metric_test`` for each metric on user aggregates of ``df``, as a DataFrame."""
+    users = user_aggregates(df, control, treatment)
+    rows = [ratio_metric_test(users, m, alpha, control, treatment) for m in metrics]
+    return pd.DataFrame(rows).set_index('metric')
@@ -0,0 +1,232 @@
+"""Single-pass, chunked data-quality validation.
+
+``update_validation`` folds one chunk of sessions into a small state —
+null counts per column, sessions per arm overall / per day / per segment value,
+a per-user bitmask of the arms each user was seen in, and timestamp
+range and ordering — so a partitioned or streamed export is validated
+chunk by chunk (``data_utils.iter_ab_data``) without ever holding it in
+memory. Memory is bounded by the number of users (two bytes each for
+compact non-negative integer ids, ten for sparse, negative or hashed
+ids) and the number of day/segment cells, not by the number of rows.
+Rows with a null arm, user id or timestamp are counted and reported but
+left out of the checks that need that field.
+``validation_report`` turns the state into checks: SRM against arbitrary
+allocations (overall, per day and per segment value), users exposed to
+more than one arm, duplicate sessions per user and timestamp problems.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.data_utils import encode_user_ids
+from src.experiments import srm_check
+
+SEGMENTS = ('device', 'traffic_source')
+MAX_ARMS = 8
+# Per-user masks: one bit per arm plus a 'seen' bit, so users seen only in rows without an arm still count
+SEEN_BIT = np.uint16(1 << MAX_ARMS)
+ARM_BITS = SEEN_BIT - np.uint16(1)
+# Integer ids index the dense bitmask only while the largest id stays below this many times the rows seen
+DENSE_ID_FACTOR = 4
+
+
+def _merge_masks(keys, masks, new_keys, new_masks):
+    """OR-merge sorted (key, bitmask) arrays with unsorted new ones."""
+    all_keys = np.concatenate([keys, new_keys])
+    all_masks = np.concatenate([masks, new_masks])
+    order = np.argsort(all_keys, kind='stable')
+    all_keys, all_masks = all_keys[order], all_masks[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(all_keys)) + 1] if len(all_keys) else np.array([], int)
+    return all_keys[starts], np.bitwise_or.reduceat(all_masks, starts) if len(starts) else all_masks
+
+
+def _stable_codes(values, labels):
+    """Codes of ``values`` in the growing list ``labels`` (first-seen order, -1 for missing)."""
+    cat = values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values)
+    names = [str(c) for c in cat.categories]
+    for name in names:
+        if name not in labels:
+            labels.append(name)
+    mapping = np.array([labels.index(name) for name in names] + [-1], dtype=np.int64)
+    return mapping[cat.codes]
+
+
+def update_validation(state, chunk, segments=SEGMENTS):
+    """
+    Fold one chunk of sessions into a validation state (``state`` may be None).
+
+    Chunks should arrive in file order; the ordering check compares each
+    chunk's first timestamp with the previous chunk's last one. Labels are
+    mapped to integer codes that stay stable across chunks, so every count
+    is a ``np.bincount``. Rows without an arm are left out of every arm
+    count, rows without a user id out of the user checks and rows with a
+    NaT timestamp out of the per-day counts and timestamp checks.
+    """
+    if state is None:
+        state = {'rows': 0, 'nulls': None, 'arms': [], 'arm_counts': np.zeros(MAX_ARMS, np.int64),
+                 'daily': pd.Series(dtype=np.int64), 'segments': {},
+                 'user_mask': np.zeros(0, np.uint16), 'sorted_keys': None, 'sorted_masks': None,
+                 'user_sessions': 0, 'null_group': 0, 'null_user_id': 0, 'null_timestamp': 0,
+                 'ts_min': None, 'ts_max': None, 'ts_last': None, 'out_of_order': 0}
+    state['rows'] += len(chunk)
+    nulls = chunk.isnull().sum()
+    state['nulls'] = nulls if state['nulls'] is None else state['nulls'].add(nulls, fill_value=0)
+    if not len(chunk):
+        return state
+
+    arm_code = _stable_codes(chunk['group'], state['arms'])
+    if len(state['arms']) > MAX_ARMS:
+        raise ValueError(f"More than {MAX_ARMS} arms: {state['arms']}")
+    valid = arm_code >= 0
+    arm = arm_code[valid]
+    state['arm_counts'] += np.bincount(arm, minlength=MAX_ARMS)
+    state['null_group'] += int(np.count_nonzero(~valid))
+
+    # Sessions per day × arm, keyed by day number · MAX_ARMS + arm
+    t = pd.to_datetime(chunk['timestamp']).to_numpy()
+    has_ts = ~np.isnat(t)
+    state['null_timestamp'] += int(np.count_nonzero(~has_ts))
+    day = t.astype('datetime64[D]').astype(np.int64)
+    daily = pd.Series(day[valid & has_ts] * MAX_ARMS + arm_code[valid & has_ts]).value_counts()
+    state['daily'] = state['daily'].add(daily, fill_value=0).astype(np.int64)
+
+    for seg in segments:
+        if seg not in chunk.columns:
+            continue
+        entry = state['segments'].setdefault(seg, {'labels': [], 'counts': np.zeros((0, MAX_ARMS), np.int64)})
+        code = _stable_codes(chunk[seg], entry['labels'])[valid]
+        keep = code >= 0
+        n = len(entry['labels'])
+        counts = np.bincount(code[keep] * MAX_ARMS + arm[keep], minlength=n * MAX_ARMS)
+        grown = np.zeros((n, MAX_ARMS), np.int64)
+        grown[:len(entry['counts'])] = entry['counts']
+        entry['counts'] = grown + counts.reshape(n, MAX_ARMS)
+
+    # Per-user arm bitmask over every row with a user id (arm bits only where the arm is known):
+    # dense array indexed by compact non-negative integer ids, sorted (key, mask) arrays for
+    # anything else, hashed ids included (from then on, for every chunk)
+    has_user = chunk['user_id'].notna().to_numpy()
+    state['null_user_id'] += int(np.count_nonzero(~has_user))
+    keys = encode_user_ids(chunk['user_id'][has_user]).astype(np.int64)
+    user_arm = arm_code[has_user]
+    bits = np.where(user_arm >= 0, np.left_shift(1, user_arm.clip(0)), 0).astype(np.uint16) | SEEN_BIT
+    state['user_sessions'] += len(keys)
+    dense = (state['sorted_keys'] is None
+             and (not len(keys) or (keys.min() >= 0 and keys.max() < DENSE_ID_FACTOR * state['rows'])))
+    if not dense:
+        if state['sorted_keys'] is None:
+            seen = np.flatnonzero(state['user_mask'])
+            state['sorted_keys'], state['sorted_masks'] = seen.astype(np.int64), state['user_mask'][seen]
+            state['user_mask'] = np.zeros(0, np.uint16)
+        k, m = np.unique(keys, return_inverse=True)
+        masks = np.zeros(len(k), np.uint16)
+        np.bitwise_or.at(masks, m, bits)
+        state['sorted_keys'], state['sorted_masks'] = _merge_masks(
+            state['sorted_keys'], state['sorted_masks'], k, masks)
+    elif len(keys):
+        size = int(keys.max()) + 1
+        if size > len(state['user_mask']):
+            grown = np.zeros(max(size, 2 * len(state['user_mask'])), np.uint16)
+            grown[:len(state['user_mask'])] = state['user_mask']
+            state['user_mask'] = grown
+        np.bitwise_or.at(state['user_mask'], keys, bits)
+
+    # Timestamps: range and rows earlier than their predecessor (within and across chunks)
+    t = t[has_ts]
+    if not len(t):
+        return state
+    state['out_of_order'] += int(np.count_nonzero(t[1:] < t[:-1]))
+    if state['ts_last'] is not None and t[0] < state['ts_last']:
+        state['out_of_order'] += 1
+    state['ts_last'] = t[-1]
+    state['ts_min'] = t.min() if state['ts_min'] is None else min(state['ts_min'], t.min())
+    state['ts_max'] = t.max() if state['ts_max'] is None else max(state['ts_max'], t.max())
+    return state
+
+
+def _srm_table(counts, arms, allocation, threshold):
+    """``srm_check`` per cell of a (cell, arm) count Series, with unseen arms counted as 0."""
+    table = counts.unstack('group', fill_value=0).reindex(columns=arms, fill_value=0)
+    summary = table.stack().rename('sessions').to_frame()
+    srm = srm_check(summary, allocation, threshold)
+    return table.join(srm[['chi2', 'srm_p_value', 'srm_flag']])
+
+
+def validation_report(state, allocation=None, threshold=0.01, start=None, end=None):
+    """
+    Checks from a validation state.
+
+    ``allocation`` is the planned split ({arm: weight}; default equal) used
+    for every SRM test. ``start``/``end`` bound the expected timestamp
+    window (``start <= timestamp < end``); only the observed range can be
+    checked from the state, so out-of-window data is reported as a flag.
+    Returns the ``validate_data`` keys plus a user-level SRM, per-day /
+    per-segment SRM tables, switched users, timestamp checks and the rows
+    each check had to skip (null arm, user id or timestamp). The cell
+    tables count sessions; with several sessions per user they overstate
+    evidence, so treat isolated flags there as prompts to look, not verdicts.
+    """
+    arms = state['arms']
+    checks = {'total_rows': state['rows'],
+              'null_counts': state['nulls'].astype(int).to_dict() if state['nulls'] is not None else {},
+              'rows_without_group': state['null_group'], 'rows_without_user_id': state['null_user_id'],
+              'rows_without_timestamp': state['null_timestamp']}
+
+    if state['sorted_keys'] is not None:
+        masks = state['sorted_masks']
+    else:
+        masks = state['user_mask'][state['user_mask'] > 0]
+    arm_masks = (masks & ARM_BITS).astype(np.uint8)
+    n_arms_seen = np.unpackbits(arm_masks[:, None], axis=1).sum(axis=1)
+    checks['unique_users'] = int(len(masks))
+    checks['duplicate_user_ids'] = int(state['user_sessions'] - len(masks))
+    checks['switched_users'] = int(np.count_nonzero(n_arms_seen > 1))
+
+    overall = pd.Series(state['arm_counts'][:len(arms)], index=pd.Index(arms, name='group'))
+    checks['group_counts'] = {arm: int(n) for arm, n in overall.items()}
+    srm = _srm_table(pd.concat({'all': overall}, names=['cell']), arms, allocation, threshold)
+    checks['srm_chi2'] = round(float(srm['chi2'].iloc[0]), 4)
+    checks['srm_p_value'] = round(float(srm['srm_p_value'].iloc[0]), 4)
+    checks['srm_flag'] = bool(srm['srm_flag'].iloc[0])
+
+    # Randomisation is per user: the same test on users (those seen in exactly one arm)
+    single = arm_masks[n_arms_seen == 1]
+    users = pd.Series(np.bincount(np.log2(single).astype(int), minlength=len(arms))[:len(arms)],
+                      index=pd.Index(arms, name='group'))
+    srm_users = _srm_table(pd.concat({'all': users}, names=['cell', 'group']), arms, allocation, threshold)
+    checks['users_per_group'] = {arm: int(n) for arm, n in users.items()}
+    checks['srm_users_p_value'] = round(float(srm_users['srm_p_value'].iloc[0]), 4)
+    checks['srm_users_flag'] = bool(srm_users['srm_flag'].iloc[0])
+
+    keys = state['daily'].index.to_numpy(np.int64)
+    daily = pd.Series(state['daily'].to_numpy(), index=pd.MultiIndex.from_arrays(
+        [(keys // MAX_ARMS).astype('datetime64[D]').astype('datetime64[ns]'),
+         np.array(arms, dtype=object)[keys % MAX_ARMS]], names=['date', 'group'])).sort_index()
+    checks['srm_by_day'] = _srm_table(daily, arms, allocation, threshold)
+    checks['srm_by_segment'] = {}
+    for seg, entry in state['segments'].items():
+        table = pd.DataFrame(entry['counts'][:, :len(arms)], index=pd.Index(entry['labels'], name=seg),
+                             columns=pd.Index(arms, name='group')).sort_index()
+        checks['srm_by_segment'][seg] = _srm_table(table.stack(), arms, allocation, threshold)
+
+    checks['timestamp_min'] = pd.Timestamp(state['ts_min']) if state['ts_min'] is not None else None
+    checks['timestamp_max'] = pd.Timestamp(state['ts_max']) if state['ts_max'] is not None else None
+    checks['timestamp_out_of_order'] = state['out_of_order']
+    checks['timestamp_sorted'] = state['out_of_order'] == 0
+    in_window = True
+    if start is not None and checks['timestamp_min'] is not None:
+        in_window &= checks['timestamp_min'] >= pd.Timestamp(start)
+    if end is not None and checks['timestamp_max'] is not None:
+        in_window &= checks['timestamp_max'] < pd.Timestamp(end)
+    checks['timestamp_in_window'] = bool(in_window)
+    return checks
+
+
+def validate_stream(chunks, allocation=None, segments=SEGMENTS, threshold=0.01, start=None, end=None):
+    """``validation_report`` over an iterable of session chunks (e.g. ``iter_ab_data``)."""
+    state = None
+    for chunk in chunks:
+        state = update_validation(state, chunk, segments)
+    if state is None:
+        raise ValueError("No session chunks to validate")
+    return validation_report(state, allocation, threshold, start, end)
@@ -0,0 +1,29 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from src.cube import build_cube, merge_cubes, rollup
+from src.data_utils import add_derived_features, compact_sessions
+from src.simulation import generate_dataset
+
+DF = compact_sessions(add_derived_features(generate_dataset(n_days=8, target_total_sessions=16000, seed=6)))
+
+
+@pytest.mark.parametrize('dims', [['device', 'group'], ['day_of_week', 'group'], ['date', 'hour'],
+                                  ['traffic_source']])
+def test_rollup_equals_session_groupby(dims):
+    table = rollup(build_cube(DF), dims)
+    expected = DF.groupby(dims, observed=True).agg(
+        sessions=('converted', 'size'), conversions=('converted', 'sum'), revenue=('revenue', 'sum'),
+        cvr=('converted', 'mean'), revenue_per_session=('revenue', 'mean'), revenue_sd=('revenue', 'std'))
+    pd.testing.assert_frame_equal(table[expected.columns], expected, check_dtype=False,
+                                  check_index_type=False, check_names=False, rtol=1e-9)
+    orders = DF[DF['converted'] == 1].groupby(dims, observed=True)['revenue'].mean()
+    pd.testing.assert_series_equal(table['aov'].dropna(), orders, check_names=False,
+                                   check_index_type=False, rtol=1e-9)
+
+
+def test_cubes_from_chunks_merge_to_the_full_cube():
+    chunks = [build_cube(DF.iloc[idx]) for idx in np.array_split(np.arange(len(DF)), 3)]
+    pd.testing.assert_frame_equal(merge_cubes(*chunks), build_cube(DF), rtol=1e-9)
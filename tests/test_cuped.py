@@ -0,0 +1,131 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from src.cuped import (attach_covariates, cuped_analysis, cuped_test, load_covariates,
+                       pre_period_covariates)
+from src.simulation import generate_dataset, generate_pre_period
+from src.user_level import user_aggregates
+
+
+def _sessions(user_ids, revenue):
+    n = len(user_ids)
+    return pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=n, freq='h'),
+                         'user_id': user_ids, 'group': ['control', 'treatment'] * (n // 2) + ['control'] * (n % 2),
+                         'converted': [int(r > 0) for r in revenue], 'revenue': revenue})
+
+
+PRE = _sessions(['U100000', 'U050000', 'U000002'], [50.0, 20.0, 5.0])
+EXPERIMENT = _sessions(['U000000', 'U000001', 'U000002', 'U100000'], [0.0, 0.0, 0.0, 0.0])
+
+
+def test_user_aggregates_indexed_by_user_id_when_ids_are_sparse():
+    assert sorted(user_aggregates(PRE).index) == [2, 50000, 100000]
+
+
+def test_attach_covariates_joins_sparse_ids_by_user():
+    users = attach_covariates(user_aggregates(EXPERIMENT), pre_period_covariates(PRE))
+    assert users.loc[100000, 'prior_revenue'] == 50.0
+    assert users.loc[2, 'prior_revenue'] == 5.0
+    assert users.loc[0, 'prior_revenue'] == 0.0
+    assert users.loc[1, 'prior_revenue'] == 0.0
+
+
+def test_cached_covariates_keyed_by_user_id(tmp_path):
+    pre_path = tmp_path / 'pre.csv'
+    PRE.to_csv(pre_path, index=False)
+    first = load_covariates(pre_path)
+    cached = load_covariates(pre_path)
+    assert cached.loc[100000, 'prior_revenue'] == first.loc[100000, 'prior_revenue'] == 50.0
+
+
+def test_cached_covariates_refresh_when_a_partition_is_rewritten(tmp_path):
+    pre_dir = tmp_path / 'pre'
+    pre_dir.mkdir()
+    PRE.iloc[:2].to_parquet(pre_dir / 'sessions_0000.parquet', index=False)
+    PRE.iloc[2:].to_parquet(pre_dir / 'sessions_0001.parquet', index=False)
+    assert load_covariates(pre_dir).loc[2, 'prior_revenue'] == 5.0
+
+    # Rewriting a part in place leaves the directory's own mtime unchanged
+    dir_mtime = os.stat(pre_dir).st_mtime_ns
+    rewritten = PRE.iloc[2:].assign(revenue=7.0)
+    rewritten.to_parquet(pre_dir / 'sessions_0001.parquet', index=False)
+    os.utime(pre_dir, ns=(dir_mtime, dir_mtime))
+    assert load_covariates(pre_dir).loc[2, 'prior_revenue'] == 7.0
+    assert load_covariates(pre_dir).loc[2, 'prior_revenue'] == 7.0
+
+
+def test_attach_covariates_joins_non_u_ids_by_user():
+    pre = _sessions(['alice', 'bob'], [100.0, 0.0])
+    users = attach_covariates(user_aggregates(_sessions(['bob', 'carol'], [0.0, 0.0])),
+                              pre_period_covariates(pre))
+    assert users['prior_revenue'].tolist() == [0.0, 0.0]
+    users = attach_covariates(user_aggregates(_sessions(['alice', 'carol'], [0.0, 0.0])),
+                              pre_period_covariates(pre))
+    assert sorted(users['prior_revenue']) == [0.0, 100.0]
+
+
+def test_u_ids_join_between_mixed_and_pure_frames():
+    # One non-U id must not change how the U ids of its frame are encoded
+    mixed = _sessions(['U100000', 'alice', 'U000002', 'bob'], [0.0, 0.0, 0.0, 0.0])
+    users = attach_covariates(user_aggregates(mixed), pre_period_covariates(PRE))
+    assert users.loc[100000, 'prior_revenue'] == 50.0
+    assert users.loc[2, 'prior_revenue'] == 5.0
+    assert users['prior_revenue'].sum() == 55.0
+
+    mixed_pre = _sessions(['U100000', 'alice', 'U000002'], [50.0, 30.0, 5.0])
+    users = attach_covariates(user_aggregates(EXPERIMENT), pre_period_covariates(mixed_pre))
+    assert users.loc[100000, 'prior_revenue'] == 50.0
+    assert users['prior_revenue'].sum() == 55.0
+
+
+def _correlated_users(n=4000, effect=0.5, rho=0.8, seed=0):
+    """Per-user revenue whose pre-period value explains rho² of its variance."""
+    rng = np.random.default_rng(seed)
+    prior = rng.normal(10.0, 3.0, 2 * n)
+    noise = rng.normal(0.0, 3.0 * np.sqrt(1 - rho ** 2) / rho, 2 * n)
+    group = np.repeat(['control', 'treatment'], n)
+    return pd.DataFrame({'group': group, 'sessions': 1.0, 'prior_revenue': prior,
+                         'revenue': 20.0 + prior + noise + effect * (group == 'treatment')})
+
+
+def test_cuped_theta_and_variance_on_correlated_covariate():
+    users = _correlated_users()
+    out = cuped_test(users, 'revenue_per_user', covariates=['prior_revenue'])
+
+    centred = users.groupby('group')[['prior_revenue', 'revenue']].transform(lambda c: c - c.mean())
+    theta = (centred['prior_revenue'] @ centred['revenue']) / (centred['prior_revenue'] @ centred['prior_revenue'])
+    assert out['theta_prior_revenue'] == pytest.approx(theta)
+    assert out['theta_prior_revenue'] == pytest.approx(1.0, abs=0.05)
+
+    residual = centred['revenue'] - theta * centred['prior_revenue']
+    n = users['group'].value_counts()
+    se = np.sqrt(sum(residual[users['group'] == g].var() / n[g] for g in n.index))
+    assert out['se'] == pytest.approx(se)
+    assert out['variance_reduction'] == pytest.approx(0.64, abs=0.03)
+    assert out['se'] < 0.7 * out['se_unadjusted']
+    assert out['ci_hi'] - out['ci_lo'] < 0.7 * (2 * 1.96 * out['se_unadjusted'])
+    assert out['ci_lo'] < 0.5 < out['ci_hi']
+
+
+def test_cuped_leaves_uncorrelated_covariate_near_zero_reduction():
+    users = _correlated_users()
+    users['prior_revenue'] = np.random.default_rng(1).permutation(users['prior_revenue'].to_numpy())
+    out = cuped_test(users, 'revenue_per_user', covariates=['prior_revenue'])
+    assert out['variance_reduction'] == pytest.approx(0.0, abs=0.005)
+    assert out['diff'] == pytest.approx(out['diff_unadjusted'], abs=0.02)
+
+
+def test_opt_in_propensity_reduces_variance_and_keeps_traffic():
+    kwargs = dict(n_days=7, target_total_sessions=40000, seed=5, propensity_shape=1.0)
+    df = generate_dataset(**kwargs)
+    pre = generate_pre_period(pre_days=14, **kwargs)
+    # Per-user propensity carries over from the pre-period, so even per-session CVR is predictable
+    out = cuped_analysis(df, pre_period_covariates(pre), metrics=('cvr',))
+    assert out.loc['cvr', 'variance_reduction'] > 0.01
+
+    # Opting in only changes conversions: users, arms and timestamps match the default dataset
+    base = generate_dataset(n_days=7, target_total_sessions=40000, seed=5)
+    cols = ['user_id', 'timestamp', 'group', 'device', 'traffic_source']
+    pd.testing.assert_frame_equal(df[cols], base[cols])
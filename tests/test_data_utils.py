@@ -0,0 +1,105 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from src import data_utils
+from src.data_utils import add_derived_features, compact_sessions, load_ab_data, parquet_cache_path
+from src.simulation import generate_dataset, write_sessions
+
+
+RAW = add_derived_features(generate_dataset(n_days=3, target_total_sessions=6000, seed=2))
+
+
+def test_compact_sessions_keeps_values_and_shrinks_memory():
+    compact = compact_sessions(RAW)
+    assert compact.memory_usage(deep=True).sum() < RAW.memory_usage(deep=True).sum() / 5
+    assert (compact['user_id'] == RAW['user_id'].str.slice(1).astype(int)).all()
+    assert compact['revenue'].dtype == np.float64
+    for col in ('group', 'device', 'traffic_source', 'day_of_week'):
+        assert (compact[col].astype(str) == RAW[col].astype(str)).all()
+    by = ['date', 'device', 'group']
+    pd.testing.assert_frame_equal(
+        compact.groupby(by, observed=True)[['converted', 'revenue']].sum().reset_index(drop=True),
+        RAW.groupby(by)[['converted', 'revenue']].sum().reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize('pyarrow', [True, False])
+def test_user_ids_encode_element_wise(monkeypatch, pyarrow):
+    monkeypatch.setattr(data_utils, '_has_pyarrow', lambda: pyarrow)
+    mixed = data_utils.encode_user_ids(pd.Series(['U0000123', 'alice', 'U5', 'U' + '9' * 19, 7], dtype=object))
+    assert mixed[[0, 2]].tolist() == [123, 5]
+    assert (mixed[[1, 3, 4]] < 0).all()
+    assert data_utils.encode_user_ids(pd.Series(['U5', 'U0000123'])).tolist() == [5, 123]
+    assert data_utils.encode_user_ids(pd.Series(['bob', 'alice']))[1] == mixed[1]
+
+
+def test_derived_features_in_place_match_copy():
+    df = generate_dataset(n_days=3, target_total_sessions=6000, seed=2)
+    assert add_derived_features(df, inplace=True) is df
+    pd.testing.assert_frame_equal(df, RAW)
+
+
+def test_derived_features_keep_missing_timestamps_missing():
+    df = generate_dataset(n_days=3, target_total_sessions=6000, seed=2).head(10)
+    df.loc[[2, 7], 'timestamp'] = pd.NaT
+    out = add_derived_features(df)
+    missing = df['timestamp'].isna()
+    assert out.loc[missing, 'date'].isna().all() and out.loc[missing, 'hour'].isna().all()
+    assert out.loc[missing, 'day_of_week'].isna().all()
+    assert (out.loc[~missing, 'day_of_week'].astype(str) == df.loc[~missing, 'timestamp'].dt.day_name()).all()
+    assert (out.loc[~missing, 'hour'] == df.loc[~missing, 'timestamp'].dt.hour).all()
+    compact = compact_sessions(out)
+    assert compact['hour'].isna().sum() == 2 and compact['day_of_week'].isna().sum() == 2
+
+
+@pytest.fixture
+def parquet_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_utils, 'PARQUET_CACHE_DIR', tmp_path / 'cache')
+    return tmp_path / 'cache'
+
+
+@pytest.mark.parametrize('columns, start, end', [
+    (None, None, None),
+    (['user_id', 'revenue'], None, None),
+    (['group', 'converted'], '2024-09-03 06:00', '2024-09-04'),
+    (None, '2024-09-03', None),
+])
+def test_parquet_projection_and_pushdown_match_csv(tmp_path, parquet_cache, columns, start, end):
+    data = tmp_path / 'data'
+    write_sessions(data, n_days=3, target_total_sessions=3000, seed=4, chunk_rows=400)
+    ref = pd.concat([pd.read_csv(f, parse_dates=['timestamp']) for f in sorted(data.glob('*.csv'))],
+                    ignore_index=True)
+    mask = np.ones(len(ref), dtype=bool)
+    if start is not None:
+        mask &= ref['timestamp'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= ref['timestamp'] < pd.Timestamp(end)
+    assert 0 < mask.sum()
+    ref = ref[mask].reset_index(drop=True)
+    ref = ref[columns] if columns is not None else ref
+
+    for storage in ('parquet', 'csv'):
+        out = load_ab_data(data, columns=columns, start=start, end=end, storage=storage)
+        assert list(out.columns) == list(ref.columns)
+        pd.testing.assert_frame_equal(out.astype({c: object for c in out.select_dtypes('category')}),
+                                      ref, check_dtype=False)
+    # Conversions go to the cache, never into the data directory
+    assert not list(data.glob('*.parquet')) and list(parquet_cache.glob('*.parquet'))
+
+
+def test_parquet_parts_refresh_when_their_csv_is_newer(tmp_path, parquet_cache):
+    data = tmp_path / 'data'
+    write_sessions(data, n_days=2, target_total_sessions=2000, seed=4, chunk_rows=400)
+    csvs = sorted(data.glob('*.csv'))
+    before = load_ab_data(data)
+    # A part already converted in place (e.g. an interrupted bulk conversion) is used as is
+    pd.read_csv(csvs[0], parse_dates=['timestamp']).to_parquet(csvs[0].with_suffix('.parquet'), index=False)
+    os.utime(csvs[0], ns=(1, 1))
+    assert len(load_ab_data(data)) == len(before)
+
+    edited = pd.read_csv(csvs[-1]).iloc[:-5]
+    edited.to_csv(csvs[-1], index=False)
+    stamp = os.stat(parquet_cache_path(csvs[-1])).st_mtime_ns + 10 ** 9
+    os.utime(csvs[-1], ns=(stamp, stamp))
+    assert len(load_ab_data(data)) == len(before) - 5
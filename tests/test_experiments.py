@@ -0,0 +1,72 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from statsmodels.stats.multitest import multipletests
+from src.experiments import grouped_multipletests, run_experiments, srm_check
+from src.online import summarize_sessions, summary_results
+
+
+SUMMARY = pd.DataFrame({'sessions': [500, 250, 250]},
+                       index=pd.MultiIndex.from_tuples([('exp', 'a'), ('exp', 'b'), ('exp', 'c')]))
+
+
+def test_srm_matches_chisquare_for_planned_weights():
+    out = srm_check(SUMMARY, {'a': 0.5, 'b': 0.3, 'c': 0.2}).loc['exp']
+    ref = stats.chisquare([500, 250, 250], [500, 300, 200])
+    assert out['chi2'] == pytest.approx(ref.statistic)
+    assert out['srm_p_value'] == pytest.approx(ref.pvalue)
+
+
+def test_srm_rejects_allocation_missing_an_arm():
+    with pytest.raises(ValueError, match='c'):
+        srm_check(SUMMARY, {'a': 0.5, 'b': 0.25})
+
+
+@pytest.mark.parametrize('method', ['bonferroni', 'holm', 'fdr_bh', 'sidak'])
+def test_grouped_multipletests_matches_statsmodels_per_group(method):
+    rng = np.random.default_rng(0)
+    p = rng.uniform(0, 0.2, 300) ** 2
+    p[rng.choice(300, 20, replace=False)] = np.nan
+    groups = rng.integers(0, 40, 300)
+    adjusted = grouped_multipletests(p, groups, method)
+    for g in np.unique(groups):
+        idx = np.flatnonzero((groups == g) & np.isfinite(p))
+        np.testing.assert_allclose(adjusted[idx], multipletests(p[idx], method=method)[1], atol=1e-12)
+    assert np.isnan(adjusted[np.isnan(p)]).all()
+
+
+def test_run_experiments_matches_single_experiment_path():
+    rng = np.random.default_rng(1)
+    n = 60000
+    df = pd.DataFrame({
+        'experiment_id': rng.choice(['exp_a', 'exp_b', 'exp_c'], n),
+        'group': rng.choice(['control', 'variant_1', 'variant_2'], n),
+        'converted': (rng.random(n) < 0.05).astype(np.int8),
+    })
+    df['revenue'] = np.where(df['converted'] == 1, rng.gamma(4.0, 17.0, n).round(2), 0.0)
+
+    results = run_experiments(df).set_index(['experiment_id', 'group', 'metric'])
+    variants = df.loc[df['group'] != 'control', ['experiment_id', 'group']].drop_duplicates()
+    for exp, arm in variants.itertuples(index=False):
+        pair = df[(df['experiment_id'] == exp) & df['group'].isin(['control', arm])]
+        ref = summary_results(summarize_sessions(pair, by=('group',)), treatment=arm)
+        assert results.loc[(exp, arm, 'cvr'), 'diff'] == pytest.approx(ref['cvr_diff'])
+        assert results.loc[(exp, arm, 'cvr'), 'p_value'] == pytest.approx(ref['cvr_p_value'])
+        assert results.loc[(exp, arm, 'revenue_per_session'), 'p_value'] == pytest.approx(ref['rps_p_value'])
+        assert results.loc[(exp, arm, 'aov'), 'p_value'] == pytest.approx(ref['aov_p_value'])
+    pd.testing.assert_frame_equal(run_experiments(df, workers=2), run_experiments(df))
+
+
+@pytest.mark.parametrize('method', ['holm', 'fdr_bh'])
+def test_grouped_multipletests_keeps_tiny_p_values_in_later_groups(method):
+    rng = np.random.default_rng(4)
+    groups = np.repeat(np.arange(8), 5)
+    p = 10.0 ** -rng.uniform(250, 305, len(groups))
+    adjusted = grouped_multipletests(p, groups, method)
+    assert (adjusted > 0).all()
+    for g in np.unique(groups):
+        idx = np.flatnonzero(groups == g)
+        np.testing.assert_allclose(adjusted[idx], multipletests(p[idx], method=method)[1], rtol=1e-12)
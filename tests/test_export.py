@@ -0,0 +1,40 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+from src.export import DIMENSIONS, write_star_schema
+from src.simulation import generate_dataset
+
+DF = generate_dataset(n_days=3, target_total_sessions=6000, seed=5)
+
+
+def test_star_schema_joins_back_to_the_sessions(tmp_path):
+    write_star_schema(DF, tmp_path, rows_per_file=500)
+    counts = write_star_schema(DF, tmp_path, rows_per_file=2500)
+    parts = sorted((tmp_path / 'fact_sessions').glob('part-*.parquet'))
+    # Rewriting with larger parts removes the stale ones
+    assert len(parts) == -(-len(DF) // 2500)
+    fact = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+    assert counts['fact_sessions'] == len(fact) == len(DF)
+
+    for name, (col, key) in DIMENSIONS.items():
+        dim = pd.read_parquet(tmp_path / f'{name}.parquet')
+        fact = fact.merge(dim, on=key, how='left')
+        assert (fact[col].astype(str) == DF[col].astype(str)).all()
+    pd.testing.assert_series_equal(fact['revenue'], DF['revenue'])
+    assert (fact['user_id'] == DF['user_id']).all()
+
+
+def test_daily_fact_equals_session_groupby(tmp_path):
+    write_star_schema(DF, tmp_path)
+    daily = pd.read_parquet(tmp_path / 'fact_daily.parquet')
+    dims = {name: pd.read_parquet(tmp_path / f'{name}.parquet') for name in DIMENSIONS}
+    for name, (col, key) in DIMENSIONS.items():
+        daily = daily.merge(dims[name], on=key)
+    daily = daily.set_index(['date_key', 'group', 'device', 'traffic_source']).sort_index()
+
+    date_key = DF['timestamp'].dt.strftime('%Y%m%d').astype(int).rename('date_key')
+    expected = (DF.groupby([date_key, 'group', 'device', 'traffic_source'])
+                  .agg(sessions=('converted', 'size'), conversions=('converted', 'sum'),
+                       revenue=('revenue', 'sum')))
+    pd.testing.assert_frame_equal(daily[['sessions', 'conversions', 'revenue']], expected,
+                                  check_dtype=False, check_index_type=False, atol=0.01)
@@ -0,0 +1,20 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+from src.montecarlo import run_power_simulation, type_i_error
+
+SMALL = {'n_days': 7, 'target_total_sessions': 14000}
+
+
+def test_null_rejection_rates_match_each_procedure():
+    out = type_i_error(1000, **SMALL)
+    for test in ('ztest', 'welch_revenue', 'group_sequential'):
+        assert abs(out.loc[test, 'rate'] - 0.05) <= 4 * out.loc[test, 'mc_se']
+    # Daily peeking inflates the error rate; mSPRT stays below alpha at every look
+    assert out.loc['peeking', 'rate'] > 0.1
+    assert out.loc['msprt', 'rate'] <= 0.05
+
+
+def test_results_do_not_depend_on_worker_count():
+    pd.testing.assert_frame_equal(run_power_simulation(100, batch_size=25, workers=2, **SMALL),
+                                  run_power_simulation(100, batch_size=25, **SMALL))
@@ -0,0 +1,33 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from src.online import rollup_summary, summarize_sessions, summary_results, update_summary
+from src.simulation import generate_dataset
+
+
+DF = generate_dataset(n_days=4, target_total_sessions=20000, seed=4)
+
+
+def test_streamed_summary_equals_full_frame_aggregate():
+    summary = None
+    for chunk in np.array_split(np.arange(len(DF)), 7):
+        summary = update_summary(summary, DF.iloc[chunk], by=('date', 'device', 'group'))
+    full = summarize_sessions(DF, by=('date', 'device', 'group'))
+    pd.testing.assert_frame_equal(summary, full, check_dtype=False, rtol=1e-9)
+    pd.testing.assert_frame_equal(rollup_summary(summary, ['group']),
+                                  summarize_sessions(DF, by=('group',)), check_dtype=False, rtol=1e-9)
+
+
+def test_summary_results_match_session_level_tests():
+    results = summary_results(summarize_sessions(DF, by=('date', 'device', 'group')))
+    control, treatment = (DF[DF['group'] == g] for g in ('control', 'treatment'))
+    rps = stats.ttest_ind(treatment['revenue'], control['revenue'], equal_var=False)
+    assert results['cvr_treatment'] - results['cvr_control'] == pytest.approx(
+        treatment['converted'].mean() - control['converted'].mean())
+    assert results['rps_p_value'] == pytest.approx(rps.pvalue, rel=1e-6)
+    orders = [g.loc[g['converted'] == 1, 'revenue'] for g in (control, treatment)]
+    assert results['aov_p_value'] == pytest.approx(
+        stats.ttest_ind(orders[1], orders[0], equal_var=False).pvalue, rel=1e-6)
@@ -0,0 +1,72 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import functools
+import pandas as pd
+import pytest
+from src import pipeline
+from src.pipeline import run_stage
+from src.simulation import generate_dataset
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / 'sessions.csv'
+    generate_dataset(n_days=3, target_total_sessions=3000, seed=6).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Count how often each stage function actually runs."""
+    counts = {}
+    for name, (func, upstream) in list(pipeline.STAGES.items()):
+        @functools.wraps(func)
+        def counted(*args, _name=name, _func=func, **kwargs):
+            counts[_name] = counts.get(_name, 0) + 1
+            return _func(*args, **kwargs)
+        monkeypatch.setitem(pipeline.STAGES, name, (counted, upstream))
+    return counts
+
+
+def test_cached_stage_is_not_recomputed(data, tmp_path, calls):
+    first = run_stage('tests', data, cache_dir=tmp_path / 'cache')
+    assert calls == {'load': 1, 'features': 1, 'aggregates': 1, 'tests': 1}
+    assert run_stage('tests', data, cache_dir=tmp_path / 'cache') == first
+    assert calls == {'load': 1, 'features': 1, 'aggregates': 1, 'tests': 1}
+    # A new parameter only reruns the stage that takes it
+    run_stage('tests', data, cache_dir=tmp_path / 'cache', alpha=0.1)
+    assert calls == {'load': 1, 'features': 1, 'aggregates': 1, 'tests': 2}
+
+
+def test_content_change_invalidates_downstream_stages(data, tmp_path, calls):
+    first = run_stage('tests', data, cache_dir=tmp_path / 'cache')
+    df = pd.read_csv(data)
+    df.iloc[:-10].to_csv(data, index=False)
+    second = run_stage('tests', data, cache_dir=tmp_path / 'cache')
+    assert calls['load'] == calls['tests'] == 2
+    assert second['sessions_control'] + second['sessions_treatment'] == len(df) - 10
+    assert second != first
+
+
+def test_cache_version_bump_invalidates_every_stage(data, tmp_path, calls, monkeypatch):
+    run_stage('aggregates', data, cache_dir=tmp_path / 'cache')
+    monkeypatch.setattr(pipeline, 'CACHE_VERSION', pipeline.CACHE_VERSION + 1)
+    run_stage('aggregates', data, cache_dir=tmp_path / 'cache')
+    assert calls == {'load': 2, 'features': 2, 'aggregates': 2}
+
+
+def test_interrupted_write_leaves_no_cache_entry(data, tmp_path, calls, monkeypatch):
+    cache = tmp_path / 'cache'
+    run_stage('load', data, cache_dir=cache)
+
+    def crash(obj, path):
+        open(path, 'wb').write(b'partial')
+        raise KeyboardInterrupt
+    with monkeypatch.context() as m, pytest.raises(KeyboardInterrupt):
+        m.setattr(pipeline.pd, 'to_pickle', crash)
+        run_stage('features', data, cache_dir=cache)
+    # Only the per-process temp file was written; the stage is recomputed, not read half-written
+    assert [p.name for p in cache.glob('features-*')] == [
+        f"features-{pipeline.stage_key('features', data, cache)}.{os.getpid()}.tmp"]
+    assert 'hour' in run_stage('features', data, cache_dir=cache).columns
+    assert calls['features'] == 2
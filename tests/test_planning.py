@@ -0,0 +1,29 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from src.planning import _cached_sample_size, build_power_table, load_power_table, planned_sample_size, table_sample_size
+from src.stats_utils import required_sample_size_batch, required_sample_size_unrounded
+
+
+def test_table_lookup_matches_direct_solve(tmp_path):
+    build_power_table(tmp_path)
+    table = load_power_table(tmp_path)
+    rng = np.random.default_rng(0)
+    baselines = rng.uniform(0.01, 0.4, 500)
+    mdes = np.exp(rng.uniform(np.log(0.001), np.log(0.05), 500))
+
+    n = table_sample_size(table, baselines, mdes)
+    assert np.abs(n - required_sample_size_batch(baselines, mdes)).max() <= 1
+    np.testing.assert_array_equal(np.ceil(required_sample_size_unrounded(baselines, mdes)),
+                                  required_sample_size_batch(baselines, mdes))
+    assert [table_sample_size(table, b, m) for b, m in zip(baselines[:50], mdes[:50])] == n[:50].tolist()
+    # Off the grid: falls back to the solve
+    assert table_sample_size(table, 0.7, 0.01) == required_sample_size_batch(0.7, 0.01)
+
+
+def test_planned_sample_size_is_memoized_direct_solve():
+    assert planned_sample_size(0.03, 0.004) == required_sample_size_batch(0.03, 0.004)
+    hits = _cached_sample_size.cache_info().hits
+    # Float noise in the inputs still hits the cache
+    assert planned_sample_size(0.07 - 0.04, 0.004) == planned_sample_size(0.03, 0.004)
+    assert _cached_sample_size.cache_info().hits == hits + 2
@@ -0,0 +1,65 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pytest
+from src import profiling
+from src.profiling import lap, profiled, records, section, summary, write_report
+
+
+@profiled
+def _double(values):
+    return np.asarray(values) * 2
+
+
+@pytest.fixture
+def recording():
+    profiling.reset()
+    profiling.enable()
+    yield
+    lap(None)
+    profiling.disable()
+    profiling.reset()
+
+
+def test_nothing_is_recorded_when_disabled():
+    profiling.reset()
+    lap('step')
+    with section('block') as entry:
+        _double(np.arange(3))
+    lap(None)
+    assert entry is None and records().empty
+
+
+def test_sections_and_profiled_calls_nest_under_their_caller(recording):
+    with section('outer'):
+        _double(np.arange(5))
+        with section('inner', rows=7):
+            pass
+    frame = records().set_index('name')
+    assert list(frame.index) == ['test_profiling._double', 'inner', 'outer']
+    assert frame.loc['test_profiling._double', ['depth', 'parent', 'rows']].tolist() == [1, 'outer', 5]
+    assert frame.loc['inner', ['depth', 'parent', 'rows']].tolist() == [1, 'outer', 7]
+    assert frame.loc['outer', 'depth'] == 0 and frame.loc['outer', 'wall_s'] >= frame.loc['inner', 'wall_s']
+
+
+def test_each_lap_closes_the_previous_one(recording):
+    lap('01 load')
+    _double([1, 2])
+    lap('01 write')
+    lap(None)
+    frame = records()
+    assert frame['name'].tolist() == ['test_profiling._double', '01 load', '01 write']
+    assert frame.set_index('name').loc['test_profiling._double', 'parent'] == '01 load'
+    assert (frame['depth'] == [1, 0, 0]).all()
+
+
+def test_summary_and_reports(recording, tmp_path):
+    for _ in range(3):
+        _double(np.arange(4))
+    out = summary()
+    assert out.loc['test_profiling._double', 'calls'] == 3
+    assert out.loc['test_profiling._double', 'rows_max'] == 4
+    report = json.loads(write_report(tmp_path / 'run.json').read_text())
+    assert len(report['records']) == 3 and report['summary'][0]['calls'] == 3
+    assert len(write_report(tmp_path / 'run.csv').read_text().splitlines()) == 4
@@ -0,0 +1,46 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+from src.data_utils import add_derived_features
+from src.reporting import (cumulative_rates, group_histogram, plot_device_cvr, plot_revenue_histogram,
+                           render_figures)
+from src.simulation import generate_dataset
+
+DF = add_derived_features(generate_dataset(n_days=5, target_total_sessions=10000, seed=10))
+
+
+def test_group_histogram_matches_numpy_per_group():
+    converted = DF['converted'].to_numpy() == 1
+    edges, counts = group_histogram(DF['revenue'], DF['group'], bins=25, mask=converted)
+    np.testing.assert_allclose(edges, np.histogram_bin_edges(DF.loc[converted, 'revenue'], bins=25))
+    for group in ('control', 'treatment'):
+        ref, _ = np.histogram(DF.loc[converted & (DF['group'] == group), 'revenue'], bins=edges)
+        np.testing.assert_array_equal(counts[group], ref)
+
+
+def test_cumulative_rates_match_running_session_means():
+    daily = DF.groupby(['date', 'group']).agg(sessions=('converted', 'size'), conversions=('converted', 'sum'))
+    table = cumulative_rates(daily)
+    for row in table.itertuples():
+        sub = DF[(DF['group'] == row.group) & (DF['date'] <= row.date)]
+        assert row.cum_cvr == sub['converted'].mean()
+
+
+def test_parallel_rendering_writes_the_same_figures(tmp_path):
+    import matplotlib
+    backend = matplotlib.get_backend()
+    converted = DF['converted'].to_numpy() == 1
+    edges, counts = group_histogram(DF['revenue'], DF['group'], mask=converted)
+    device = (DF.groupby(['device', 'group'])['converted'].mean() * 100).rename('cvr_percent').reset_index()
+
+    def jobs(folder):
+        folder.mkdir()
+        return [(plot_revenue_histogram, {'edges': edges, 'counts': counts, 'path': folder / 'revenue.png'}),
+                (plot_device_cvr, {'device_metrics': device, 'path': folder / 'device.png'})]
+
+    serial = render_figures(jobs(tmp_path / 'serial'))
+    parallel = render_figures(jobs(tmp_path / 'parallel'), workers=2)
+    for a, b in zip(serial, parallel):
+        assert a.read_bytes() == b.read_bytes()
+    assert matplotlib.get_backend() == backend
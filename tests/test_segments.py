@@ -0,0 +1,41 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from statsmodels.stats.multitest import multipletests
+from statsmodels.stats.proportion import proportion_confint
+from src.data_utils import add_derived_features
+from src.segments import segment_analysis
+from src.simulation import generate_dataset
+from src.stats_utils import cohens_h, compute_lift_ci, run_proportion_ztest
+
+DF = add_derived_features(generate_dataset(n_days=7, target_total_sessions=30000, seed=8))
+
+
+@pytest.mark.parametrize('dims, correction', [(['device'], 'holm'),
+                                              (['device', 'traffic_source'], 'fdr_bh')])
+def test_segment_analysis_matches_per_segment_loop(dims, correction):
+    out = segment_analysis(DF, dims, correction=correction, min_sessions=200)
+
+    # Reference: one scalar test per segment, then the correction over testable cells
+    rows = {}
+    for key, sub in DF.groupby(dims):
+        c, t = sub[sub['group'] == 'control'], sub[sub['group'] == 'treatment']
+        z, p = run_proportion_ztest([t.converted.sum(), c.converted.sum()], [len(t), len(c)])
+        rows[key if len(dims) > 1 else key[0]] = (len(c), len(t), c.converted.mean(), t.converted.mean(), z, p)
+    assert len(out) == len(rows)
+    for key, (n_c, n_t, cvr_c, cvr_t, z, p) in rows.items():
+        row = out.loc[key]
+        assert (row.n_control, row.n_treatment) == (n_c, n_t)
+        assert (row.z, row.p_value) == pytest.approx((z, p), rel=1e-9)
+        assert (row.lift, row.lift_lo, row.lift_hi) == pytest.approx(compute_lift_ci(cvr_c, cvr_t, n_c, n_t))
+        assert (row.ci_treatment_lo, row.ci_treatment_hi) == pytest.approx(
+            proportion_confint(row.conv_treatment, n_t, method='wilson'))
+        assert row.cohens_h == pytest.approx(cohens_h(cvr_t, cvr_c))
+
+    testable = out[np.minimum(out['n_control'], out['n_treatment']) >= 200]
+    assert 0 < len(testable) <= len(out)
+    reject, p_adj, _, _ = multipletests(testable['p_value'], method=correction)
+    np.testing.assert_allclose(testable['p_adjusted'], p_adj)
+    assert (testable['significant'] == reject).all()
+    assert out.drop(testable.index)['p_adjusted'].isna().all()
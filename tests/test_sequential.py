@@ -0,0 +1,33 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from src.sequential import msprt_p_values, spending_boundaries
+
+
+def test_obrien_fleming_boundaries_match_gsdesign():
+    # gsDesign(k=5, test.type=2, sfu=sfLDOF) upper bounds
+    bounds = spending_boundaries(np.linspace(0.2, 1.0, 5))
+    assert bounds == pytest.approx([4.8769, 3.3569, 2.6803, 2.2898, 2.0310], abs=1e-3)
+
+
+def test_pocock_boundaries_keep_type_one_error_at_uneven_looks():
+    rng = np.random.default_rng(0)
+    t = np.array([0.1, 0.3, 0.45, 0.7, 1.0])
+    bounds = spending_boundaries(t, kind='pocock')
+    # Score process under H0: independent N(0, Δt) increments
+    score = (rng.standard_normal((200_000, len(t))) * np.sqrt(np.diff(t, prepend=0.0))).cumsum(axis=1)
+    rejected = (np.abs(score / np.sqrt(t)) >= bounds).any(axis=1).mean()
+    assert rejected == pytest.approx(0.05, abs=0.002)
+
+
+def test_msprt_p_values_are_always_valid_under_the_null():
+    rng = np.random.default_rng(1)
+    n = np.arange(1, 31) * 2000
+    conv_c = rng.binomial(2000, 0.03, (4000, 30)).cumsum(axis=1)
+    conv_t = rng.binomial(2000, 0.03, (4000, 30)).cumsum(axis=1)
+    p_c, p_t = conv_c / n, conv_t / n
+    p = msprt_p_values(p_t - p_c, p_c * (1 - p_c) / n + p_t * (1 - p_t) / n)
+    assert (np.diff(p, axis=1) <= 0).all()
+    # Rejecting at any of the 30 looks stays within alpha
+    assert (p[:, -1] <= 0.05).mean() <= 0.05
@@ -0,0 +1,57 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pandas as pd
+from src.simulation import (generate_dataset, generate_pre_period, iter_sessions, write_pre_period,
+                            write_sessions)
+
+
+def test_iter_sessions_unaffected_by_generation_in_between():
+    expected = generate_dataset(n_days=3, target_total_sessions=3000, seed=1)
+    chunks = iter_sessions(n_days=3, target_total_sessions=3000, seed=1)
+    first = next(chunks)[2]
+    generate_dataset(n_days=3, target_total_sessions=30000, seed=7)
+    streamed = pd.concat([first] + [df for _, _, df in chunks], ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, expected)
+
+
+def test_batched_generator_matches_legacy_layout_and_mix():
+    legacy = generate_dataset(n_days=4, target_total_sessions=20000, seed=3, legacy=True)
+    batched = generate_dataset(n_days=4, target_total_sessions=20000, seed=3)
+    pd.testing.assert_series_equal(batched.dtypes, legacy.dtypes)
+    assert batched['timestamp'].is_monotonic_increasing
+    assert abs(len(batched) / len(legacy) - 1) < 0.05
+    for col in ('device', 'traffic_source', 'group'):
+        shares = pd.concat([legacy[col].value_counts(normalize=True),
+                            batched[col].value_counts(normalize=True)], axis=1)
+        assert (shares.iloc[:, 0] - shares.iloc[:, 1]).abs().max() < 0.02
+    pd.testing.assert_frame_equal(generate_dataset(n_days=4, target_total_sessions=20000, seed=3), batched)
+
+
+def test_partitioned_writer_streams_the_same_sessions(tmp_path):
+    total = write_sessions(tmp_path, fmt='parquet', n_days=3, target_total_sessions=3000, seed=1, chunk_rows=400)
+    parts = [pd.read_parquet(f) for f in sorted(tmp_path.glob('sessions_*.parquet'))]
+    # Chunks split on minute boundaries, so they overshoot by at most one minute's sessions
+    assert len(parts) > 3 and max(len(p) for p in parts) <= 450
+    streamed = pd.concat(parts, ignore_index=True)
+    assert len(streamed) == total
+    expected = pd.concat([df for _, _, df in iter_sessions(n_days=3, target_total_sessions=3000, seed=1,
+                                                            chunk_rows=400)], ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+    assert streamed['timestamp'].is_monotonic_increasing
+
+
+def test_partitioned_pre_period_matches_in_memory_pre_period(tmp_path):
+    expected = generate_pre_period(pre_days=3, n_days=4, target_total_sessions=4000, seed=2)
+    for chunk_rows in (10_000, 300):
+        out = tmp_path / str(chunk_rows)
+        total = write_pre_period(out, fmt='parquet', pre_days=3, n_days=4, target_total_sessions=4000,
+                                 seed=2, chunk_rows=chunk_rows)
+        parts = [pd.read_parquet(f) for f in sorted(out.glob('sessions_*.parquet'))]
+        streamed = pd.concat(parts, ignore_index=True)
+        assert total == len(streamed) == len(expected)
+        # Day volumes and minutes are drawn before chunking; one chunk per day is the in-memory draw
+        pd.testing.assert_series_equal(streamed['timestamp'], expected['timestamp'])
+    assert max(len(p) for p in parts) <= 350
+    pd.testing.assert_frame_equal(
+        pd.concat([pd.read_parquet(f) for f in sorted((tmp_path / '10000').glob('*.parquet'))],
+                  ignore_index=True), expected, check_dtype=False)
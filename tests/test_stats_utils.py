@@ -0,0 +1,165 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from scipy import stats
+from src import stats_utils
+from src.stats_utils import (bootstrap_ci, compute_confidence_interval, compute_confidence_interval_batch,
+                             compute_lift_ci, compute_lift_ci_batch, permutation_test, power_batch,
+                             required_sample_size_batch, run_proportion_ztest_batch,
+                             sufficient_bootstrap_mean_diff, sufficient_permutation_test,
+                             sufficient_stats)
+
+
+def _mean_diff(b, a, axis=-1):
+    return b.mean(axis=axis) - a.mean(axis=axis)
+
+
+@pytest.mark.parametrize('skewed', ['both', 'a', 'b'])
+def test_bca_matches_scipy_on_skewed_two_sample_data(skewed):
+    rng = np.random.default_rng(0)
+    a = rng.lognormal(0, 1, 300) if skewed in ('both', 'a') else rng.normal(1.6, 2.0, 300)
+    b = rng.lognormal(0, 1, 300) if skewed in ('both', 'b') else rng.normal(1.6, 2.0, 300)
+
+    _, lo, hi = bootstrap_ci(a, b, method='bca', n_boot=20000)
+    ref = stats.bootstrap((b, a), _mean_diff, method='BCa', n_resamples=20000,
+                          vectorized=True, random_state=1).confidence_interval
+
+    # Agreement up to Monte Carlo error of the two bootstrap runs
+    assert lo == pytest.approx(ref.low, abs=0.02)
+    assert hi == pytest.approx(ref.high, abs=0.02)
+
+
+def test_bca_matches_scipy_exactly_with_unbalanced_arms(monkeypatch):
+    rng = np.random.default_rng(0)
+    a, b = rng.lognormal(0, 1, 15), rng.lognormal(0, 1, 500)
+    ref = stats.bootstrap((b, a), _mean_diff, method='BCa', n_resamples=5000,
+                          vectorized=True, random_state=1)
+    # Same bootstrap distribution on both sides, so only bias correction and acceleration differ
+    monkeypatch.setattr(stats_utils, '_bootstrap_diffs', lambda *args: ref.bootstrap_distribution)
+    _, lo, hi = bootstrap_ci(a, b, method='bca', n_boot=5000)
+    assert lo == pytest.approx(ref.confidence_interval.low, rel=1e-9)
+    assert hi == pytest.approx(ref.confidence_interval.high, rel=1e-9)
+
+
+@pytest.mark.parametrize('resampling', ['index', 'multinomial', 'poisson'])
+def test_percentile_ci_matches_scipy_for_every_resampling(resampling):
+    rng = np.random.default_rng(3)
+    # Zero-inflated revenue per session with repeated prices
+    a = np.where(rng.random(2000) < 0.05, rng.choice([19.99, 49.99, 89.99], 2000), 0.0)
+    b = np.where(rng.random(2000) < 0.07, rng.choice([19.99, 49.99, 89.99], 2000), 0.0)
+
+    observed, lo, hi = bootstrap_ci(a, b, n_boot=20000, resampling=resampling)
+    ref = stats.bootstrap((b, a), _mean_diff, method='percentile', n_resamples=20000,
+                          vectorized=True, random_state=1).confidence_interval
+
+    assert observed == pytest.approx(b.mean() - a.mean())
+    assert lo == pytest.approx(ref.low, abs=0.05)
+    assert hi == pytest.approx(ref.high, abs=0.05)
+    # Seeded: same resamples on every call
+    assert bootstrap_ci(a, b, resampling=resampling) == bootstrap_ci(a, b, resampling=resampling)
+
+
+@pytest.mark.parametrize('alternative', ['greater', 'less', 'two-sided'])
+def test_exact_binary_permutation_matches_fisher(alternative):
+    a = np.r_[np.ones(31), np.zeros(969)]
+    b = np.r_[np.ones(48), np.zeros(952)]
+    observed, p = permutation_test(a, b, alternative=alternative)
+    # Equal arm sizes make the hypergeometric null symmetric, so two-sided tails agree too
+    ref = stats.fisher_exact([[48, 952], [31, 969]], alternative=alternative).pvalue
+    assert observed == pytest.approx(0.017)
+    assert p == pytest.approx(ref, rel=1e-9)
+
+
+def test_sparse_permutation_matches_scipy_on_zero_inflated_revenue():
+    rng = np.random.default_rng(5)
+    a = np.where(rng.random(1500) < 0.1, rng.gamma(4.0, 17.0, 1500), 0.0)
+    b = np.where(rng.random(1200) < 0.1, rng.gamma(4.0, 19.0, 1200), 0.0)
+    observed, p = permutation_test(a, b, n_perm=20000, early_stop=False)
+    ref = stats.permutation_test((b, a), _mean_diff, n_resamples=20000, vectorized=True,
+                                 random_state=1).pvalue
+    assert observed == pytest.approx(b.mean() - a.mean())
+    assert p == pytest.approx(ref, abs=0.01)
+
+
+def test_batch_proportion_tests_match_statsmodels():
+    from statsmodels.stats.proportion import proportion_confint, proportions_ztest
+    rng = np.random.default_rng(2)
+    nobs_a, nobs_b = rng.integers(200, 20000, 50), rng.integers(200, 20000, 50)
+    count_a, count_b = rng.binomial(nobs_a, 0.03), rng.binomial(nobs_b, 0.035)
+
+    z, p = run_proportion_ztest_batch(count_a, nobs_a, count_b, nobs_b)
+    lo, hi = compute_confidence_interval_batch(count_a, nobs_a)
+    diff, diff_lo, diff_hi = compute_lift_ci_batch(count_a, nobs_a, count_b, nobs_b)
+    for i in range(50):
+        ref_z, ref_p = proportions_ztest([count_a[i], count_b[i]], [nobs_a[i], nobs_b[i]])
+        assert (z[i], p[i]) == pytest.approx((ref_z, ref_p), rel=1e-9)
+        assert (lo[i], hi[i]) == pytest.approx(proportion_confint(count_a[i], nobs_a[i], method='wilson'),
+                                               rel=1e-9)
+        ref = compute_lift_ci(count_a[i] / nobs_a[i], count_b[i] / nobs_b[i], nobs_a[i], nobs_b[i])
+        assert (diff[i], diff_lo[i], diff_hi[i]) == pytest.approx(ref, rel=1e-12)
+
+
+def test_batch_sample_size_matches_statsmodels_solve():
+    from statsmodels.stats.power import NormalIndPower
+    baselines = np.array([0.01, 0.03, 0.1, 0.3])[:, None]
+    mdes = np.array([0.001, 0.004, 0.02])[None, :]
+    n = required_sample_size_batch(baselines, mdes)
+    for (i, j), n_ij in np.ndenumerate(n):
+        b, m = baselines[i, 0], mdes[0, j]
+        ref = NormalIndPower().solve_power(effect_size=m / np.sqrt(b * (1 - b)), alpha=0.05, power=0.80)
+        assert n_ij == int(np.ceil(ref))
+    assert (power_batch(baselines, mdes, n) >= 0.80).all()
+
+
+def _zero_inflated_revenue(seed):
+    rng = np.random.default_rng(seed)
+    a = np.where(rng.random(3000) < 0.04, rng.gamma(4.0, 17.0, 3000).round(2), 0.0)
+    b = np.where(rng.random(3000) < 0.045, rng.gamma(4.0, 17.0, 3000).round(2), 0.0)
+    return a, b
+
+
+def test_sufficient_bootstrap_matches_per_session_resampling():
+    a, b = _zero_inflated_revenue(5)
+    diff, lo, hi = sufficient_bootstrap_mean_diff(sufficient_stats(a), sufficient_stats(b), n_boot=20000)
+
+    # Reference: resample every session of each arm with replacement
+    rng = np.random.default_rng(1)
+    ref = np.array([rng.choice(b, len(b)).mean() - rng.choice(a, len(a)).mean() for _ in range(20000)])
+    assert diff == pytest.approx(ref.mean(), abs=0.01)
+    assert lo == pytest.approx(np.percentile(ref, 2.5), abs=0.03)
+    assert hi == pytest.approx(np.percentile(ref, 97.5), abs=0.03)
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_sufficient_permutation_matches_full_relabelling(binary):
+    a, b = _zero_inflated_revenue(4)
+    if binary:
+        a, b = (a > 0).astype(float), (b > 0).astype(float)
+    observed, p = sufficient_permutation_test(sufficient_stats(a), sufficient_stats(b), n_perm=20000)
+
+    # Reference: shuffle all sessions and split them back into arms of the original sizes
+    rng = np.random.default_rng(1)
+    pooled = np.concatenate([a, b])
+    null = np.empty(10000)
+    for i in range(len(null)):
+        perm = rng.permutation(pooled)
+        null[i] = perm[len(a):].mean() - perm[:len(a)].mean()
+    assert observed == pytest.approx(b.mean() - a.mean())
+    assert p == pytest.approx(np.mean(np.abs(null) >= abs(observed) - 1e-12), abs=0.02)
+
+
+def test_profiled_entry_points_record_each_call_once():
+    from src import profiling
+    profiling.reset()
+    profiling.enable()
+    try:
+        compute_confidence_interval(30, 1000)
+        compute_lift_ci_batch([30, 40], [1000, 1000], [45, 50], [1000, 1000])
+        permutation_test(np.r_[np.ones(30), np.zeros(970)], np.r_[np.ones(45), np.zeros(955)] * 2.5)
+        names = profiling.records()['name'].tolist()
+    finally:
+        profiling.disable()
+        profiling.reset()
+    assert names == ['stats_utils.compute_confidence_interval', 'stats_utils.compute_lift_ci_batch',
+                     'stats_utils.permutation_test']
@@ -0,0 +1,61 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from src.simulation import generate_dataset
+from src.user_level import cluster_bootstrap_ci, ratio_metric_test, user_aggregates
+
+DF = generate_dataset(n_days=7, target_total_sessions=20000, seed=9)
+
+
+def test_user_aggregates_match_string_groupby():
+    df = DF.copy()
+    # One user seen in both arms, assigned to its majority arm
+    switcher = df['user_id'].value_counts().index[0]
+    first = df.index[df['user_id'] == switcher][0]
+    df.loc[first, 'group'] = {'control': 'treatment', 'treatment': 'control'}[df.loc[first, 'group']]
+    users = user_aggregates(df)
+
+    ref = df.groupby('user_id').agg(sessions=('converted', 'size'), conversions=('converted', 'sum'),
+                                    revenue=('revenue', 'sum'), treated=('group', lambda g: (g == 'treatment').sum()))
+    ref.index = ref.index.str.slice(1).astype(int)
+    ref = ref.loc[users.index]
+    np.testing.assert_array_equal(users['sessions'], ref['sessions'])
+    np.testing.assert_array_equal(users['conversions'], ref['conversions'])
+    np.testing.assert_allclose(users['revenue'], ref['revenue'])
+    assert (users['group'].astype(str) == np.where(ref['treated'] * 2 > ref['sessions'], 'treatment', 'control')).all()
+    assert users['switched'].sum() == 1 and users.loc[int(switcher[1:]), 'switched']
+
+
+@pytest.mark.parametrize('metric', ['cvr', 'revenue_per_session'])
+def test_delta_method_and_cluster_bootstrap_match_user_resampling_loop(metric):
+    users = user_aggregates(DF)
+    out = ratio_metric_test(users, metric)
+    _, lo, hi = cluster_bootstrap_ci(users, metric, n_boot=20000)
+
+    # Reference: resample whole users of each arm and recompute the ratio of sums
+    numerator = 'conversions' if metric == 'cvr' else 'revenue'
+    rng = np.random.default_rng(1)
+    arms = [users[users['group'] == g] for g in ('control', 'treatment')]
+    diffs = []
+    for _ in range(4000):
+        ratios = []
+        for arm in arms:
+            idx = rng.integers(0, len(arm), len(arm))
+            ratios.append(arm[numerator].to_numpy()[idx].sum() / arm['sessions'].to_numpy()[idx].sum())
+        diffs.append(ratios[1] - ratios[0])
+    diffs = np.array(diffs)
+
+    ratios = [arm[numerator].sum() / arm['sessions'].sum() for arm in arms]
+    assert out['diff'] == pytest.approx(ratios[1] - ratios[0])
+    assert out['se'] == pytest.approx(diffs.std(), rel=0.06)
+    width = np.percentile(diffs, 97.5) - np.percentile(diffs, 2.5)
+    assert lo == pytest.approx(np.percentile(diffs, 2.5), abs=0.05 * width)
+    assert hi == pytest.approx(np.percentile(diffs, 97.5), abs=0.05 * width)
+    if metric == 'cvr':
+        # Conversions are independent given device, so clustering by user barely matters...
+        assert out['design_effect'] == pytest.approx(1.0, abs=0.1)
+        # ...unless users carry a persistent propensity, which correlates their sessions
+        hetero = generate_dataset(n_days=7, target_total_sessions=20000, seed=9, propensity_shape=1.0)
+        assert ratio_metric_test(user_aggregates(hetero), metric)['design_effect'] > 1
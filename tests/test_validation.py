@@ -0,0 +1,83 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+from src.simulation import generate_dataset
+from src.validation import update_validation, validate_stream, validation_report
+
+
+def _chunk(user_ids, groups):
+    return pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=len(user_ids), freq='h'),
+                         'user_id': user_ids, 'group': groups,
+                         'device': 'desktop', 'traffic_source': 'organic'})
+
+
+def test_sparse_ids_do_not_size_the_bitmask():
+    state = update_validation(None, _chunk([1, 2, 10 ** 9], ['control', 'treatment', 'control']))
+    assert state['user_mask'].nbytes < 1024
+    report = validation_report(state)
+    assert (report['unique_users'], report['switched_users']) == (3, 0)
+
+
+def test_negative_ids_are_distinct_users():
+    report = validation_report(update_validation(None, _chunk([-1, 7], ['control', 'treatment'])))
+    assert (report['unique_users'], report['switched_users']) == (2, 0)
+
+
+def test_switch_to_sorted_keys_keeps_earlier_chunks():
+    state = update_validation(None, _chunk([1, 2, 3], ['control', 'treatment', 'control']))
+    state = update_validation(state, _chunk([3, 10 ** 12], ['treatment', 'control']))
+    report = validation_report(state)
+    assert (report['unique_users'], report['switched_users']) == (4, 1)
+
+
+def test_chunked_report_matches_direct_counts():
+    df = generate_dataset(n_days=3, target_total_sessions=9000, seed=8)
+    # One user switches arm; one chunk boundary goes back in time
+    first = df.iloc[0]
+    df.loc[df.index[-1], ['user_id', 'group']] = [
+        first['user_id'], 'treatment' if first['group'] == 'control' else 'control']
+    chunks = [df.iloc[idx] for idx in np.array_split(np.arange(len(df)), 5)]
+    chunks[2], chunks[3] = chunks[3], chunks[2]
+    report = validate_stream(chunks)
+
+    counts = df['group'].value_counts()
+    assert report['group_counts'] == counts.to_dict()
+    assert report['srm_p_value'] == pytest.approx(stats.chisquare(counts.to_numpy()).pvalue, abs=1e-4)
+    assert report['unique_users'] == df['user_id'].nunique()
+    assert report['switched_users'] == 1
+    assert not report['timestamp_sorted']
+    day = report['srm_by_day']
+    assert day[['control', 'treatment']].sum().to_dict() == counts.to_dict()
+
+
+def test_null_user_ids_and_timestamps_are_counted_not_checked():
+    chunk = _chunk(['U0000001', None, 'U0000002', 'U0000001', 'U0000004'],
+                   ['control', 'treatment', 'treatment', None, None])
+    chunk.loc[2, 'timestamp'] = pd.NaT
+    report = validate_stream([chunk, _chunk(['U0000003'], ['treatment'])])
+
+    assert report['null_counts']['user_id'] == 1
+    assert report['null_counts']['timestamp'] == 1
+    assert report['null_counts']['group'] == 2
+    assert (report['rows_without_user_id'], report['rows_without_timestamp'],
+            report['rows_without_group']) == (1, 1, 2)
+    # The null id is not a user; arm-less rows still count users and repeat sessions, but no switches
+    assert (report['unique_users'], report['switched_users'], report['duplicate_user_ids']) == (4, 0, 1)
+    assert report['group_counts'] == {'control': 1, 'treatment': 3}
+    assert report['users_per_group'] == {'control': 1, 'treatment': 2}
+    day = report['srm_by_day']
+    assert day[['control', 'treatment']].to_numpy().sum() == 3
+    assert day.index.min() == pd.Timestamp('2024-01-01')
+    assert report['timestamp_min'] == pd.Timestamp('2024-01-01')
+    assert report['timestamp_out_of_order'] == 1
+
+
+def test_one_malformed_id_keeps_the_keys_of_its_chunk():
+    chunks = [_chunk(['U0000001', 'U0000002'], ['control', 'treatment']),
+              _chunk(['U0000001', 'alice', 'U0000002'], ['treatment', 'control', 'treatment']),
+              _chunk(['alice'], ['control'])]
+    report = validate_stream(chunks)
+    assert (report['unique_users'], report['switched_users'], report['duplicate_user_ids']) == (3, 1, 3)